@@ -8,13 +8,14 @@ from alembic import context
 from src.config.database import DATABASE_URL, Base
 # Import models to ensure they are registered with SQLAlchemy
 from src.product.models import Product
-from src.inventory.models import Inventory
+from src.inventory.models import Inventory, InventoryShard, ReservationRelease
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
 section = config.config_ini_section
-config.set_section_option(section, "DB_URL", DATABASE_URL)
+# Escaped for configparser interpolation (passwords may contain "%")
+config.set_section_option(section, "DB_URL", DATABASE_URL.replace("%", "%%"))
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
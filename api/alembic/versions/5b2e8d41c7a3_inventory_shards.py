@@ -0,0 +1,61 @@
+"""inventory shards
+
+Adds inventory.shard_count and the inventory_shard table on databases created before
+inventory sharding. Every statement is idempotent, so it is a no-op on databases
+initialised from init-scripts/postgres/01-init.sql.
+
+Revision ID: 5b2e8d41c7a3
+Revises:
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b2e8d41c7a3'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""
+        ALTER TABLE inventory
+            ADD COLUMN IF NOT EXISTS shard_count INTEGER NOT NULL DEFAULT 0 CHECK (shard_count >= 0)
+    """)
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS inventory_shard (
+            id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+            product_id UUID NOT NULL REFERENCES product(id) ON DELETE CASCADE,
+            shard_no INTEGER NOT NULL CHECK (shard_no >= 0),
+            available_quantity INTEGER NOT NULL DEFAULT 0 CHECK (available_quantity >= 0),
+            reserved_quantity INTEGER NOT NULL DEFAULT 0 CHECK (reserved_quantity >= 0),
+            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(product_id, shard_no)
+        )
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION update_inventory_timestamp()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            NEW.last_updated = CURRENT_TIMESTAMP;
+            RETURN NEW;
+        END;
+        $$ language 'plpgsql'
+    """)
+    op.execute("""
+        CREATE OR REPLACE TRIGGER update_inventory_shard_timestamp
+            BEFORE UPDATE ON inventory_shard
+            FOR EACH ROW EXECUTE FUNCTION update_inventory_timestamp()
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TABLE IF EXISTS inventory_shard")
+    op.execute("ALTER TABLE inventory DROP COLUMN IF EXISTS shard_count")
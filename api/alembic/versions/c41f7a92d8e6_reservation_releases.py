@@ -0,0 +1,37 @@
+"""reservation releases
+
+Adds the reservation_release table, one row per order whose reserved stock was
+released, so a retried release does not give the same stock back twice.
+Idempotent, like the previous revision.
+
+Revision ID: c41f7a92d8e6
+Revises: 5b2e8d41c7a3
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41f7a92d8e6'
+down_revision: Union[str, Sequence[str], None] = '5b2e8d41c7a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS reservation_release (
+            order_id VARCHAR(64) PRIMARY KEY,
+            released_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TABLE IF EXISTS reservation_release")
@@ -0,0 +1,52 @@
+"""catalog notify trigger
+
+Installs the product trigger that notifies changed SKUs to the catalog invalidation
+listener. Databases upgraded through Alembic never ran the init script, so they had
+no trigger at all. The channel is the trigger's argument, taken from
+CATALOG_NOTIFY_CHANNEL; the listener re-points the trigger if that setting changes
+later. Idempotent, like the previous revisions.
+
+Revision ID: e7a3c9d15b20
+Revises: c41f7a92d8e6
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from src.config.settings import settings
+from src.product.cache import notify_trigger_sql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a3c9d15b20'
+down_revision: Union[str, Sequence[str], None] = 'c41f7a92d8e6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notify_product_changed()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            IF TG_OP <> 'INSERT' THEN
+                PERFORM pg_notify(TG_ARGV[0], OLD.sku);
+            END IF;
+            IF TG_OP <> 'DELETE' AND (TG_OP = 'INSERT' OR NEW.sku IS DISTINCT FROM OLD.sku) THEN
+                PERFORM pg_notify(TG_ARGV[0], NEW.sku);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ language 'plpgsql'
+    """)
+    op.execute(notify_trigger_sql(settings.CATALOG_NOTIFY_CHANNEL))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS notify_product_changed ON product")
+    op.execute("DROP FUNCTION IF EXISTS notify_product_changed()")
@@ -0,0 +1,164 @@
+"""
+User order history benchmark against a real MongoDB.
+
+Seeds --users users with --orders-per-user orders each into a scratch database,
+creates the service indexes with `ensure_indexes`, then times OrderService's history
+queries for --samples random users: the first offset page, offset page --deep-page and
+the same page reached through a cursor. Each query is also explained, so the report
+shows whether it was answered from user_order_history alone (docs_examined == 0).
+The fakes in `tests.fakes` have no query planner, hence the real server.
+
+Run from api/ (the database is dropped at the end unless --keep):
+
+    BENCH_MONGO_URI=mongodb://localhost:27017 python -m benchmarks.order_history --users 10000
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import sys
+import time
+import uuid
+
+from benchmarks.run import summarize
+from tests.fakes import configure_environment
+
+
+def _find(node, key: str):
+    """Every value stored under `key` anywhere in an explain document"""
+    if isinstance(node, dict):
+        for name, value in node.items():
+            if name == key:
+                yield value
+            else:
+                yield from _find(value, key)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _find(value, key)
+
+
+async def explain_pipeline(mongo_db, collection: str, pipeline: list[dict]) -> dict:
+    """Keys and documents the server examined to run an aggregation pipeline"""
+    explain = await mongo_db.command(
+        "explain", {"aggregate": collection, "pipeline": pipeline, "cursor": {}}, verbosity="executionStats"
+    )
+    return {
+        "keys_examined": sum(_find(explain, "totalKeysExamined")),
+        "docs_examined": sum(_find(explain, "totalDocsExamined")),
+    }
+
+
+async def seed(mongo_db, users: int, orders_per_user: int, chunk: int = 10000) -> list[str]:
+    now = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+    statuses = ["confirmed", "pending", "cancelled", "expired"]
+    user_ids = [f"history-user-{u:06d}" for u in range(users)]
+    batch = []
+    for u, user_id in enumerate(user_ids):
+        for n in range(orders_per_user):
+            batch.append({
+                "order_id": f"ORD-H{u:06d}{n:05d}",
+                "status": statuses[(u + n) % len(statuses)],
+                "customer": {"user_id": user_id, "email": "bench@example.com"},
+                "items": [{"sku": "BENCH-SKU", "quantity": 1, "price": 19.99, "name": "Bench item"}],
+                "pricing": {"subtotal": 19.99, "tax": 1.6, "total": 21.59},
+                "payment": {"status": "completed", "transaction_id": uuid.uuid4().hex[:12]},
+                "created_at": now - datetime.timedelta(minutes=n * 3 + u % 60),
+            })
+            if len(batch) >= chunk:
+                await mongo_db.orders.insert_many(batch, ordered=False)
+                batch = []
+    if batch:
+        await mongo_db.orders.insert_many(batch, ordered=False)
+    return user_ids
+
+
+async def run(args) -> dict:
+    from fastapi_pagination import Params
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from src.order.indexes import ensure_indexes
+    from src.order.services import OrderService
+    from src.utils.pagination import encode_cursor
+
+    client = AsyncIOMotorClient(args.mongo_uri)
+    mongo_db = client[args.database]
+    await client.drop_database(args.database)
+    try:
+        started = time.perf_counter()
+        user_ids = await seed(mongo_db, args.users, args.orders_per_user)
+        await ensure_indexes(mongo_db)
+        seed_seconds = time.perf_counter() - started
+
+        service = OrderService(None, mongo_db, None)
+        rng = random.Random(args.seed)
+        sample = rng.sample(user_ids, min(args.samples, len(user_ids)))
+        skip = (args.deep_page - 1) * args.size
+        latencies = {"offset_first": [], "offset_deep": [], "cursor_deep": []}
+        started = time.perf_counter()
+        for user_id in sample:
+            # Position of the last row before the deep page, as the previous page would return it
+            anchor = await mongo_db.orders.aggregate(
+                OrderService._user_history_pipeline({"customer.user_id": user_id}, skip - 1, 1)
+            ).to_list(length=1)
+            cursor = encode_cursor({
+                "created_at": datetime.datetime.fromisoformat(anchor[0]["created_at"]),
+                "order_id": anchor[0]["order_id"],
+            }) if anchor else None
+
+            for name, query in (
+                ("offset_first", lambda: service.get_orders_by_user(user_id, Params(page=1, size=args.size))),
+                ("offset_deep", lambda: service.get_orders_by_user(user_id, Params(page=args.deep_page, size=args.size))),
+                ("cursor_deep", lambda: service.get_orders_by_user_cursor(user_id, args.size, cursor)),
+            ):
+                query_started = time.perf_counter()
+                await query()
+                latencies[name].append((time.perf_counter() - query_started) * 1000)
+        elapsed = time.perf_counter() - started
+
+        user_filter = {"customer.user_id": sample[0]}
+        plans = {
+            "offset_first": await explain_pipeline(
+                mongo_db, "orders", OrderService._user_history_pipeline(user_filter, 0, args.size)
+            ),
+            "offset_deep": await explain_pipeline(
+                mongo_db, "orders", OrderService._user_history_pipeline(user_filter, skip, args.size)
+            ),
+        }
+        return {
+            "users": args.users,
+            "orders": args.users * args.orders_per_user,
+            "seed_seconds": round(seed_seconds, 1),
+            "page_size": args.size,
+            "deep_page": args.deep_page,
+            "queries": {name: summarize(values, elapsed) for name, values in latencies.items()},
+            "explain": plans,
+        }
+    finally:
+        if not args.keep:
+            await client.drop_database(args.database)
+        client.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-uri", default=os.environ.get("BENCH_MONGO_URI"))
+    parser.add_argument("--database", default="bench_order_history")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--orders-per-user", type=int, default=100)
+    parser.add_argument("--samples", type=int, default=200, help="Users whose history is queried")
+    parser.add_argument("--size", type=int, default=20)
+    parser.add_argument("--deep-page", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true", help="Keep the seeded database")
+    args = parser.parse_args(argv)
+    if not args.mongo_uri:
+        parser.error("set BENCH_MONGO_URI or pass --mongo-uri")
+
+    configure_environment(None)
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
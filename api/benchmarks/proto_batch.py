@@ -0,0 +1,117 @@
+"""
+Order event transport microbenchmark.
+
+Compares, per 1000 ORDER_CREATED events, publishing one OrderEvent per record with
+publishing OrderEventBatch envelopes (KAFKA_EVENT_BATCHING_ENABLED) of each size in
+--envelope-sizes:
+
+- wire: record count, value + key + header bytes, and the gzip size of the values
+  (roughly what a compressed producer batch carries)
+- encode: producer CPU time to serialize the events (and wrap them in envelopes)
+- parse: consumer CPU time to turn the record values back into OrderEvents
+
+Run from api/:
+
+    python -m benchmarks.proto_batch --events 1000 --rounds 200 --envelope-sizes 10,100,500
+"""
+import argparse
+import gzip
+import json
+import sys
+import time
+
+from tests.fakes import configure_environment
+
+
+def build_events(producer, events: int, lines: int) -> list:
+    return [
+        producer._build_order_created(
+            f"ORD-{n:08d}",
+            {"user_id": f"user-{n % 500:05d}", "email": f"user{n % 500}@example.com"},
+            [{"sku": f"SKU-{(n + line) % 1000:06d}", "quantity": 1 + line % 3} for line in range(lines)],
+        )
+        for n in range(events)
+    ]
+
+
+def cpu_us(work, rounds: int) -> float:
+    work()
+    started = time.process_time()
+    for _ in range(rounds):
+        work()
+    return (time.process_time() - started) / rounds * 1e6
+
+
+def run(args) -> dict:
+    from src.order.constants import EVENT_BATCH_CONTENT_TYPE, EVENT_CONTENT_TYPE_HEADER
+    from src.order.event.producer import KafkaProducer
+    from src.order.proto import order_events_pb2
+
+    producer = KafkaProducer()
+    events = build_events(producer, args.events, args.lines)
+    values = [event.SerializeToString() for event in events]
+    keys = [event.order_id.encode("utf-8") for event in events]
+    per_1k = 1000 / args.events
+
+    def parse_single():
+        for value in values:
+            order_events_pb2.OrderEvent().ParseFromString(value)
+
+    results = {
+        "single": {
+            "records": len(values),
+            "wire_bytes_per_1k": round((sum(map(len, values)) + sum(map(len, keys))) * per_1k),
+            "gzip_bytes_per_1k": round(len(gzip.compress(b"".join(values))) * per_1k),
+            "encode_us_per_1k": round(cpu_us(lambda: [e.SerializeToString() for e in events], args.rounds) * per_1k, 1),
+            "parse_us_per_1k": round(cpu_us(parse_single, args.rounds) * per_1k, 1),
+        }
+    }
+
+    header_bytes = len(EVENT_CONTENT_TYPE_HEADER) + len(EVENT_BATCH_CONTENT_TYPE)
+    for size in args.envelope_sizes:
+        def encode(size=size):
+            serialized = [event.SerializeToString() for event in events]
+            return [
+                KafkaProducer._build_envelope(serialized[start:start + size])
+                for start in range(0, len(serialized), size)
+            ]
+
+        envelopes = encode()
+
+        def parse(envelopes=envelopes):
+            for value in envelopes:
+                order_events_pb2.OrderEventBatch().ParseFromString(value)
+
+        results[f"envelope_{size}"] = {
+            "records": len(envelopes),
+            "wire_bytes_per_1k": round((sum(map(len, envelopes)) + header_bytes * len(envelopes)) * per_1k),
+            "gzip_bytes_per_1k": round(len(gzip.compress(b"".join(envelopes))) * per_1k),
+            "encode_us_per_1k": round(cpu_us(encode, args.rounds) * per_1k, 1),
+            "parse_us_per_1k": round(cpu_us(parse, args.rounds) * per_1k, 1),
+        }
+
+    single = results["single"]
+    for name, result in results.items():
+        if name != "single":
+            result["wire_ratio"] = round(result["wire_bytes_per_1k"] / single["wire_bytes_per_1k"], 3)
+            result["parse_speedup"] = round(single["parse_us_per_1k"] / max(result["parse_us_per_1k"], 1e-9), 2)
+    return {"events": args.events, "lines_per_order": args.lines, "rounds": args.rounds, "results": results}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=1000)
+    parser.add_argument("--lines", type=int, default=3, help="Items per ORDER_CREATED event")
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument(
+        "--envelope-sizes", type=lambda raw: [int(size) for size in raw.split(",")], default=[10, 100, 500]
+    )
+    args = parser.parse_args(argv)
+
+    configure_environment(None)
+    print(json.dumps(run(args), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
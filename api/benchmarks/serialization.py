@@ -0,0 +1,157 @@
+"""
+Response serialization microbenchmark.
+
+Measures the CPU time spent turning one service payload into response bytes, for
+100-item pages of the hot read endpoints:
+
+- validated: what FastAPI does for a plain return value, i.e. revalidate against the
+  route's `response_model`, serialize in JSON mode and render with the stdlib encoder
+- fast: what routes return with FAST_JSON_RESPONSES on, i.e. FastJSONResponse (orjson)
+
+Run from api/:
+
+    python -m benchmarks.serialization --items 100 --rounds 2000
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import random
+import sys
+import time
+import uuid
+from decimal import Decimal
+
+from tests.fakes import configure_environment
+
+
+def order_history_page(rng: random.Random, items: int) -> dict:
+    created = datetime.datetime(2026, 1, 1)
+    return {
+        "items": [
+            {
+                "order_id": f"ORD-{n:08d}",
+                "status": rng.choice(["pending", "confirmed", "failed"]),
+                "total": round(rng.uniform(5, 500), 2),
+                "created_at": (created + datetime.timedelta(minutes=n)).strftime("%Y-%m-%dT%H:%M:%S.000"),
+            }
+            for n in range(items)
+        ],
+        "total": items * 10,
+        "page": 1,
+        "size": items,
+        "pages": 10,
+    }
+
+
+def product_page(rng: random.Random, items: int) -> dict:
+    return {
+        "items": [
+            {
+                "id": uuid.UUID(int=rng.getrandbits(128)),
+                "sku": f"SKU-{n:06d}",
+                "name": f"Product {n}",
+                "price": Decimal(f"{rng.uniform(1, 300):.2f}"),
+                "available_quantity": rng.randint(0, 1000),
+            }
+            for n in range(items)
+        ],
+        "total": items * 10,
+        "page": 1,
+        "size": items,
+        "pages": 10,
+    }
+
+
+def order_document(rng: random.Random, items: int) -> dict:
+    now = datetime.datetime(2026, 1, 1, 12, 30, 15, 250000)
+    return {
+        "order_id": "ORD-00000001",
+        "idempotency_hash": "0" * 64,
+        "status": "confirmed",
+        "customer": {"user_id": "user-1", "email": "user@example.com"},
+        "items": [
+            {"sku": f"SKU-{n:06d}", "quantity": rng.randint(1, 5), "price": 9.99, "name": f"Product {n}"}
+            for n in range(items)
+        ],
+        "pricing": {"subtotal": 100.0, "tax": 19.0, "total": 119.0},
+        "payment": {"status": "success", "transaction_id": "txn-1", "method": "mock_gateway"},
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+async def measure(encode, rounds: int) -> dict:
+    body = await encode()
+    for _ in range(min(rounds, 50)):
+        await encode()
+    started = time.process_time()
+    for _ in range(rounds):
+        await encode()
+    cpu = time.process_time() - started
+    return {"cpu_us_per_response": round(cpu / rounds * 1e6, 2), "bytes": len(body)}
+
+
+async def run(args) -> dict:
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_model_field
+    from src.order.cache import OrderCache
+    from src.order.schemas import OrderReadByIdSchema, OrdersUserSearchSchema
+    from src.product.schemas import ProductSearchSchema
+    from src.utils.responses import FastJSONResponse, dumps
+
+    rng = random.Random(args.seed)
+    cases = {
+        "order_history_page": (OrdersUserSearchSchema, order_history_page(rng, args.items)),
+        "product_page": (ProductSearchSchema, product_page(rng, args.items)),
+    }
+
+    results = {}
+    for name, (schema, payload) in cases.items():
+        field = create_model_field(name=f"Response_{name}", type_=schema, mode="serialization")
+
+        async def validated(field=field, payload=payload):
+            content = await serialize_response(field=field, response_content=payload)
+            return JSONResponse(content).body
+
+        async def fast(payload=payload):
+            return FastJSONResponse(payload).body
+
+        results[name] = {"validated": await measure(validated, args.rounds), "fast": await measure(fast, args.rounds)}
+
+    # GET /orders/{order_id} serves cached bytes; this is the cost of building them on a miss.
+    document = order_document(rng, args.items)
+
+    async def order_validated():
+        return OrderReadByIdSchema.model_validate(document).model_dump_json().encode("utf-8")
+
+    async def order_fast():
+        return dumps(OrderCache._view(document))
+
+    results["order_by_id"] = {
+        "validated": await measure(order_validated, args.rounds),
+        "fast": await measure(order_fast, args.rounds),
+    }
+
+    for result in results.values():
+        result["speedup"] = round(
+            result["validated"]["cpu_us_per_response"] / max(result["fast"]["cpu_us_per_response"], 1e-9), 2
+        )
+    return {"items_per_response": args.items, "rounds": args.rounds, "results": results}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=100, help="Items per page / lines per order")
+    parser.add_argument("--rounds", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    configure_environment(None)
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,30 +1,119 @@
-from typing import AsyncGenerator
-
-from sqlalchemy.ext.asyncio import (
-    AsyncAttrs,
-    AsyncSession,
-    async_sessionmaker,
-    create_async_engine,
-)
-from sqlalchemy.orm import DeclarativeBase
-
-from src.config.settings import settings as s
-
-
-# Postgres setup
-DATABASE_URL = f"postgresql+asyncpg://{s.POSTGRES_USER}:{s.POSTGRES_PASSWORD}@{s.POSTGRES_HOST}:{s.POSTGRES_PORT}/{s.POSTGRES_DB}"
-engine = create_async_engine(DATABASE_URL)
-SessionLocal = async_sessionmaker(engine, expire_on_commit=False)
-
-
-class Base(AsyncAttrs, DeclarativeBase):
-    pass
-
-
-async def get_db() -> AsyncGenerator[AsyncSession, None]:
-    """
-    The function `get_db` is an asynchronous generator that yields an async session from `SessionLocal`.
-    """
-    async with SessionLocal() as session:
-        yield session
-        
+from typing import AsyncGenerator, Optional
+
+from sqlalchemy.ext.asyncio import (
+    AsyncAttrs,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import DeclarativeBase
+
+from src.config.settings import settings as s
+from src.metrics.pool import TimedAsyncQueuePool, timed_pool_class
+
+
+# Postgres setup
+DATABASE_URL = f"postgresql+asyncpg://{s.POSTGRES_USER}:{s.POSTGRES_PASSWORD}@{s.POSTGRES_HOST}:{s.POSTGRES_PORT}/{s.POSTGRES_DB}"
+engine = create_async_engine(DATABASE_URL, poolclass=TimedAsyncQueuePool)
+SessionLocal = async_sessionmaker(engine, expire_on_commit=False)
+
+# Read replica setup: without POSTGRES_READ_URL reads share the primary engine
+if s.POSTGRES_READ_URL:
+    READ_DATABASE_URL = make_url(s.POSTGRES_READ_URL).set(drivername="postgresql+asyncpg")
+    read_engine = create_async_engine(
+        READ_DATABASE_URL,
+        poolclass=timed_pool_class("replica"),
+        pool_size=s.POSTGRES_READ_POOL_SIZE,
+        max_overflow=s.POSTGRES_READ_MAX_OVERFLOW,
+    )
+else:
+    read_engine = engine
+ReadSessionLocal = async_sessionmaker(read_engine, expire_on_commit=False)
+
+
+class ReadRouting:
+    """
+    Decides where read-only sessions go. ReplicaLagMonitor turns the replica off
+    while it lags more than REPLICA_MAX_LAG_SECONDS or cannot be reached, and
+    back on once it catches up; meanwhile reads fall back to the primary.
+    """
+    def __init__(self, replica_configured: bool):
+        self.replica_configured = replica_configured
+        self.use_replica = replica_configured
+        self.lag_seconds: Optional[float] = None
+        self.stats = {"replica_sessions": 0, "primary_sessions": 0}
+
+    def sessionmaker(self) -> async_sessionmaker:
+        if self.use_replica:
+            self.stats["replica_sessions"] += 1
+            return ReadSessionLocal
+        self.stats["primary_sessions"] += 1
+        return SessionLocal
+
+
+read_routing = ReadRouting(read_engine is not engine)
+
+
+def reads_from_replica(db) -> bool:
+    """True when `db` (an AsyncSession or LazySession) is bound to the read replica"""
+    return read_engine is not engine and db.bind is read_engine
+
+
+class Base(AsyncAttrs, DeclarativeBase):
+    pass
+
+
+class LazySession:
+    """
+    Stand-in for an AsyncSession that only builds the real session on first use.
+
+    Attribute access is forwarded to the session, so services use it like any
+    AsyncSession; a request that never touches Postgres creates no session and
+    checks no connection out of the pool.
+    """
+    def __init__(self, sessionmaker: async_sessionmaker = SessionLocal):
+        self._sessionmaker = sessionmaker
+        self._session: Optional[AsyncSession] = None
+
+    @property
+    def started(self) -> bool:
+        return self._session is not None
+
+    @property
+    def bind(self):
+        return self._sessionmaker.kw.get("bind")
+
+    def __getattr__(self, name: str):
+        if self._session is None:
+            self._session = self._sessionmaker()
+        return getattr(self._session, name)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    The function `get_db` is an asynchronous generator that yields a `LazySession`,
+    so the underlying session is only opened by routes that actually query Postgres.
+    """
+    session = LazySession()
+    try:
+        yield session
+    finally:
+        await session.close()
+
+
+async def get_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Like `get_db`, for read-only routes: the session is opened on the read replica
+    when one is configured and healthy, on the primary otherwise. Reads may lag
+    writes by up to REPLICA_MAX_LAG_SECONDS.
+    """
+    session = LazySession(read_routing.sessionmaker())
+    try:
+        yield session
+    finally:
+        await session.close()
@@ -1,32 +1,127 @@
-from dotenv import load_dotenv
-from pydantic_settings import BaseSettings, SettingsConfigDict
-
-load_dotenv()
-
-class Settings(BaseSettings):
-    model_config = SettingsConfigDict(env_file=".env")
-
-    # Postgres
-    POSTGRES_USER: str | None = None
-    POSTGRES_PASSWORD: str | None = None
-    POSTGRES_HOST: str | None = None
-    POSTGRES_DB: str | None = None
-    POSTGRES_PORT: int | None = None
-    
-    # Mongo
-    MONGO_URI: str | None = None
-    MONGO_INITDB_DATABASE: str = "ecommerce_orders"
-    
-    # Kafka
-    KAFKA_BOOTSTRAP_SERVERS: str = "localhost:9092"
-
-    # General
-    APP_NAME: str | None = None
-    FRONTEND_BASE_URL: str | None = None
-
-    # Security
-    BACKEND_CORS_ORIGIN: str | None = None
-
-
-
-settings = Settings()
+from dotenv import load_dotenv
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+load_dotenv()
+
+class Settings(BaseSettings):
+    model_config = SettingsConfigDict(env_file=".env")
+
+    # Postgres
+    POSTGRES_USER: str | None = None
+    POSTGRES_PASSWORD: str | None = None
+    POSTGRES_HOST: str | None = None
+    POSTGRES_DB: str | None = None
+    POSTGRES_PORT: int | None = None
+
+    # Postgres read replica (unset = reads use the primary)
+    POSTGRES_READ_URL: str | None = None
+    POSTGRES_READ_POOL_SIZE: int = 5
+    POSTGRES_READ_MAX_OVERFLOW: int = 10
+    REPLICA_MAX_LAG_SECONDS: float = 5.0
+    REPLICA_LAG_CHECK_INTERVAL_SECONDS: float = 2.0
+    
+    # Mongo
+    MONGO_URI: str | None = None
+    MONGO_INITDB_DATABASE: str = "ecommerce_orders"
+    MONGO_TRANSACTIONS_ENABLED: bool = False
+    
+    # Kafka
+    KAFKA_BOOTSTRAP_SERVERS: str = "localhost:9092"
+    KAFKA_LINGER_MS: int = 10
+    KAFKA_MAX_BATCH_SIZE: int = 65536
+    KAFKA_COMPRESSION_TYPE: str | None = "gzip"
+    KAFKA_PUBLISH_QUEUE_SIZE: int = 10000
+    KAFKA_PUBLISH_BATCH_SIZE: int = 500
+    KAFKA_PUBLISH_TIMEOUT_SECONDS: float = 5.0
+    KAFKA_EVENT_BATCHING_ENABLED: bool = False
+    KAFKA_EVENT_BATCH_MAX_EVENTS: int = 100
+    KAFKA_CONSUMER_GROUP: str = "order_processors"
+    KAFKA_CONSUMER_CONCURRENCY: int = 16
+    KAFKA_CONSUMER_COMMIT_INTERVAL_SECONDS: float = 1.0
+    KAFKA_CONSUMER_BATCH_MODE: bool = False
+    KAFKA_CONSUMER_BATCH_SIZE: int = 500
+    KAFKA_CONSUMER_BATCH_TIMEOUT_MS: int = 200
+    KAFKA_CONSUMER_MAX_ATTEMPTS: int = 5
+    KAFKA_CONSUMER_RETRY_BACKOFF_SECONDS: float = 0.5
+    KAFKA_CONSUMER_STALL_SECONDS: float = 30.0
+    PROCESSED_EVENTS_TTL_SECONDS: int = 7 * 24 * 3600
+
+    # Event dedupe filter (in front of processed_events)
+    EVENT_DEDUPE_FILTER_ENABLED: bool = True
+    EVENT_DEDUPE_BLOOM_CAPACITY: int = 500000
+    EVENT_DEDUPE_BLOOM_ERROR_RATE: float = 0.001
+    EVENT_DEDUPE_LRU_SIZE: int = 10000
+
+    # Catalog cache
+    CATALOG_CACHE_MAX_SIZE: int = 10000
+    CATALOG_CACHE_TTL_SECONDS: float = 300.0
+    CATALOG_LISTEN_ENABLED: bool = True
+    CATALOG_NOTIFY_CHANNEL: str = "product_changed"
+
+    # Order read cache
+    ORDER_CACHE_MAX_SIZE: int = 10000
+    ORDER_CACHE_TTL_SECONDS: float = 2.0
+
+    # Responses: when enabled, hot reads skip response_model validation (opt-in)
+    FAST_JSON_RESPONSES: bool = False
+
+    # Reservations
+    RESERVATION_TTL_SECONDS: int = 900
+    RESERVATION_SWEEP_ENABLED: bool = True
+    RESERVATION_SWEEP_INTERVAL_SECONDS: float = 60.0
+    RESERVATION_SWEEP_BATCH_SIZE: int = 500
+    RESERVATION_SWEEP_CLAIM_TIMEOUT_SECONDS: float = 120.0
+
+    # Inventory sharding (hot SKUs)
+    INVENTORY_SHARDING_ENABLED: bool = False
+    INVENTORY_SHARDED_SKUS: str | None = None
+    INVENTORY_SHARD_COUNT: int = 8
+    INVENTORY_SHARD_REBALANCE_INTERVAL_SECONDS: float = 5.0
+
+    # Inventory reads
+    INVENTORY_BULK_MAX_SKUS: int = 5000
+
+    # Idempotency
+    IDEMPOTENCY_KEY_TTL_SECONDS: int = 86400
+    IDEMPOTENCY_HASH_TTL_SECONDS: int = 60
+    IDEMPOTENCY_LEASE_SECONDS: int = 30
+
+    # Orders
+    ORDER_BATCH_MAX_SIZE: int = 500
+    ORDER_EXPORT_BATCH_SIZE: int = 1000
+
+    # Payment
+    PAYMENT_GATEWAY: str = "mock"
+    PAYMENT_GATEWAY_URL: str | None = None
+    PAYMENT_CONCURRENCY: int = 50
+    PAYMENT_QUEUE_SIZE: int = 1000
+    PAYMENT_TIMEOUT_SECONDS: float = 10.0
+    PAYMENT_CIRCUIT_FAILURE_THRESHOLD: int = 5
+    PAYMENT_CIRCUIT_RESET_SECONDS: float = 30.0
+    PAYMENT_MOCK_DELAY_SECONDS: float = 3.0
+    PAYMENT_MOCK_SUCCESS_RATE: float = 0.5
+
+    # Outbox
+    OUTBOX_RELAY_ENABLED: bool = True
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_RELAY_CONCURRENCY: int = 10
+    OUTBOX_POLL_INTERVAL_SECONDS: float = 1.0
+    OUTBOX_LEASE_SECONDS: int = 60
+    OUTBOX_MAX_ATTEMPTS: int = 5
+    OUTBOX_RETENTION_SECONDS: int = 24 * 3600
+
+    # Health checks
+    HEALTH_CHECK_TIMEOUT_SECONDS: float = 2.0
+    HEALTH_REFRESH_INTERVAL_SECONDS: float = 5.0
+    HEALTH_CACHE_TTL_SECONDS: float = 15.0
+
+    # General
+    APP_NAME: str | None = None
+    FRONTEND_BASE_URL: str | None = None
+
+    # Security
+    BACKEND_CORS_ORIGIN: str | None = None
+
+
+
+settings = Settings()
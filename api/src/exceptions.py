@@ -1,20 +1,20 @@
-class ElementEqualName(Exception):
-    pass
-
-
-class ElementNotFound(Exception):
-    pass
-
-
-class InvalidOperation(Exception):
-    pass
-
-
-class ElementAlreadyExists(Exception):
-    pass
-
-
-
-
-
-
+class ElementEqualName(Exception):
+    pass
+
+
+class ElementNotFound(Exception):
+    pass
+
+
+class InvalidOperation(Exception):
+    pass
+
+
+class ElementAlreadyExists(Exception):
+    pass
+
+
+
+
+
+
@@ -0,0 +1,9 @@
+from fastapi import Request
+from src.health.services import HealthMonitor
+
+
+async def get_health_monitor(request: Request) -> HealthMonitor:
+    """
+    Returns the process-wide health monitor created by the application lifespan.
+    """
+    return request.app.state.health_monitor
@@ -1,27 +1,40 @@
-from fastapi import APIRouter, Depends, status, HTTPException
-from datetime import datetime
-from src.config.database import get_db
-from sqlalchemy.ext.asyncio import AsyncSession
-from src.order.dependencies import get_mongo_db
-from src.order.event.producer import KafkaProducer
-from sqlalchemy import select
-from src.health.services import HealthService
-from src.health.schemas import HealthCheckSchema
-
-router = APIRouter(prefix="/health", tags=["Health"])
-
-@router.get("/", status_code=status.HTTP_200_OK, response_model=HealthCheckSchema)
-async def health_check(
-    db: AsyncSession = Depends(get_db),
-    mongo_db=Depends(get_mongo_db),
-    kafka_producer: KafkaProducer = Depends()
-):
-    """
-    Health check endpoint.
-    """
-    try:
-        service = HealthService(db=db, mongo_db=mongo_db, kafka_producer=kafka_producer)
-        result = await service.get_health_status()
-        return result
-    except Exception as e:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from src.health.dependencies import get_health_monitor
+from src.health.services import HealthMonitor
+from src.health.schemas import HealthCheckSchema, LivenessSchema
+
+router = APIRouter(prefix="/health", tags=["Health"])
+
+@router.get("/", status_code=status.HTTP_200_OK, response_model=HealthCheckSchema)
+async def health_check(monitor: HealthMonitor = Depends(get_health_monitor)):
+    """
+    Health check endpoint. Served from the cached report, see /health/ready.
+    """
+    try:
+        return await monitor.get_report()
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@router.get("/live", status_code=status.HTTP_200_OK, response_model=LivenessSchema)
+async def liveness():
+    """
+    Liveness probe: the process is serving requests. Touches no dependency.
+    """
+    return {"status": "alive", "timestamp": datetime.now(timezone.utc)}
+
+
+@router.get("/ready", status_code=status.HTTP_200_OK, response_model=HealthCheckSchema)
+async def readiness(response: Response, monitor: HealthMonitor = Depends(get_health_monitor)):
+    """
+    Readiness probe: Postgres, Mongo and Kafka status with per-dependency latency.
+    Answers from the report kept fresh by the background refresher; 503 when any dependency is down.
+    """
+    try:
+        report = await monitor.get_report()
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+    if report["status"] != "healthy":
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return report
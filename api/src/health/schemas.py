@@ -1,6 +1,17 @@
-from datetime import datetime
-from pydantic import BaseModel
-
-class HealthCheckSchema(BaseModel):
-    status: str
-    timestamp: datetime
\ No newline at end of file
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel
+
+class DependencyHealthSchema(BaseModel):
+    status: str
+    latency_ms: float
+    error: Optional[str] = None
+
+class HealthCheckSchema(BaseModel):
+    status: str
+    timestamp: datetime
+    checks: dict[str, DependencyHealthSchema] = {}
+
+class LivenessSchema(BaseModel):
+    status: str
+    timestamp: datetime
@@ -1,40 +1,202 @@
-from datetime import datetime
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
-from src.order.event.producer import KafkaProducer
-
-class HealthService:
-    def __init__(self, db: AsyncSession, mongo_db, kafka_producer: KafkaProducer):
-        self.db = db
-        self.mongo_db = mongo_db
-        self.kafka_producer = kafka_producer
-
-    async def check_pg(self) -> bool:
-        try:
-            await self.db.execute(select(1))
-            return True
-        except Exception:
-            return False
-
-    async def check_mongo(self) -> bool:
-        try:
-            await self.mongo_db.list_collection_names()
-            return True
-        except Exception:
-            return False
-
-
-    async def get_health_status(self, check_sql=True, check_mongo=True, check_kafka=True) -> dict:
-        status = "healthy"
-
-        if check_sql and not await self.check_pg():
-            status = "sql_unhealthy"
-        elif check_mongo and not await self.check_mongo():
-            status = "mongo_unhealthy"
-        elif await self.kafka_producer.is_healthy():
-            status = "kafka_unhealthy"
-
-        return {
-            "status": status,
-            "timestamp": datetime.now().isoformat() + "Z"
-        }
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Optional
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from src.config.database import ReadRouting
+from src.config.settings import settings as s
+from src.order.event.producer import KafkaProducer
+
+logger = logging.getLogger(__name__)
+
+
+class HealthService:
+    """
+    Runs every dependency check concurrently, each bounded by `timeout_seconds`,
+    and reports per-dependency status and latency.
+    """
+    def __init__(
+        self,
+        mongo_db,
+        pg_sessionmaker: async_sessionmaker,
+        kafka_producer: KafkaProducer,
+        timeout_seconds: float = s.HEALTH_CHECK_TIMEOUT_SECONDS,
+    ):
+        self.mongo_db = mongo_db
+        self.pg_sessionmaker = pg_sessionmaker
+        self.kafka_producer = kafka_producer
+        self.timeout_seconds = timeout_seconds
+
+    async def check_pg(self):
+        async with self.pg_sessionmaker() as session:
+            await session.execute(select(1))
+
+    async def check_mongo(self):
+        await self.mongo_db.command("ping")
+
+    async def check_kafka(self):
+        await self.kafka_producer.ping()
+
+    async def _timed(self, check: Callable[[], Awaitable[None]]) -> dict:
+        started = time.perf_counter()
+        error = None
+        try:
+            await asyncio.wait_for(check(), timeout=self.timeout_seconds)
+        except asyncio.TimeoutError:
+            error = f"timed out after {self.timeout_seconds}s"
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        return {
+            "status": "up" if error is None else "down",
+            "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+            "error": error,
+        }
+
+    async def get_health_status(self, check_sql=True, check_mongo=True, check_kafka=True) -> dict:
+        checks = {}
+        if check_sql:
+            checks["sql"] = self.check_pg
+        if check_mongo:
+            checks["mongo"] = self.check_mongo
+        if check_kafka:
+            checks["kafka"] = self.check_kafka
+
+        results = dict(zip(checks, await asyncio.gather(*(self._timed(check) for check in checks.values()))))
+
+        status = "healthy"
+        for name, result in results.items():
+            if result["status"] != "up":
+                status = f"{name}_unhealthy"
+                break
+
+        return {
+            "status": status,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "checks": results,
+        }
+
+
+class HealthMonitor:
+    """
+    Keeps the latest health report in memory so probes never touch the dependencies.
+
+    `run` refreshes the report every HEALTH_REFRESH_INTERVAL_SECONDS. If the report is
+    older than HEALTH_CACHE_TTL_SECONDS (refresher not running or stuck), the next
+    probe refreshes it inline, and concurrent probes share that single refresh.
+    """
+    def __init__(
+        self,
+        service: HealthService,
+        interval_seconds: float = s.HEALTH_REFRESH_INTERVAL_SECONDS,
+        ttl_seconds: float = s.HEALTH_CACHE_TTL_SECONDS,
+    ):
+        self.service = service
+        self.interval_seconds = interval_seconds
+        self.ttl_seconds = ttl_seconds
+        self._report: Optional[dict] = None
+        self._refreshed_at = 0.0
+        self._lock = asyncio.Lock()
+        self._stopped = asyncio.Event()
+        self.stats = {"refreshes": 0, "inline_refreshes": 0}
+
+    async def run(self):
+        while not self._stopped.is_set():
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Health refresh failed")
+            try:
+                await asyncio.wait_for(self._stopped.wait(), timeout=self.interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    async def stop(self):
+        self._stopped.set()
+
+    async def refresh(self) -> dict:
+        async with self._lock:
+            return await self._refresh()
+
+    async def _refresh(self) -> dict:
+        self._report = await self.service.get_health_status()
+        self._refreshed_at = time.monotonic()
+        self.stats["refreshes"] += 1
+        return self._report
+
+    async def get_report(self) -> dict:
+        if self._report is not None and time.monotonic() - self._refreshed_at < self.ttl_seconds:
+            return self._report
+        refreshed_at = self._refreshed_at
+        async with self._lock:
+            if self._report is not None and self._refreshed_at != refreshed_at:
+                return self._report  # another caller refreshed while we waited
+            self.stats["inline_refreshes"] += 1
+            return await self._refresh()
+
+
+class ReplicaLagMonitor:
+    """
+    Measures the read replica's replay lag every REPLICA_LAG_CHECK_INTERVAL_SECONDS
+    and routes reads to the primary while it exceeds REPLICA_MAX_LAG_SECONDS or the
+    replica does not answer. A server that is not in recovery reports no lag, so
+    pointing POSTGRES_READ_URL at the primary works for local testing.
+    """
+    # An idle primary sends no WAL, so an old replay timestamp only means lag when
+    # the replica has received WAL it has not replayed yet.
+    LAG_QUERY = text(
+        "SELECT CASE"
+        " WHEN NOT pg_is_in_recovery() THEN 0"
+        " WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+        " ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)"
+        " END"
+    )
+
+    def __init__(
+        self,
+        read_sessionmaker: async_sessionmaker,
+        routing: ReadRouting,
+        max_lag_seconds: float = s.REPLICA_MAX_LAG_SECONDS,
+        interval_seconds: float = s.REPLICA_LAG_CHECK_INTERVAL_SECONDS,
+        timeout_seconds: float = s.HEALTH_CHECK_TIMEOUT_SECONDS,
+    ):
+        self.read_sessionmaker = read_sessionmaker
+        self.routing = routing
+        self.max_lag_seconds = max_lag_seconds
+        self.interval_seconds = interval_seconds
+        self.timeout_seconds = timeout_seconds
+        self._stopped = asyncio.Event()
+        self.stats = {"checks": 0, "failed_checks": 0, "fallbacks": 0, "lag_seconds": 0.0}
+
+    async def run(self):
+        while not self._stopped.is_set():
+            await self.check_once()
+            try:
+                await asyncio.wait_for(self._stopped.wait(), timeout=self.interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    async def stop(self):
+        self._stopped.set()
+
+    async def _lag(self) -> float:
+        async with self.read_sessionmaker() as session:
+            return float(await session.scalar(self.LAG_QUERY))
+
+    async def check_once(self):
+        self.stats["checks"] += 1
+        try:
+            lag = await asyncio.wait_for(self._lag(), timeout=self.timeout_seconds)
+        except Exception as e:
+            logger.warning("Replica lag check failed, reading from the primary: %r", e)
+            self.stats["failed_checks"] += 1
+            lag = None
+
+        healthy = lag is not None and lag <= self.max_lag_seconds
+        if self.routing.use_replica and not healthy:
+            self.stats["fallbacks"] += 1
+        self.routing.use_replica = healthy
+        self.routing.lag_seconds = lag
+        if lag is not None:
+            self.stats["lag_seconds"] = round(lag, 3)
@@ -1,4 +1,7 @@
-from src.exceptions import ElementNotFound
-
-class InventoryNotFound(ElementNotFound):
-    pass
\ No newline at end of file
+from src.exceptions import ElementNotFound, InvalidOperation
+
+class InventoryNotFound(ElementNotFound):
+    pass
+
+class InventoryInsufficientStock(InvalidOperation):
+    pass
@@ -1,24 +1,50 @@
-import datetime
-from sqlalchemy import ForeignKey, Integer
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy.sql import func
-
-from src.config.database import Base
-
-class Inventory(Base):
-    __tablename__ = "inventory"
-
-    id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=func.gen_random_uuid())
-    product_id: Mapped[UUID] = mapped_column(
-        UUID(as_uuid=True),
-        ForeignKey("product.id", ondelete="CASCADE"),
-        unique=True,
-        nullable=False,
-        index=True
-    )
-    available_quantity: Mapped[int] = mapped_column(Integer, nullable=False)
-    reserved_quantity: Mapped[int] = mapped_column(Integer, default=0)
-    last_updated: Mapped[datetime.datetime] = mapped_column(default=datetime.datetime.now)
-
-    product = relationship("Product", back_populates="inventory")
\ No newline at end of file
+import datetime
+from sqlalchemy import ForeignKey, Integer, String, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.sql import func
+
+from src.config.database import Base
+
+class Inventory(Base):
+    __tablename__ = "inventory"
+
+    id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=func.gen_random_uuid())
+    product_id: Mapped[UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("product.id", ondelete="CASCADE"),
+        unique=True,
+        nullable=False,
+        index=True
+    )
+    available_quantity: Mapped[int] = mapped_column(Integer, nullable=False)
+    reserved_quantity: Mapped[int] = mapped_column(Integer, default=0)
+    # 0 = stock lives in this row; N = stock is split across N InventoryShard rows
+    shard_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    last_updated: Mapped[datetime.datetime] = mapped_column(default=datetime.datetime.now)
+
+    product = relationship("Product", back_populates="inventory")
+
+
+class InventoryShard(Base):
+    __tablename__ = "inventory_shard"
+    __table_args__ = (UniqueConstraint("product_id", "shard_no"),)
+
+    id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=func.gen_random_uuid())
+    product_id: Mapped[UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("product.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    shard_no: Mapped[int] = mapped_column(Integer, nullable=False)
+    available_quantity: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    reserved_quantity: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    last_updated: Mapped[datetime.datetime] = mapped_column(default=datetime.datetime.now)
+
+
+class ReservationRelease(Base):
+    """One row per order whose reserved stock was given back, written with the release itself"""
+    __tablename__ = "reservation_release"
+
+    order_id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    released_at: Mapped[datetime.datetime] = mapped_column(default=datetime.datetime.now)
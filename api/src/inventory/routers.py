@@ -1,25 +1,72 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.ext.asyncio import AsyncSession
-from src.config.database import get_db
-from src.inventory.services import InventoryService
-from src.inventory.schemas import InventoryReadSchema
-from src.inventory.exceptions import InventoryNotFound
-
-router = APIRouter(prefix="/products", tags=["Inventory"])
-
-@router.get("/{sku}/inventory", response_model=InventoryReadSchema, status_code=status.HTTP_200_OK)
-async def get_product_inventory(
-    sku: str,
-    db: AsyncSession = Depends(get_db)
-):
-    """
-    Retrieve inventory for a specific product by SKU.
-    """
-    try:
-        service = InventoryService(db)
-        inventory = await service.get_inventory_by_sku(sku)
-        return inventory
-    except InventoryNotFound as e:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
-    except Exception as e:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.config.database import get_read_db
+from src.config.settings import settings as s
+from src.inventory.services import InventoryService
+from src.inventory.schemas import InventoryReadSchema, InventoryBulkQuerySchema, InventoryBulkReadSchema
+from src.inventory.exceptions import InventoryNotFound
+from src.utils.responses import fast_json
+
+router = APIRouter(prefix="/products", tags=["Inventory"])
+
+
+def _unique_skus(skus: list[str]) -> list[str]:
+    """Strip blanks and repeats, keeping the caller's order"""
+    return list(dict.fromkeys(sku.strip() for sku in skus if sku.strip()))
+
+
+async def _bulk_inventory(skus: list[str], db: AsyncSession):
+    skus = _unique_skus(skus)
+    if not skus:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="At least one SKU is required")
+    if len(skus) > s.INVENTORY_BULK_MAX_SKUS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {s.INVENTORY_BULK_MAX_SKUS} SKUs per request",
+        )
+    try:
+        service = InventoryService(db)
+        return fast_json(await service.get_inventory_by_skus(skus))
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@router.get("/inventory", response_model=InventoryBulkReadSchema, status_code=status.HTTP_200_OK)
+async def get_products_inventory(
+    skus: str = Query(..., description="Comma-separated SKUs"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Retrieve the inventory of many SKUs at once, keyed by SKU.
+    Unknown SKUs are returned in `unknown_skus` instead of failing the request.
+    """
+    return await _bulk_inventory(skus.split(","), db)
+
+
+@router.post("/inventory", response_model=InventoryBulkReadSchema, status_code=status.HTTP_200_OK)
+async def search_products_inventory(
+    query: InventoryBulkQuerySchema = Body(),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Same as `GET /products/inventory`, with the SKUs in the body for lists too long for a URL.
+    """
+    return await _bulk_inventory(query.skus, db)
+
+
+@router.get("/{sku}/inventory", response_model=InventoryReadSchema, status_code=status.HTTP_200_OK)
+async def get_product_inventory(
+    sku: str,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Retrieve inventory for a specific product by SKU.
+    """
+    try:
+        service = InventoryService(db)
+        inventory = await service.get_inventory_by_sku(sku)
+        return inventory
+    except InventoryNotFound as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
@@ -1,10 +1,24 @@
-from pydantic import BaseModel
-from uuid import UUID
-from src.product.schemas import ProductSearchSchema
-from datetime import datetime
-
-class InventoryReadSchema(BaseModel):
-    sku: str
-    product_name: str
-    available_quantity: int
-    reserved_quantity: int
+from typing import Annotated, Dict, List
+from pydantic import BaseModel, Field
+from uuid import UUID
+from src.product.schemas import ProductSearchSchema
+from datetime import datetime
+from src.config.settings import settings as s
+
+class InventoryReadSchema(BaseModel):
+    sku: str
+    product_name: str
+    available_quantity: int
+    reserved_quantity: int
+
+class InventoryBulkQuerySchema(BaseModel):
+    skus: Annotated[List[str], Field(min_length=1, max_length=s.INVENTORY_BULK_MAX_SKUS)]
+
+class InventoryBulkItemSchema(BaseModel):
+    product_name: str
+    available_quantity: int
+    reserved_quantity: int
+
+class InventoryBulkReadSchema(BaseModel):
+    items: Dict[str, InventoryBulkItemSchema]
+    unknown_skus: List[str]
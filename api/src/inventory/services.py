@@ -1,61 +1,516 @@
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
-from src.product.models import Product
-from src.inventory.schemas import InventoryReadSchema
-from src.inventory.exceptions import InventoryNotFound
-
-class InventoryService:
-    def __init__(self, db: AsyncSession):
-        self.db = db
-        
-    async def get_inventory_by_sku_with_relationships(self, sku):
-        """
-        Get product with inventory details by SKU.
-        """
-        try:
-            query = (
-                select(Product)
-                .options(selectinload(Product.inventory))
-                .where(Product.sku == sku)
-            )
-            result = await self.db.execute(query)
-            product = result.scalars().first()
-            return product
-        except Exception as e:
-            raise ValueError({
-                "message": "Error retrieving inventory by SKU",
-                "error": str(e),
-                "method": "InventoryService.get_inventory_by_sku_with_relationships",
-            })
-
-    async def get_inventory_by_sku(self, sku: str):
-        """
-        Get inventory details by SKU.
-        """
-        try:
-            product = await self.get_inventory_by_sku_with_relationships(sku)
-
-            if not product:
-                raise InventoryNotFound(f"Product with SKU '{sku}' not found.")
-            if not product.inventory:
-                raise InventoryNotFound(f"No inventory found for product '{sku}'.")
-
-            return {
-                "sku": product.sku,
-                "product_name": product.name,
-                "available_quantity": product.inventory.available_quantity,
-                "reserved_quantity": product.inventory.reserved_quantity,
-            }
-        except InventoryNotFound:
-            raise 
-        except Exception as e:
-            raise ValueError({
-                "message": "Failed to fetch inventory",
-                "sku": sku,
-                "error": str(e),
-                "method": "InventoryService.get_inventory_by_sku"
-            })
-    
-
-
+import random
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Integer, String, any_, bindparam, column, func, select, update, values
+from sqlalchemy.dialects.postgresql import ARRAY, UUID, insert
+from sqlalchemy.orm import selectinload
+from src.product.models import Product
+from src.product.exceptions import ProductNotFound
+from src.product.cache import CatalogCache, catalog_cache
+from src.config.settings import settings as s
+from src.inventory.models import Inventory, InventoryShard, ReservationRelease
+from src.inventory.sharding import ShardDirectory, inventory_totals, shard_directory
+from src.inventory.schemas import InventoryReadSchema
+from src.inventory.exceptions import InventoryNotFound, InventoryInsufficientStock
+
+class InventoryService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        
+    async def get_inventory_by_sku_with_relationships(self, sku):
+        """
+        Get product with inventory details by SKU.
+        """
+        try:
+            query = (
+                select(Product)
+                .options(selectinload(Product.inventory))
+                .where(Product.sku == sku)
+            )
+            result = await self.db.execute(query)
+            product = result.scalars().first()
+            return product
+        except Exception as e:
+            raise ValueError({
+                "message": "Error retrieving inventory by SKU",
+                "error": str(e),
+                "method": "InventoryService.get_inventory_by_sku_with_relationships",
+            })
+
+    async def get_inventory_by_sku(self, sku: str):
+        """
+        Get inventory details by SKU. Sharded products report the sum of their shards.
+        """
+        try:
+            totals = inventory_totals()
+            result = await self.db.execute(
+                select(
+                    Product.sku,
+                    Product.name,
+                    totals.c.product_id,
+                    totals.c.available_quantity,
+                    totals.c.reserved_quantity,
+                )
+                .outerjoin(totals, totals.c.product_id == Product.id)
+                .where(Product.sku == sku)
+            )
+            product = result.first()
+
+            if not product:
+                raise InventoryNotFound(f"Product with SKU '{sku}' not found.")
+            if product.product_id is None:
+                raise InventoryNotFound(f"No inventory found for product '{sku}'.")
+
+            return {
+                "sku": product.sku,
+                "product_name": product.name,
+                "available_quantity": product.available_quantity,
+                "reserved_quantity": product.reserved_quantity,
+            }
+        except InventoryNotFound:
+            raise 
+        except Exception as e:
+            raise ValueError({
+                "message": "Failed to fetch inventory",
+                "sku": sku,
+                "error": str(e),
+                "method": "InventoryService.get_inventory_by_sku"
+            })
+
+    async def get_inventory_by_skus(self, skus: list[str]) -> dict:
+        """
+        Inventory of many SKUs with one joined query, keyed by SKU.
+        The SKUs travel as a single array parameter, so the statement is the same
+        whatever their number. Unknown SKUs are listed apart; products without an
+        inventory row report zero stock.
+        """
+        try:
+            totals = inventory_totals()
+            result = await self.db.execute(
+                select(
+                    Product.sku,
+                    Product.name,
+                    func.coalesce(totals.c.available_quantity, 0).label("available_quantity"),
+                    func.coalesce(totals.c.reserved_quantity, 0).label("reserved_quantity"),
+                )
+                .outerjoin(totals, totals.c.product_id == Product.id)
+                .where(Product.sku == any_(bindparam("skus", skus, type_=ARRAY(String))))
+            )
+            items = {
+                row.sku: {
+                    "product_name": row.name,
+                    "available_quantity": row.available_quantity,
+                    "reserved_quantity": row.reserved_quantity,
+                }
+                for row in result.all()
+            }
+            return {"items": items, "unknown_skus": [sku for sku in skus if sku not in items]}
+        except Exception as e:
+            raise ValueError({
+                "message": "Failed to fetch inventory",
+                "skus": len(skus),
+                "error": str(e),
+                "method": "InventoryService.get_inventory_by_skus"
+            })
+
+
+class InventoryReservationService:
+    """
+    Reserve and release stock for every line of an order with a single statement.
+
+    Rows are locked in primary key order so concurrent multi-SKU orders cannot
+    deadlock, and the conditional `available_quantity >= quantity` is evaluated
+    against the locked row, so concurrent buyers can never oversell. SKUs are
+    resolved to product ids (and priced) through the catalog cache, so the
+    statement only touches the inventory table.
+
+    Hot SKUs can be sharded (see src.inventory.sharding): their stock is split
+    across InventoryShard rows and each reservation takes a random free shard
+    with SKIP LOCKED instead of queueing on one row lock. Sharded products are
+    handled after the plain rows, in product id order, so lock order stays
+    consistent across transactions.
+    """
+    def __init__(
+        self,
+        db: AsyncSession,
+        catalog: CatalogCache = catalog_cache,
+        shards: ShardDirectory = shard_directory,
+    ):
+        self.db = db
+        self.catalog = catalog
+        self.shards = shards
+
+    @staticmethod
+    def _aggregate_quantities(items: list[dict]) -> dict[str, int]:
+        """
+        Merge repeated SKUs of an order into a single requested quantity.
+        """
+        quantities: dict[str, int] = {}
+        for item in items:
+            quantities[item["sku"]] = quantities.get(item["sku"], 0) + item["quantity"]
+        return quantities
+
+    @staticmethod
+    def _locked_inventory(quantities: dict):
+        """
+        CTE that locks the inventory rows of the requested product ids, in id order.
+        """
+        requested = values(
+            column("product_id", UUID(as_uuid=True)), column("quantity", Integer), name="requested"
+        ).data(list(quantities.items()))
+        return (
+            select(Inventory.id, Inventory.product_id, requested.c.quantity)
+            .join(requested, requested.c.product_id == Inventory.product_id)
+            .order_by(Inventory.id)
+            .with_for_update(of=Inventory)
+            .cte("locked")
+        )
+
+    async def reserve_items(self, items: list[dict]) -> list[dict]:
+        """
+        Move the requested quantities from available to reserved, all or nothing.
+        The caller owns the transaction and must roll back when this raises.
+        """
+        quantities = self._aggregate_quantities(items)
+        if not quantities:
+            return []
+
+        products = await self.catalog.get_many(self.db, quantities)
+        self._check_products(quantities, products)
+        await self._reserve_quantities(quantities, products)
+        return self._reserved_lines(quantities, products)
+
+    async def reserve_batch(self, orders_items: list[list[dict]]) -> list[list[dict] | Exception]:
+        """
+        Reserve stock for many orders at once, with partial success.
+
+        Every SKU of the batch is resolved in one catalog lookup and the whole batch is
+        first reserved with a single statement. If that falls short, it is rolled back
+        to a savepoint and each order is retried in its own savepoint, so only the
+        orders that cannot be covered fail. Before those retries every row of the batch
+        is locked up front, in the same order the single statement uses, so the
+        per-order savepoints never take locks in an order that could deadlock with a
+        concurrent batch. Returns, per order, its reserved lines or the exception that
+        rejected it. The caller owns the transaction.
+        """
+        per_order = [self._aggregate_quantities(items) for items in orders_items]
+        products = await self.catalog.get_many(self.db, {sku for quantities in per_order for sku in quantities})
+
+        results: list[list[dict] | Exception | None] = [None] * len(per_order)
+        pending = []
+        for index, quantities in enumerate(per_order):
+            try:
+                self._check_products(quantities, products)
+                pending.append(index)
+            except ProductNotFound as e:
+                results[index] = e
+
+        combined: dict[str, int] = {}
+        for index in pending:
+            for sku, quantity in per_order[index].items():
+                combined[sku] = combined.get(sku, 0) + quantity
+
+        try:
+            if combined:
+                async with self.db.begin_nested():
+                    await self._reserve_quantities(combined, products)
+            for index in pending:
+                results[index] = self._reserved_lines(per_order[index], products)
+            return results
+        except (InventoryNotFound, InventoryInsufficientStock):
+            pass
+
+        await self._lock_products({products[sku]["id"] for sku in combined})
+        for index in pending:
+            try:
+                async with self.db.begin_nested():
+                    await self._reserve_quantities(per_order[index], products)
+                results[index] = self._reserved_lines(per_order[index], products)
+            except (InventoryNotFound, InventoryInsufficientStock) as e:
+                results[index] = e
+        return results
+
+    @staticmethod
+    def _check_products(quantities: dict[str, int], products: dict[str, dict]):
+        for sku in quantities:
+            if sku not in products:
+                raise ProductNotFound(f"Product with SKU '{sku}' not found.")
+
+    @staticmethod
+    def _reserved_lines(quantities: dict[str, int], products: dict[str, dict]) -> list[dict]:
+        return [
+            {
+                "sku": sku,
+                "quantity": quantity,
+                "price": float(products[sku]["price"]),
+                "name": products[sku]["name"],
+            }
+            for sku, quantity in quantities.items()
+        ]
+
+    async def _reserve_quantities(self, quantities: dict[str, int], products: dict[str, dict]):
+        """
+        Single conditional UPDATE over the locked rows; raises if any SKU falls short.
+        """
+        if not quantities:
+            return
+        by_product = {products[sku]["id"]: quantity for sku, quantity in quantities.items()}
+        sharded = {product_id for product_id in by_product if self.shards.is_sharded(product_id)}
+        reserved = await self._reserve_rows(
+            {product_id: quantity for product_id, quantity in by_product.items() if product_id not in sharded}
+        )
+
+        if s.INVENTORY_SHARDING_ENABLED:
+            # Sharded products, plus plain ones that fell short in case they were sharded
+            # by another process since the shard directory was refreshed.
+            for product_id in sorted(by_product):
+                if product_id not in reserved and await self._reserve_from_shards(product_id, by_product[product_id]):
+                    reserved.add(product_id)
+            stale = {
+                product_id: by_product[product_id]
+                for product_id in sharded if product_id not in reserved
+            }
+            reserved |= await self._reserve_rows(stale)
+
+        if len(reserved) != len(by_product):
+            await self._raise_shortfall(quantities, products, reserved)
+
+    async def _lock_products(self, product_ids: set):
+        """
+        Lock the inventory rows of `product_ids` in id order, then the shards of the
+        sharded ones in product id and shard order, until the end of the transaction.
+        That is the order _reserve_quantities takes them in, and reshard also locks
+        the inventory row before its shards.
+        """
+        if not product_ids:
+            return
+        await self.db.execute(
+            select(Inventory.id)
+            .where(Inventory.product_id.in_(product_ids))
+            .order_by(Inventory.id)
+            .with_for_update()
+        )
+        sharded = [product_id for product_id in product_ids if self.shards.is_sharded(product_id)]
+        if s.INVENTORY_SHARDING_ENABLED and sharded:
+            await self.db.execute(
+                select(InventoryShard.id)
+                .where(InventoryShard.product_id.in_(sharded))
+                .order_by(InventoryShard.product_id, InventoryShard.shard_no)
+                .with_for_update()
+            )
+
+    async def _reserve_rows(self, by_product: dict) -> set:
+        """
+        Single conditional UPDATE over the locked inventory rows.
+        Returns the product ids that were reserved.
+        """
+        if not by_product:
+            return set()
+        locked = self._locked_inventory(by_product)
+        query = (
+            update(Inventory)
+            .where(
+                Inventory.id == locked.c.id,
+                Inventory.available_quantity >= locked.c.quantity,
+            )
+            .values(
+                available_quantity=Inventory.available_quantity - locked.c.quantity,
+                reserved_quantity=Inventory.reserved_quantity + locked.c.quantity,
+                last_updated=func.now(),
+            )
+            .returning(locked.c.product_id)
+            .execution_options(synchronize_session=False)
+        )
+        result = await self.db.execute(query)
+        return set(result.scalars().all())
+
+    async def _reserve_from_shards(self, product_id, quantity: int) -> bool:
+        """
+        Take `quantity` from the shards of one product.
+
+        First try a single shard that can cover it, starting from a random one and
+        skipping shards other buyers hold, so concurrent orders spread over the shards.
+        If every such shard is busy or none holds enough, lock all shards in order and
+        take the quantity across them. Returns False when the shards cannot cover it
+        (or the product has none).
+        """
+        shard_count = self.shards.shard_count(product_id)
+        if shard_count:
+            start = random.randrange(shard_count)
+            candidate = (
+                select(InventoryShard.id)
+                .where(InventoryShard.product_id == product_id, InventoryShard.available_quantity >= quantity)
+                .order_by(InventoryShard.shard_no < start, InventoryShard.shard_no)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+                .scalar_subquery()
+            )
+            result = await self.db.execute(
+                update(InventoryShard)
+                .where(InventoryShard.id == candidate)
+                .values(
+                    available_quantity=InventoryShard.available_quantity - quantity,
+                    reserved_quantity=InventoryShard.reserved_quantity + quantity,
+                    last_updated=func.now(),
+                )
+                .returning(InventoryShard.id)
+                .execution_options(synchronize_session=False)
+            )
+            if result.scalar_one_or_none() is not None:
+                return True
+
+        shards = await self._lock_shards(product_id)
+        takes, remaining = [], quantity
+        for shard in shards:
+            take = min(shard.available_quantity, remaining)
+            if take:
+                takes.append((shard.id, take))
+                remaining -= take
+            if not remaining:
+                break
+        if remaining:
+            return False
+        await self._shift_shards(takes, reserve=True)
+        return True
+
+    async def release_items(self, items: list[dict]) -> int:
+        """
+        Return previously reserved quantities to available stock.
+        The caller owns the transaction. Returns the number of units released.
+        """
+        quantities = self._aggregate_quantities(items)
+        if not quantities:
+            return 0
+
+        products = await self.catalog.get_many(self.db, quantities)
+        by_product = {
+            products[sku]["id"]: quantity for sku, quantity in quantities.items() if sku in products
+        }
+        if not by_product:
+            return 0
+
+        sharded = {product_id for product_id in by_product if self.shards.is_sharded(product_id)}
+        released = await self._release_rows(
+            {product_id: quantity for product_id, quantity in by_product.items() if product_id not in sharded}
+        )
+
+        if s.INVENTORY_SHARDING_ENABLED:
+            for product_id in sorted(by_product):
+                if product_id not in released and await self._release_to_shards(product_id, by_product[product_id]):
+                    released[product_id] = by_product[product_id]
+            released.update(await self._release_rows({
+                product_id: by_product[product_id] for product_id in sharded if product_id not in released
+            }))
+        return sum(released.values())
+
+    async def release_orders(self, orders: list[dict]) -> int:
+        """
+        Release the reserved lines (`items`) of whole orders, at most once per order.
+        Each `order_id` is recorded in reservation_release by the same transaction as
+        the release, and orders already recorded are skipped, so a caller that failed
+        after the commit can simply release again. The caller owns the transaction.
+        Returns the number of units released.
+        """
+        if not orders:
+            return 0
+        result = await self.db.execute(
+            insert(ReservationRelease)
+            .values([{"order_id": order["order_id"]} for order in orders])
+            .on_conflict_do_nothing(index_elements=[ReservationRelease.order_id])
+            .returning(ReservationRelease.order_id)
+        )
+        recorded = set(result.scalars().all())
+        return await self.release_items([
+            item for order in orders if order["order_id"] in recorded for item in order.get("items", [])
+        ])
+
+    async def _release_rows(self, by_product: dict) -> dict:
+        """
+        Single conditional UPDATE returning reserved units to the inventory rows.
+        Returns product id -> released quantity.
+        """
+        if not by_product:
+            return {}
+        locked = self._locked_inventory(by_product)
+        query = (
+            update(Inventory)
+            .where(
+                Inventory.id == locked.c.id,
+                Inventory.reserved_quantity >= locked.c.quantity,
+            )
+            .values(
+                available_quantity=Inventory.available_quantity + locked.c.quantity,
+                reserved_quantity=Inventory.reserved_quantity - locked.c.quantity,
+                last_updated=func.now(),
+            )
+            .returning(locked.c.product_id, locked.c.quantity)
+            .execution_options(synchronize_session=False)
+        )
+        result = await self.db.execute(query)
+        return {row.product_id: row.quantity for row in result.all()}
+
+    async def _release_to_shards(self, product_id, quantity: int) -> bool:
+        """
+        Return `quantity` reserved units to the shards that hold reservations.
+        All or nothing, like the row release; releases are rare enough to lock every shard.
+        """
+        shards = await self._lock_shards(product_id)
+        takes, remaining = [], quantity
+        for shard in shards:
+            take = min(shard.reserved_quantity, remaining)
+            if take:
+                takes.append((shard.id, take))
+                remaining -= take
+            if not remaining:
+                break
+        if remaining:
+            return False
+        await self._shift_shards(takes, reserve=False)
+        return True
+
+    async def _lock_shards(self, product_id) -> list:
+        result = await self.db.execute(
+            select(InventoryShard.id, InventoryShard.available_quantity, InventoryShard.reserved_quantity)
+            .where(InventoryShard.product_id == product_id)
+            .order_by(InventoryShard.shard_no)
+            .with_for_update()
+        )
+        return result.all()
+
+    async def _shift_shards(self, takes: list[tuple], reserve: bool):
+        """Move quantities between available and reserved on the given (shard id, quantity) pairs"""
+        delta = values(
+            column("id", UUID(as_uuid=True)), column("quantity", Integer), name="delta"
+        ).data(takes)
+        sign = 1 if reserve else -1
+        await self.db.execute(
+            update(InventoryShard)
+            .where(InventoryShard.id == delta.c.id)
+            .values(
+                available_quantity=InventoryShard.available_quantity - sign * delta.c.quantity,
+                reserved_quantity=InventoryShard.reserved_quantity + sign * delta.c.quantity,
+                last_updated=func.now(),
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    async def _raise_shortfall(self, quantities: dict[str, int], products: dict[str, dict], reserved_ids: set):
+        """
+        Explain why a reservation did not cover every SKU. Only runs on the failure path.
+        """
+        missing = [sku for sku in quantities if products[sku]["id"] not in reserved_ids]
+        totals = inventory_totals()
+        result = await self.db.execute(
+            select(totals.c.product_id, totals.c.available_quantity)
+            .where(totals.c.product_id.in_([products[sku]["id"] for sku in missing]))
+        )
+        available = {row.product_id: row.available_quantity for row in result.all()}
+
+        for sku in missing:
+            if products[sku]["id"] not in available:
+                raise InventoryNotFound(f"Inventory for SKU '{sku}' not found.")
+        sku = missing[0]
+        raise InventoryInsufficientStock(
+            f"Insufficient inventory for {sku}. "
+            f"Requested: {quantities[sku]}, "
+            f"Available: {available[products[sku]['id']]}"
+        )
@@ -0,0 +1,252 @@
+import asyncio
+import logging
+from typing import Iterable
+
+from sqlalchemy import and_, delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.config.settings import settings as s
+from src.inventory.models import Inventory, InventoryShard
+from src.product.models import Product
+
+logger = logging.getLogger(__name__)
+
+
+def inventory_totals(sharding_enabled: bool | None = None):
+    """
+    Subquery with the stock of every product: its inventory row plus the sum of its
+    shards. Only products with shard_count > 0 are joined to their shards; with
+    sharding disabled the inventory rows are the totals and inventory_shard is not
+    read at all.
+    """
+    if sharding_enabled is None:
+        sharding_enabled = s.INVENTORY_SHARDING_ENABLED
+    if not sharding_enabled:
+        return select(
+            Inventory.product_id,
+            Inventory.available_quantity,
+            Inventory.reserved_quantity,
+        ).subquery("inventory_totals")
+
+    shards = (
+        select(
+            InventoryShard.product_id,
+            func.sum(InventoryShard.available_quantity).label("available_quantity"),
+            func.sum(InventoryShard.reserved_quantity).label("reserved_quantity"),
+        )
+        .group_by(InventoryShard.product_id)
+        .subquery("shard_totals")
+    )
+    return (
+        select(
+            Inventory.product_id,
+            (Inventory.available_quantity + func.coalesce(shards.c.available_quantity, 0)).label("available_quantity"),
+            (Inventory.reserved_quantity + func.coalesce(shards.c.reserved_quantity, 0)).label("reserved_quantity"),
+        )
+        .outerjoin(shards, and_(Inventory.shard_count > 0, shards.c.product_id == Inventory.product_id))
+        .subquery("inventory_totals")
+    )
+
+
+def configured_sharded_skus(raw: str | None = s.INVENTORY_SHARDED_SKUS) -> set[str]:
+    return {sku.strip() for sku in (raw or "").split(",") if sku.strip()}
+
+
+class ShardDirectory:
+    """
+    In-process map of product id -> shard count for the sharded SKUs.
+
+    Reservations use it to pick the shard path without looking the flag up per order.
+    It is refreshed by InventoryShardRebalancer, so it can lag a resharding done by
+    another process; InventoryReservationService falls back to the other path in
+    that case, so a stale entry only costs an extra statement.
+    """
+    def __init__(self):
+        self._shards: dict = {}
+
+    def shard_count(self, product_id) -> int:
+        return self._shards.get(product_id, 0)
+
+    def is_sharded(self, product_id) -> bool:
+        return product_id in self._shards
+
+    def product_ids(self) -> list:
+        return list(self._shards)
+
+    async def refresh(self, db: AsyncSession):
+        result = await db.execute(
+            select(Inventory.product_id, Inventory.shard_count).where(Inventory.shard_count > 0)
+        )
+        self._shards = {row.product_id: row.shard_count for row in result.all()}
+
+    def __len__(self) -> int:
+        return len(self._shards)
+
+
+shard_directory = ShardDirectory()
+
+
+class InventoryShardingService:
+    """
+    Splits a product's stock across shard rows, folds it back, and evens shards out.
+    The caller owns the transaction.
+    """
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def reshard(self, product_id, shard_count: int) -> bool:
+        """
+        Move the product's whole stock into `shard_count` shards (0 = back into the
+        inventory row). Locks the inventory row and every shard, so it waits for
+        in-flight reservations. Returns False when already in the requested layout.
+        """
+        inventory = (await self.db.execute(
+            select(Inventory).where(Inventory.product_id == product_id).with_for_update()
+        )).scalar_one_or_none()
+        if inventory is None or inventory.shard_count == shard_count:
+            return False
+
+        shards = (await self.db.execute(
+            select(InventoryShard.available_quantity, InventoryShard.reserved_quantity)
+            .where(InventoryShard.product_id == product_id)
+            .order_by(InventoryShard.shard_no)
+            .with_for_update()
+        )).all()
+        available = inventory.available_quantity + sum(shard.available_quantity for shard in shards)
+        reserved = inventory.reserved_quantity + sum(shard.reserved_quantity for shard in shards)
+
+        await self.db.execute(delete(InventoryShard).where(InventoryShard.product_id == product_id))
+        if shard_count > 0:
+            available_split = self._split(available, shard_count)
+            reserved_split = self._split(reserved, shard_count)
+            await self.db.execute(insert(InventoryShard), [
+                {
+                    "product_id": product_id,
+                    "shard_no": shard_no,
+                    "available_quantity": available_split[shard_no],
+                    "reserved_quantity": reserved_split[shard_no],
+                }
+                for shard_no in range(shard_count)
+            ])
+            available, reserved = 0, 0
+
+        await self.db.execute(
+            update(Inventory)
+            .where(Inventory.product_id == product_id)
+            .values(available_quantity=available, reserved_quantity=reserved, shard_count=shard_count)
+            .execution_options(synchronize_session=False)
+        )
+        return True
+
+    async def rebalance(self, product_id) -> int:
+        """
+        Spread available stock evenly over the shards nobody holds right now, when one
+        of them has fallen below half of its fair share. Busy shards are skipped
+        (SKIP LOCKED), so rebalancing never blocks buyers. Returns the units moved.
+        """
+        shards = (await self.db.execute(
+            select(InventoryShard.id, InventoryShard.available_quantity)
+            .where(InventoryShard.product_id == product_id)
+            .order_by(InventoryShard.shard_no)
+            .with_for_update(skip_locked=True)
+        )).all()
+        if len(shards) < 2:
+            return 0
+
+        total = sum(shard.available_quantity for shard in shards)
+        fair_share = total // len(shards)
+        if fair_share == 0 or min(shard.available_quantity for shard in shards) * 2 >= fair_share:
+            return 0
+
+        target = self._split(total, len(shards))
+        moved = 0
+        for shard, quantity in zip(shards, target):
+            if shard.available_quantity != quantity:
+                moved += max(quantity - shard.available_quantity, 0)
+                await self.db.execute(
+                    update(InventoryShard)
+                    .where(InventoryShard.id == shard.id)
+                    .values(available_quantity=quantity, last_updated=func.now())
+                    .execution_options(synchronize_session=False)
+                )
+        return moved
+
+    @staticmethod
+    def _split(quantity: int, parts: int) -> list[int]:
+        share, remainder = divmod(quantity, parts)
+        return [share + (1 if part < remainder else 0) for part in range(parts)]
+
+
+class InventoryShardRebalancer:
+    """
+    Keeps sharded inventory in shape.
+
+    Each pass (every INVENTORY_SHARD_REBALANCE_INTERVAL_SECONDS):
+    1. reshards so exactly the SKUs in INVENTORY_SHARDED_SKUS are sharded, with
+       INVENTORY_SHARD_COUNT shards each; every process converges on the same layout
+       because resharding re-checks the current one under the inventory row lock
+    2. refreshes the in-process shard directory
+    3. rebalances each sharded product, one transaction per product
+    """
+    def __init__(
+        self,
+        pg_sessionmaker: async_sessionmaker,
+        skus: Iterable[str] = (),
+        shard_count: int = s.INVENTORY_SHARD_COUNT,
+        interval_seconds: float = s.INVENTORY_SHARD_REBALANCE_INTERVAL_SECONDS,
+        directory: ShardDirectory = shard_directory,
+    ):
+        self.pg_sessionmaker = pg_sessionmaker
+        self.skus = set(skus) or configured_sharded_skus()
+        self.shard_count = shard_count
+        self.interval_seconds = interval_seconds
+        self.directory = directory
+        self._stopped = asyncio.Event()
+        self.stats = {"passes": 0, "reshards": 0, "rebalances": 0, "units_moved": 0}
+
+    async def run(self):
+        while not self._stopped.is_set():
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Inventory shard rebalance failed")
+            try:
+                await asyncio.wait_for(self._stopped.wait(), timeout=self.interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    async def stop(self):
+        self._stopped.set()
+
+    async def run_once(self):
+        await self.sync_layout()
+        async with self.pg_sessionmaker() as session:
+            await self.directory.refresh(session)
+
+        for product_id in self.directory.product_ids():
+            async with self.pg_sessionmaker() as session:
+                moved = await InventoryShardingService(session).rebalance(product_id)
+                await session.commit()
+            if moved:
+                self.stats["rebalances"] += 1
+                self.stats["units_moved"] += moved
+        self.stats["passes"] += 1
+
+    async def sync_layout(self):
+        async with self.pg_sessionmaker() as session:
+            result = await session.execute(
+                select(Product.id, Product.sku, Inventory.shard_count)
+                .join(Inventory, Inventory.product_id == Product.id)
+                .where((Inventory.shard_count > 0) | Product.sku.in_(self.skus))
+            )
+            changes = {}
+            for row in result.all():
+                wanted = self.shard_count if row.sku in self.skus else 0
+                if row.shard_count != wanted:
+                    changes[row.id] = wanted
+
+        for product_id, shard_count in changes.items():
+            async with self.pg_sessionmaker() as session:
+                if await InventoryShardingService(session).reshard(product_id, shard_count):
+                    self.stats["reshards"] += 1
+                await session.commit()
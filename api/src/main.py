@@ -1,38 +1,131 @@
-import json
-
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi_pagination import add_pagination
-
-from src import main_router
-from src.config.settings import settings
-
-app = FastAPI()
-
-# This code block is checking if the `BACKEND_CORS_ORIGIN` setting is defined in the `settings`
-# module. If it is defined, it adds a CORS (Cross-Origin Resource Sharing) middleware to the FastAPI
-# application.
-if settings.BACKEND_CORS_ORIGIN:
-    app.add_middleware(
-        CORSMiddleware,
-        allow_origins=json.loads(settings.BACKEND_CORS_ORIGIN),
-        allow_credentials=True,
-        allow_methods=["*"],
-        allow_headers=["*"],
-        expose_headers=["Content-Disposition"],
-    )
-
-# This is just to initialize the translation system
-if settings.APP_NAME:
-    app.title = settings.APP_NAME
-
-# `app.include_router(main_router)` is including the routes defined in the `main_router` in the
-# FastAPI application.
-app.include_router(main_router)
-
-add_pagination(app)
-
-if __name__ == "__main__":
-    import uvicorn
-
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+import json
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi_pagination import add_pagination
+
+from src import main_router
+from src.config.settings import settings
+from src.config.database import ReadSessionLocal, SessionLocal, engine, read_engine, read_routing
+from src.order.event.producer import KafkaProducer
+from src.order.event.outbox import OutboxRelay
+from src.order.sweeper import ReservationSweeper
+from src.inventory.sharding import InventoryShardRebalancer
+from src.payment.services import build_payment_processor
+from src.product.cache import CatalogInvalidationListener, catalog_cache
+from src.order.dependencies import mongo_db
+from src.order.indexes import ensure_indexes
+from src.health.services import HealthMonitor, HealthService, ReplicaLagMonitor
+from src.metrics.collectors import STATS
+from src.metrics.middleware import RequestMetricsMiddleware
+from src.metrics.routers import router as metrics_router
+from src.order.cache import order_cache
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Owns the process-wide resources shared by every request.
+    The Kafka producer connects lazily on first publish and is drained on shutdown,
+    after the background tasks that publish through it have stopped.
+    """
+    try:
+        await ensure_indexes(mongo_db)
+    except Exception:
+        logger.exception("Failed to ensure Mongo indexes")
+    app.state.kafka_producer = KafkaProducer()
+    app.state.payment_processor = build_payment_processor()
+    app.state.health_monitor = HealthMonitor(HealthService(mongo_db, SessionLocal, app.state.kafka_producer))
+
+    background = [app.state.health_monitor]
+    if settings.OUTBOX_RELAY_ENABLED:
+        background.append(
+            OutboxRelay(mongo_db, SessionLocal, app.state.kafka_producer, app.state.payment_processor)
+        )
+    if settings.RESERVATION_SWEEP_ENABLED:
+        background.append(ReservationSweeper(mongo_db, SessionLocal))
+    if settings.CATALOG_LISTEN_ENABLED:
+        background.append(CatalogInvalidationListener())
+    if settings.INVENTORY_SHARDING_ENABLED:
+        background.append(InventoryShardRebalancer(SessionLocal))
+    if read_routing.replica_configured:
+        background.append(ReplicaLagMonitor(ReadSessionLocal, read_routing))
+    tasks = [asyncio.create_task(worker.run()) for worker in background]
+
+    STATS.register("kafka_producer", lambda: app.state.kafka_producer.stats, KafkaProducer.COUNTERS)
+    STATS.register(
+        "payment", lambda: app.state.payment_processor.stats,
+        ("approved", "declined", "errors", "timeouts", "rejected"),
+    )
+    for worker in background:
+        if hasattr(worker, "stats"):
+            # Background workers only keep monotonic counters
+            STATS.register(_metric_name(worker), lambda worker=worker: worker.stats, tuple(worker.stats))
+    STATS.register("catalog_cache", lambda: catalog_cache.stats, ("hits", "misses", "evictions", "expirations", "invalidations", "replica_fills_skipped"))
+    STATS.register("order_cache", lambda: order_cache.stats, ("hits", "misses", "evictions", "expirations", "invalidations"))
+    STATS.register("db_pool", lambda: _pool_stats(engine))
+    if read_routing.replica_configured:
+        STATS.register("db_pool_replica", lambda: _pool_stats(read_engine))
+        STATS.register("read_routing", lambda: {
+            **read_routing.stats, "use_replica": int(read_routing.use_replica)
+        }, ("replica_sessions", "primary_sessions"))
+    STATS.register("background_tasks", lambda: {
+        "total": len(tasks), "running": sum(1 for task in tasks if not task.done())
+    })
+    try:
+        yield
+    finally:
+        for worker in background:
+            await worker.stop()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await app.state.payment_processor.stop()
+        await app.state.kafka_producer.stop()
+
+
+def _pool_stats(pool_engine) -> dict:
+    pool = pool_engine.pool
+    return {"size": pool.size(), "checked_out": pool.checkedout(), "overflow": pool.overflow()}
+
+
+def _metric_name(worker) -> str:
+    """OutboxRelay -> outbox_relay"""
+    name = type(worker).__name__
+    return "".join(f"_{c.lower()}" if c.isupper() else c for c in name).lstrip("_")
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(RequestMetricsMiddleware)
+
+# This code block is checking if the `BACKEND_CORS_ORIGIN` setting is defined in the `settings`
+# module. If it is defined, it adds a CORS (Cross-Origin Resource Sharing) middleware to the FastAPI
+# application.
+if settings.BACKEND_CORS_ORIGIN:
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=json.loads(settings.BACKEND_CORS_ORIGIN),
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["Content-Disposition"],
+    )
+
+# This is just to initialize the translation system
+if settings.APP_NAME:
+    app.title = settings.APP_NAME
+
+# `app.include_router(main_router)` is including the routes defined in the `main_router` in the
+# FastAPI application.
+app.include_router(main_router)
+app.include_router(metrics_router)
+
+add_pagination(app)
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,71 @@
+import time
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from src.metrics.collectors import (
+    DB_POOL_CHECKOUTS,
+    HTTP_REQUEST_DURATION,
+    REQUEST_POOL_CHECKOUTS,
+    RequestCounters,
+)
+
+
+class _RequestState(RequestCounters):
+    """
+    Per-request status and pool checkout tally. `send_with_status` wraps the request's
+    `send` as a bound method, so each request allocates this object and that method
+    rather than a closure, its cells and a counter list.
+    """
+    __slots__ = ("send", "status")
+
+    def __init__(self, send: Send):
+        self.send = send
+        self.status = 500
+        self.checkouts = 0
+
+    async def send_with_status(self, message: Message):
+        if message["type"] == "http.response.start":
+            self.status = message["status"]
+        await self.send(message)
+
+
+class RequestMetricsMiddleware:
+    """
+    Pure ASGI middleware recording request latency and Postgres pool checkouts per
+    route template. The labelled histogram and counter children are looked up on the
+    first request of each route, method and status, and cached on the middleware in
+    nested dicts, so later requests skip the label validation and locking of
+    `labels()` and build no lookup key.
+    """
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._children: dict[str, dict[str, dict[int, tuple]]] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        request = _RequestState(send)
+        token = REQUEST_POOL_CHECKOUTS.set(request)
+        try:
+            await self.app(scope, receive, request.send_with_status)
+        finally:
+            REQUEST_POOL_CHECKOUTS.reset(token)
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            method = scope["method"]
+            try:
+                duration, pool_checkouts = self._children[path][method][request.status]
+            except KeyError:
+                duration, pool_checkouts = self._bind(path, method, request.status)
+            duration.observe(time.perf_counter() - started)
+            if request.checkouts:
+                pool_checkouts.inc(request.checkouts)
+
+    def _bind(self, path: str, method: str, status: int) -> tuple:
+        children = (
+            HTTP_REQUEST_DURATION.labels(method, path, str(status)),
+            DB_POOL_CHECKOUTS.labels(method, path),
+        )
+        self._children.setdefault(path, {}).setdefault(method, {})[status] = children
+        return children
@@ -0,0 +1,31 @@
+import time
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from src.metrics.collectors import DB_POOL_CHECKOUT_WAIT, REQUEST_POOL_CHECKOUTS
+
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """
+    AsyncAdaptedQueuePool that records how long each checkout waits for a connection,
+    including opening a new one when the pool is below its size, and counts the
+    checkout against the HTTP request being served, if any.
+    """
+    checkout_wait = DB_POOL_CHECKOUT_WAIT.labels("primary")
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.checkout_wait.observe(time.perf_counter() - started)
+            counters = REQUEST_POOL_CHECKOUTS.get()
+            if counters is not None:
+                counters.checkouts += 1
+
+
+def timed_pool_class(engine_label: str) -> type[TimedAsyncQueuePool]:
+    """Pool class reporting under `engine_label`; survives pool recreation on dispose."""
+    return type(
+        f"TimedAsyncQueuePool_{engine_label}",
+        (TimedAsyncQueuePool,),
+        {"checkout_wait": DB_POOL_CHECKOUT_WAIT.labels(engine_label)},
+    )
@@ -0,0 +1,63 @@
+import hashlib
+from typing import Optional
+
+from src.config.settings import settings as s
+from src.order.schemas import OrderReadByIdSchema
+from src.utils.cache import LRUCache
+from src.utils.responses import dumps
+
+
+class OrderCache:
+    """
+    Short-lived in-process cache of serialized `GET /orders/{order_id}` bodies.
+
+    Entries hold the response bytes and their ETag, so a hit skips both Mongo and
+    schema validation. With FAST_JSON_RESPONSES a miss skips validation too: the
+    document is trimmed to the schema's fields and encoded with orjson. OrderService and the reservation sweeper invalidate an order
+    whenever they change its status; writes made by other processes show up once the
+    entry expires after ORDER_CACHE_TTL_SECONDS.
+    """
+    def __init__(self, max_size: int = s.ORDER_CACHE_MAX_SIZE, ttl_seconds: float = s.ORDER_CACHE_TTL_SECONDS):
+        self._cache = LRUCache(max_size, ttl_seconds)
+
+    @staticmethod
+    def _view(order_doc: dict) -> dict:
+        """The OrderReadByIdSchema shape of an order document, without validation"""
+        customer, pricing, payment = order_doc["customer"], order_doc["pricing"], order_doc["payment"]
+        return {
+            "order_id": order_doc["order_id"],
+            "status": order_doc["status"],
+            "customer": {"user_id": customer["user_id"], "email": customer["email"]},
+            "items": [{"sku": item["sku"], "quantity": item["quantity"]} for item in order_doc["items"]],
+            "pricing": {"subtotal": pricing["subtotal"], "tax": pricing["tax"], "total": pricing["total"]},
+            "payment": {"status": payment["status"], "transaction_id": payment.get("transaction_id")},
+            "created_at": order_doc["created_at"],
+            "updated_at": order_doc["updated_at"],
+        }
+
+    @classmethod
+    def build_entry(cls, order_doc: dict) -> dict:
+        if s.FAST_JSON_RESPONSES:
+            body = dumps(cls._view(order_doc))
+        else:
+            body = OrderReadByIdSchema.model_validate(order_doc).model_dump_json().encode("utf-8")
+        return {"body": body, "etag": f'"{hashlib.sha1(body).hexdigest()}"'}
+
+    def get(self, order_id: str) -> Optional[dict]:
+        return self._cache.get(order_id)
+
+    def put(self, order_id: str, entry: dict):
+        self._cache.put(order_id, entry)
+
+    def invalidate(self, order_id: str):
+        self._cache.invalidate(order_id)
+
+    def clear(self):
+        self._cache.clear()
+
+    @property
+    def stats(self) -> dict:
+        return self._cache.stats
+
+
+order_cache = OrderCache()
@@ -1,4 +1,10 @@
-from decimal import Decimal
-
-KAFKA_TOPIC = "orders"
-TAX_RATE = Decimal("0.08")  
\ No newline at end of file
+from decimal import Decimal
+
+KAFKA_TOPIC = "orders"
+KAFKA_DEAD_LETTER_TOPIC = "orders.dead-letter"
+EVENT_CONTENT_TYPE_HEADER = "content-type"
+EVENT_BATCH_CONTENT_TYPE = b"order-event-batch"
+TAX_RATE = Decimal("0.08")
+OUTBOX_ORDER_CREATED = "order_created"
+# Order statuses held while the stock is released, and the status each one ends in
+ORDER_RELEASING_STATUSES = {"cancelling": "cancelled", "failing": "error"}
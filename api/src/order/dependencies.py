@@ -1,23 +1,24 @@
-
-from typing import AsyncGenerator
-from src.order.event.producer import KafkaProducer
-from src.config.settings import settings as s
-from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
-
-
-async def get_kafka_producer() -> AsyncGenerator[KafkaProducer, None]:
-    producer = KafkaProducer()
-    try:
-        await producer.start()
-        yield producer
-    finally:
-        await producer.stop()
-# MongoDB setup
-mongo_client = AsyncIOMotorClient(s.MONGO_URI)
-mongo_db = mongo_client[s.MONGO_INITDB_DATABASE]
-
-async def get_mongo_db() -> AsyncGenerator[AsyncIOMotorDatabase, None]:
-    """
-    Yields an AsyncIOMotorDatabase object for direct collection access.
-    """
+
+from typing import AsyncGenerator
+from fastapi import Request
+from src.order.event.producer import KafkaProducer
+from src.config.settings import settings as s
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+
+
+async def get_kafka_producer(request: Request) -> KafkaProducer:
+    """
+    Returns the process-wide producer created by the application lifespan.
+    It connects lazily on first publish, so read-only routes never touch the broker.
+    """
+    return request.app.state.kafka_producer
+
+# MongoDB setup
+mongo_client = AsyncIOMotorClient(s.MONGO_URI)
+mongo_db = mongo_client[s.MONGO_INITDB_DATABASE]
+
+async def get_mongo_db() -> AsyncGenerator[AsyncIOMotorDatabase, None]:
+    """
+    Yields an AsyncIOMotorDatabase object for direct collection access.
+    """
     yield mongo_db
\ No newline at end of file
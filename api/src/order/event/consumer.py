@@ -1,45 +1,453 @@
-from aiokafka import AIOKafkaConsumer
-from src.order.proto import order_events_pb2
-from src.order.constants import KAFKA_TOPIC
-
-class KafkaWorker:
-    def __init__(self, mongo_db, pg_sessionmaker, kafka_producer):
-        self.mongo_db = mongo_db
-        self.pg_sessionmaker = pg_sessionmaker
-        self.producer = kafka_producer
-        self.consumer = AIOKafkaConsumer(
-            KAFKA_TOPIC,
-            bootstrap_servers=self.producer._bootstrap_servers,
-            group_id="order_processors"
-        )
-
-    async def start(self):
-        await self.consumer.start()
-        await self.producer.start()
-        try:
-            async for msg in self.consumer:
-                if msg.value is not None: 
-                    await self.handle_message(msg.value)
-        finally:
-            await self.consumer.stop()
-            await self.producer.stop()
-
-    async def handle_message(self, payload: bytes):
-        event = order_events_pb2.OrderEvent()
-        event.ParseFromString(payload)
-
-        # Idempotency check
-        processed = await self.mongo_db.processed_events.find_one({"event_id": event.event_id})
-
-        if processed:
-            return
-
-        if event.event_type == order_events_pb2.ORDER_CREATED:
-            async with self.pg_sessionmaker() as session:
-                from src.order.services import OrderService
-                service = OrderService(session, self.mongo_db, self.producer)
-                await service.create_order(
-                    {"user_id": event.order_created.customer.user_id,
-                     "email": event.order_created.customer.email},
-                    [{"sku": it.sku, "quantity": it.quantity} for it in event.order_created.items]
-                )
+import asyncio
+import contextlib
+import datetime
+import logging
+from collections import deque
+from aiokafka import AIOKafkaConsumer, ConsumerRebalanceListener, TopicPartition
+from pymongo.errors import BulkWriteError
+from src.config.settings import settings as s
+from src.order.proto import order_events_pb2
+from src.order.constants import EVENT_BATCH_CONTENT_TYPE, EVENT_CONTENT_TYPE_HEADER, KAFKA_TOPIC
+from src.order.event.dedupe import DUPLICATE, NEEDS_LOOKUP, ProcessedEventFilter
+from src.metrics.collectors import STATS
+from src.exceptions import ElementNotFound, InvalidOperation
+from src.order.exceptions import OrderIdempotencyError
+
+logger = logging.getLogger(__name__)
+
+# Business errors fail the same way on every attempt, so they are dead-lettered right away
+NON_RETRYABLE_ERRORS = (ElementNotFound, InvalidOperation)
+# ...except conflicts that clear on their own (an idempotency key another attempt is
+# still processing): those are retried and, if they outlast the retries, the record is
+# replayed later instead of being dead-lettered
+RETRY_LATER_ERRORS = (OrderIdempotencyError,)
+
+
+def is_event_batch(headers) -> bool:
+    """True when a record carries an OrderEventBatch envelope instead of a single OrderEvent"""
+    return any(
+        key == EVENT_CONTENT_TYPE_HEADER and value == EVENT_BATCH_CONTENT_TYPE
+        for key, value in headers or ()
+    )
+
+
+class PartitionOffsets:
+    """
+    In-flight offsets of one partition.
+    `committable` only advances past an offset once every earlier offset is done,
+    so a crash never skips a message that was still being processed.
+    """
+    def __init__(self):
+        self._window: deque[list] = deque()
+        self._entries: dict[int, list] = {}
+        self.committable: int | None = None
+
+    def track(self, offset: int):
+        entry = [offset, False]
+        self._window.append(entry)
+        self._entries[offset] = entry
+
+    def complete(self, offset: int):
+        self._entries.pop(offset)[1] = True
+        while self._window and self._window[0][1]:
+            self.committable = self._window.popleft()[0] + 1
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._window)
+
+    @property
+    def first_pending(self) -> int | None:
+        """Lowest offset not completed yet, i.e. where consumption resumes after a rewind"""
+        return self._window[0][0] if self._window else self.committable
+
+
+class _CommitOnRevoke(ConsumerRebalanceListener):
+    def __init__(self, worker: "KafkaWorker"):
+        self.worker = worker
+
+    async def on_partitions_revoked(self, revoked):
+        await self.worker._drain()
+        await self.worker._commit()
+        for tp in revoked:
+            self.worker._offsets.pop(tp, None)
+            self.worker._committed.pop(tp, None)
+            self.worker._stalled.pop(tp, None)
+
+    async def on_partitions_assigned(self, assigned):
+        await self.worker.dedupe.rebuild(self.worker.mongo_db)
+
+
+class KafkaWorker:
+    """
+    Consumes order events with up to `concurrency` handlers in flight.
+
+    Messages sharing a partition and key (order_id) run strictly in order; messages
+    of different orders run concurrently. Offsets are committed manually, and only
+    up to the highest contiguous completed offset of each partition.
+
+    With KAFKA_CONSUMER_BATCH_MODE the worker polls with `getmany` instead and
+    deduplicates a whole batch against `processed_events` with one `$in` query
+    and one `insert_many`.
+
+    Records flagged with the `content-type: order-event-batch` header carry an
+    OrderEventBatch envelope; their events are deduplicated together and processed
+    with one lane per order. Records without it are single OrderEvents.
+
+    Both paths ask `dedupe` (a ProcessedEventFilter) first and only look events up in
+    processed_events when it cannot tell new events from duplicates on its own.
+
+    Delivery is at least once. A failing event is retried up to KAFKA_CONSUMER_MAX_ATTEMPTS
+    times with exponential backoff (business errors are not retried) and then published
+    to the dead-letter topic. If even that fails, or the dedupe bookkeeping fails, the
+    record's offset is never completed: the partition is paused, and after
+    KAFKA_CONSUMER_STALL_SECONDS it is rewound to its first unfinished offset, so the
+    record is delivered again (already processed events are skipped by the dedupe).
+    """
+    def __init__(self, mongo_db, pg_sessionmaker, kafka_producer, concurrency: int = s.KAFKA_CONSUMER_CONCURRENCY):
+        self.mongo_db = mongo_db
+        self.pg_sessionmaker = pg_sessionmaker
+        self.producer = kafka_producer
+        self.consumer = AIOKafkaConsumer(
+            bootstrap_servers=self.producer._bootstrap_servers,
+            group_id=s.KAFKA_CONSUMER_GROUP,
+            enable_auto_commit=False,
+        )
+        self.consumer.subscribe([KAFKA_TOPIC], listener=_CommitOnRevoke(self))
+        self._slots = asyncio.Semaphore(concurrency)
+        self._offsets: dict[TopicPartition, PartitionOffsets] = {}
+        self._committed: dict[TopicPartition, int] = {}
+        self._lanes: dict[tuple, asyncio.Task] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._stalled: dict[TopicPartition, PartitionOffsets] = {}
+        self._rewinds: set[asyncio.Task] = set()
+        self.dedupe = ProcessedEventFilter()
+        self.stats = {
+            "processed": 0, "failed": 0, "duplicates": 0, "batches": 0, "envelopes": 0, "mongo_round_trips": 0,
+            "retries": 0, "dead_lettered": 0, "stalls": 0, "rewinds": 0,
+        }
+
+    async def start(self):
+        """
+        Consume order events. The producer is the shared process-wide instance,
+        so its lifecycle is owned by the application lifespan, not by the worker.
+        """
+        await self.consumer.start()
+        committer = asyncio.create_task(self._commit_periodically())
+        STATS.register("kafka_consumer", lambda: self.stats, tuple(self.stats))
+        STATS.register("event_dedupe", lambda: self.dedupe.stats, ProcessedEventFilter.COUNTERS)
+        try:
+            if s.KAFKA_CONSUMER_BATCH_MODE:
+                await self._consume_batches()
+            else:
+                async for msg in self.consumer:
+                    await self._dispatch(msg)
+        finally:
+            STATS.unregister("kafka_consumer")
+            STATS.unregister("event_dedupe")
+            committer.cancel()
+            for rewind in list(self._rewinds):
+                rewind.cancel()
+            await self._drain()
+            await self._commit()
+            await self.consumer.stop()
+
+    async def _consume_batches(self):
+        while True:
+            batches = await self.consumer.getmany(
+                timeout_ms=s.KAFKA_CONSUMER_BATCH_TIMEOUT_MS,
+                max_records=s.KAFKA_CONSUMER_BATCH_SIZE,
+            )
+            messages = [msg for partition_messages in batches.values() for msg in partition_messages]
+            if not messages:
+                continue
+            tracked = []
+            for tp, partition_messages in batches.items():
+                offsets = self._offsets.setdefault(tp, PartitionOffsets())
+                for msg in partition_messages:
+                    offsets.track(msg.offset)
+                    tracked.append((tp, offsets, msg.offset))
+            # Tracked like the streaming handlers, so a rebalance waits for it in _drain
+            batch = asyncio.create_task(self._run_batch(messages, tracked))
+            self._tasks.add(batch)
+            batch.add_done_callback(self._tasks.discard)
+            await batch
+            await self._commit()
+
+    async def _run_batch(self, messages: list, tracked: list[tuple]):
+        try:
+            await self.handle_batch(messages)
+        except Exception:
+            # Leave the offsets pending and replay the batch's partitions later
+            logger.exception("Failed to handle a batch of %d messages", len(messages))
+            for tp, offsets in {tp: offsets for tp, offsets, _ in tracked}.items():
+                self._stall(tp, offsets)
+            return
+        # Completed on the objects they were tracked on: a partition revoked meanwhile
+        # has already been dropped from `_offsets`, and may even be assigned again
+        for _, offsets, offset in tracked:
+            offsets.complete(offset)
+
+    async def _dispatch(self, msg):
+        """Schedule a message behind the previous one of the same partition and key"""
+        tp = TopicPartition(msg.topic, msg.partition)
+        offsets = self._offsets.setdefault(tp, PartitionOffsets())
+        offsets.track(msg.offset)
+
+        # Blocks the fetch loop once `concurrency` handlers are in flight
+        await self._slots.acquire()
+        lane = (tp, msg.key)
+        task = asyncio.create_task(self._process(msg, tp, offsets, self._lanes.get(lane)))
+        self._lanes[lane] = task
+        self._tasks.add(task)
+        task.add_done_callback(lambda t: self._release_lane(lane, t))
+
+    def _release_lane(self, lane: tuple, task: asyncio.Task):
+        self._tasks.discard(task)
+        if self._lanes.get(lane) is task:
+            del self._lanes[lane]
+
+    async def _process(self, msg, tp: TopicPartition, offsets: PartitionOffsets, previous: asyncio.Task | None):
+        try:
+            if previous is not None:
+                await asyncio.wait([previous])
+            if self._stalled.get(tp) is offsets:
+                # Delivered again once the partition is rewound
+                return
+            if msg.value is not None:
+                await self.handle_message(msg.value, msg.headers, f"{tp.partition}:{msg.offset}")
+        except Exception:
+            logger.exception("Failed to handle message %s:%s", tp.partition, msg.offset)
+            self._stall(tp, offsets)
+        else:
+            offsets.complete(msg.offset)
+        finally:
+            self._slots.release()
+
+    def _stall(self, tp: TopicPartition, offsets: PartitionOffsets):
+        """Stop consuming a partition whose pending offset could not be handled; rewind it later"""
+        if self._offsets.get(tp) is not offsets or tp in self._stalled:
+            return
+        self._stalled[tp] = offsets
+        self.stats["stalls"] += 1
+        self.consumer.pause(tp)
+        # Not in `_tasks`: a rebalance or shutdown must not wait for the stall to run out
+        task = asyncio.create_task(self._rewind(tp, offsets))
+        self._rewinds.add(task)
+        task.add_done_callback(self._rewinds.discard)
+
+    async def _rewind(self, tp: TopicPartition, offsets: PartitionOffsets):
+        await asyncio.sleep(s.KAFKA_CONSUMER_STALL_SECONDS)
+        lanes = [task for (lane_tp, _), task in list(self._lanes.items()) if lane_tp == tp]
+        if lanes:
+            await asyncio.wait(lanes)
+        if self._stalled.get(tp) is not offsets or self._offsets.get(tp) is not offsets:
+            return  # revoked meanwhile
+        try:
+            await self._commit()
+            self.consumer.seek(tp, offsets.first_pending)
+        except Exception:
+            logger.exception("Failed to rewind partition %s", tp.partition)
+            self._stalled.pop(tp, None)
+            self._stall(tp, offsets)
+            return
+        self._offsets[tp] = PartitionOffsets()
+        del self._stalled[tp]
+        self.consumer.resume(tp)
+        self.stats["rewinds"] += 1
+        logger.warning("Rewound partition %s to offset %s", tp.partition, offsets.first_pending)
+
+    async def _drain(self):
+        if self._tasks:
+            await asyncio.wait(list(self._tasks))
+
+    async def _commit(self):
+        to_commit = {
+            tp: offsets.committable
+            for tp, offsets in self._offsets.items()
+            if offsets.committable is not None and offsets.committable != self._committed.get(tp)
+        }
+        if not to_commit:
+            return
+        await self.consumer.commit(to_commit)
+        self._committed.update(to_commit)
+
+    async def _commit_periodically(self):
+        while True:
+            await asyncio.sleep(s.KAFKA_CONSUMER_COMMIT_INTERVAL_SECONDS)
+            try:
+                await self._commit()
+            except Exception:
+                logger.exception("Failed to commit offsets")
+
+    def decode(self, payload: bytes, headers=()) -> list:
+        """The OrderEvents carried by a record, whichever of the two formats it uses"""
+        if is_event_batch(headers):
+            envelope = order_events_pb2.OrderEventBatch()
+            envelope.ParseFromString(payload)
+            self.stats["envelopes"] += 1
+            return list(envelope.events)
+        event = order_events_pb2.OrderEvent()
+        event.ParseFromString(payload)
+        return [event]
+
+    async def handle_message(self, payload: bytes, headers=(), location: str = "-"):
+        if is_event_batch(headers):
+            # The record already holds one of the worker's slots; its lanes must not wait for more
+            await self._process_events(
+                [(None, f"{location}/{event.event_id}", event) for event in self.decode(payload, headers)],
+                gate=contextlib.nullcontext(),
+            )
+            return
+
+        event, = self.decode(payload)
+
+        # Idempotency check, in memory first
+        verdict = self.dedupe.check(event)
+        if verdict in NEEDS_LOOKUP:
+            self.stats["mongo_round_trips"] += 1
+            processed = await self.mongo_db.processed_events.find_one({"event_id": event.event_id}, {"_id": 1})
+            self.dedupe.confirm(event.event_id, verdict, processed is not None)
+            if processed:
+                verdict = DUPLICATE
+
+        if verdict == DUPLICATE:
+            self.stats["duplicates"] += 1
+            return
+
+        if await self._process_with_retries(event, location):
+            await self._record_processed([event])
+
+    async def handle_batch(self, messages: list):
+        """
+        Process a polled batch: one lookup for already-processed events, the new events
+        in per-order order, and one write marking them processed.
+        """
+        self.stats["batches"] += 1
+        entries = []
+        for msg in messages:
+            if msg.value is None:
+                continue
+            for event in self.decode(msg.value, msg.headers):
+                entries.append((msg.partition, f"{msg.partition}:{msg.offset}", event))
+        await self._process_events(entries)
+
+    async def _process_events(self, entries: list[tuple], gate=None):
+        """
+        Deduplicate `(partition, location, event)` entries against `dedupe` and, for the
+        events it cannot settle, processed_events with one lookup; process the new events with one lane per partition and order, and
+        mark them processed with one write. Each event holds `gate` (default: one of the
+        worker's slots) while it is processed.
+        """
+        events: dict[str, tuple] = {}
+        for entry in entries:
+            events.setdefault(entry[2].event_id, entry)
+        if not events:
+            return
+
+        verdicts = {event_id: self.dedupe.check(entry[2]) for event_id, entry in events.items()}
+        lookups = [event_id for event_id, verdict in verdicts.items() if verdict in NEEDS_LOOKUP]
+        seen = await self._find_processed(lookups) if lookups else set()
+        for event_id in lookups:
+            self.dedupe.confirm(event_id, verdicts[event_id], event_id in seen)
+        seen.update(event_id for event_id, verdict in verdicts.items() if verdict == DUPLICATE)
+        self.stats["duplicates"] += len(entries) - len(events) + len(seen)
+
+        lanes: dict[tuple, list] = {}
+        for event_id, (partition, location, event) in events.items():
+            if event_id not in seen:
+                lanes.setdefault((partition, event.order_id), []).append((location, event))
+
+        done: list = []
+        results = await asyncio.gather(
+            *(self._process_lane(lane, gate or self._slots, done) for lane in lanes.values()),
+            return_exceptions=True,
+        )
+        # Record what succeeded even if a lane failed, so a redelivery skips it
+        await self._record_processed(done)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+    async def _process_lane(self, lane: list, gate, done: list):
+        """
+        Process the events of one partition/order in order, appending the ones that
+        succeeded to `done`. Stops at the first event that can't even be dead-lettered.
+        """
+        for location, event in lane:
+            async with gate:
+                if await self._process_with_retries(event, location):
+                    done.append(event)
+
+    async def _process_with_retries(self, event, location: str) -> bool:
+        """
+        Process an event, retrying with exponential backoff. Returns False when it was
+        dead-lettered instead; raises when the dead-letter publish fails too, or when a
+        RETRY_LATER_ERRORS conflict outlasts the retries, so its partition is stalled
+        and the record replayed.
+        """
+        for attempt in range(1, s.KAFKA_CONSUMER_MAX_ATTEMPTS + 1):
+            try:
+                await self.process_event(event)
+                self.stats["processed"] += 1
+                return True
+            except Exception as e:
+                error = e
+                permanent = isinstance(e, NON_RETRYABLE_ERRORS) and not isinstance(e, RETRY_LATER_ERRORS)
+                if permanent or attempt == s.KAFKA_CONSUMER_MAX_ATTEMPTS:
+                    break
+                self.stats["retries"] += 1
+                logger.warning("Attempt %d for event %s (%s) failed: %s", attempt, event.event_id, location, e)
+                await asyncio.sleep(s.KAFKA_CONSUMER_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1))
+
+        self.stats["failed"] += 1
+        if isinstance(error, RETRY_LATER_ERRORS):
+            raise error
+        await self._dead_letter(event, location, error, attempt)
+        return False
+
+    async def _dead_letter(self, event, location: str, error: Exception, attempts: int):
+        """Park an event that keeps failing on the dead-letter topic, as a single OrderEvent record"""
+        await self.producer.publish_dead_letter(event.order_id, event.SerializeToString(), [
+            ("source", location.encode("utf-8")),
+            ("attempts", str(attempts).encode("utf-8")),
+            ("error", f"{type(error).__name__}: {error}"[:1000].encode("utf-8")),
+        ])
+        self.stats["dead_lettered"] += 1
+        logger.error(
+            "Dead-lettered event %s (%s) after %d attempts: %s", event.event_id, location, attempts, error
+        )
+
+    async def _find_processed(self, event_ids: list[str]) -> set[str]:
+        self.stats["mongo_round_trips"] += 1
+        cursor = self.mongo_db.processed_events.find(
+            {"event_id": {"$in": event_ids}}, {"event_id": 1, "_id": 0}
+        ).batch_size(len(event_ids))
+        return {doc["event_id"] async for doc in cursor}
+
+    async def _record_processed(self, events: list):
+        """Mark events processed; the unique index on event_id makes this idempotent"""
+        if not events:
+            return
+        now = datetime.datetime.now(datetime.timezone.utc)
+        self.stats["mongo_round_trips"] += 1
+        try:
+            await self.mongo_db.processed_events.insert_many(
+                [{"event_id": e.event_id, "order_id": e.order_id, "processed_at": now} for e in events],
+                ordered=False,
+            )
+        except BulkWriteError as e:
+            if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+                raise
+        self.dedupe.add(event.event_id for event in events)
+
+    async def process_event(self, event):
+        if event.event_type == order_events_pb2.ORDER_CREATED:
+            async with self.pg_sessionmaker() as session:
+                from src.order.services import OrderService
+                service = OrderService(session, self.mongo_db, self.producer)
+                await service.create_order(
+                    {"user_id": event.order_created.customer.user_id,
+                     "email": event.order_created.customer.email},
+                    [{"sku": it.sku, "quantity": it.quantity} for it in event.order_created.items]
+                )
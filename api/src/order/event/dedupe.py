@@ -0,0 +1,179 @@
+import datetime
+import hashlib
+import logging
+import math
+from typing import Iterable
+
+from src.config.settings import settings as s
+from src.utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+NEW = "new"
+DUPLICATE = "duplicate"
+SUSPECTED = "suspected"
+UNKNOWN = "unknown"
+# Verdicts that still need the processed_events lookup
+NEEDS_LOOKUP = (SUSPECTED, UNKNOWN)
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings, sized for `capacity` items at `error_rate`.
+    Never yields false negatives; false positives grow past `capacity`.
+    """
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = max(capacity, 1)
+        self.size = max(int(math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2)), 8)
+        self.hashes = max(int(round(self.size / self.capacity * math.log(2))), 1)
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        # Double hashing over the two halves of one 128-bit digest
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        for n in range(self.hashes):
+            yield (first + n * second) % self.size
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    @property
+    def estimated_false_positive_rate(self) -> float:
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
+
+
+class ProcessedEventFilter:
+    """
+    In-memory front for the `processed_events` idempotency check of KafkaWorker.
+
+    `check` answers without a Mongo round trip whenever it can:
+    - DUPLICATE: the event id is in the LRU of ids recently recorded or confirmed processed
+    - NEW: the Bloom filter has never seen the id, so it cannot be in processed_events
+    - SUSPECTED: a Bloom hit, i.e. a probable duplicate
+    - UNKNOWN: the filter cannot vouch for the event
+
+    For the last two the caller asks Mongo and reports the answer through `confirm`.
+
+    The Bloom filter is rebuilt from processed_events whenever the worker is assigned
+    partitions (which includes start), loading the EVENT_DEDUPE_BLOOM_CAPACITY most
+    recently processed ids. When that cap truncates the load, events older than the
+    oldest loaded id (minus a clock skew margin) are always UNKNOWN, so the filter
+    never reports NEW for an event that Mongo knows. Until the first rebuild succeeds
+    every lookup is UNKNOWN, i.e. plain Mongo dedupe.
+    """
+    COUNTERS = (
+        "lru_hits", "bloom_negatives", "bloom_positives", "confirmed_duplicates",
+        "false_positives", "unverifiable", "rebuilds", "rebuild_failures",
+    )
+
+    def __init__(
+        self,
+        enabled: bool = s.EVENT_DEDUPE_FILTER_ENABLED,
+        capacity: int = s.EVENT_DEDUPE_BLOOM_CAPACITY,
+        error_rate: float = s.EVENT_DEDUPE_BLOOM_ERROR_RATE,
+        lru_size: int = s.EVENT_DEDUPE_LRU_SIZE,
+        clock_skew_seconds: float = 60.0,
+    ):
+        self.enabled = enabled
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.clock_skew_seconds = clock_skew_seconds
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._recent = LRUCache(lru_size, s.PROCESSED_EVENTS_TTL_SECONDS)
+        self._ready = False
+        self._horizon: float | None = None
+        self._added_during_rebuild: list[str] | None = None
+        self._counters = dict.fromkeys(self.COUNTERS, 0)
+
+    async def rebuild(self, mongo_db):
+        if not self.enabled:
+            return
+        self._ready = False
+        self._added_during_rebuild = []
+        try:
+            bloom = BloomFilter(self.capacity, self.error_rate)
+            oldest = None
+            cursor = (
+                mongo_db.processed_events.find({}, {"event_id": 1, "processed_at": 1, "_id": 0})
+                .sort("processed_at", -1)
+                .limit(self.capacity)
+                .batch_size(10000)
+            )
+            async for doc in cursor:
+                bloom.add(doc["event_id"])
+                oldest = doc["processed_at"]
+            for event_id in self._added_during_rebuild:
+                bloom.add(event_id)
+        except Exception:
+            self._counters["rebuild_failures"] += 1
+            logger.exception("Failed to rebuild processed events filter")
+            return
+        finally:
+            self._added_during_rebuild = None
+
+        self._bloom = bloom
+        self._horizon = self._timestamp(oldest) - self.clock_skew_seconds if bloom.count >= self.capacity else None
+        self._ready = True
+        self._counters["rebuilds"] += 1
+
+    @staticmethod
+    def _timestamp(value: datetime.datetime) -> float:
+        # pymongo returns naive UTC datetimes unless the client is tz-aware
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=datetime.timezone.utc)
+        return value.timestamp()
+
+    def check(self, event) -> str:
+        if not self.enabled:
+            return UNKNOWN
+        if self._recent.get(event.event_id, False):
+            self._counters["lru_hits"] += 1
+            return DUPLICATE
+        if not self._ready or (self._horizon is not None and event.timestamp.seconds < self._horizon):
+            self._counters["unverifiable"] += 1
+            return UNKNOWN
+        if event.event_id in self._bloom:
+            self._counters["bloom_positives"] += 1
+            return SUSPECTED
+        self._counters["bloom_negatives"] += 1
+        return NEW
+
+    def confirm(self, event_id: str, verdict: str, processed: bool):
+        """Record the Mongo answer for an event that `check` could not settle"""
+        if not self.enabled:
+            return
+        if processed:
+            self._counters["confirmed_duplicates"] += 1
+            self._recent.put(event_id, True)
+        elif verdict == SUSPECTED:
+            self._counters["false_positives"] += 1
+
+    def add(self, event_ids: Iterable[str]):
+        """Remember events that are now stored in processed_events"""
+        if not self.enabled:
+            return
+        for event_id in event_ids:
+            self._bloom.add(event_id)
+            self._recent.put(event_id, True)
+            if self._added_during_rebuild is not None:
+                self._added_during_rebuild.append(event_id)
+
+    @property
+    def stats(self) -> dict:
+        positives = self._counters["bloom_positives"]
+        return {
+            **self._counters,
+            "bloom_items": self._bloom.count,
+            "bloom_capacity": self.capacity,
+            "false_positive_rate": self._counters["false_positives"] / positives if positives else 0.0,
+            "estimated_false_positive_rate": self._bloom.estimated_false_positive_rate,
+            "lru_size": len(self._recent),
+        }
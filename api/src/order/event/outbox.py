@@ -0,0 +1,139 @@
+import uuid
+import asyncio
+import datetime
+import logging
+from src.config.settings import settings as s
+from src.order.constants import OUTBOX_ORDER_CREATED
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxRelay:
+    """
+    Drains `order_outbox` rows written by `OrderService.create_order`.
+
+    Rows are claimed in batches with a lease (`claim_id` + `claimed_at`), so several
+    relays can run side by side and a row whose relay died is picked up again once
+    the lease expires. Failed rows are retried with exponential backoff until
+    OUTBOX_MAX_ATTEMPTS, then the order is failed and its stock released; the row is
+    only marked failed once that release went through, and retried otherwise.
+    """
+    def __init__(
+        self,
+        mongo_db,
+        pg_sessionmaker,
+        kafka_producer,
+        payments,
+        batch_size: int = s.OUTBOX_BATCH_SIZE,
+        concurrency: int = s.OUTBOX_RELAY_CONCURRENCY,
+    ):
+        self.mongo_db = mongo_db
+        self.pg_sessionmaker = pg_sessionmaker
+        self.producer = kafka_producer
+        self.payments = payments
+        self.batch_size = batch_size
+        self._slots = asyncio.Semaphore(concurrency)
+        self._stopped = asyncio.Event()
+        self.stats = {"claimed": 0, "sent": 0, "retried": 0, "failed": 0}
+
+    async def run(self):
+        """Relay until `stop` is called; sleeps only when the outbox is drained"""
+        while not self._stopped.is_set():
+            try:
+                claimed = await self.relay_once()
+            except Exception:
+                claimed = 0
+                logger.exception("Outbox relay iteration failed")
+            if claimed < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._stopped.wait(), timeout=s.OUTBOX_POLL_INTERVAL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def stop(self):
+        self._stopped.set()
+
+    async def relay_once(self) -> int:
+        rows = await self.claim_batch()
+        if rows:
+            await asyncio.gather(*(self._relay(row) for row in rows))
+        return len(rows)
+
+    async def claim_batch(self) -> list[dict]:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        claimable = {"$or": [
+            {"status": "pending", "available_at": {"$lte": now}},
+            {"status": "claimed", "claimed_at": {"$lt": now - datetime.timedelta(seconds=s.OUTBOX_LEASE_SECONDS)}},
+        ]}
+        ids = [
+            row["_id"]
+            async for row in self.mongo_db.order_outbox.find(claimable, {"_id": 1})
+            .sort("available_at", 1)
+            .limit(self.batch_size)
+        ]
+        if not ids:
+            return []
+
+        # The filter is re-evaluated per document, so concurrent relays never share a row
+        claim_id = uuid.uuid4().hex
+        await self.mongo_db.order_outbox.update_many(
+            {"_id": {"$in": ids}, **claimable},
+            {"$set": {"status": "claimed", "claim_id": claim_id, "claimed_at": now}, "$inc": {"attempts": 1}},
+        )
+        rows = await self.mongo_db.order_outbox.find({"claim_id": claim_id}).to_list(length=None)
+        self.stats["claimed"] += len(rows)
+        return rows
+
+    async def _relay(self, row: dict):
+        async with self._slots:
+            try:
+                await self._handle(row)
+            except Exception as e:
+                await self._reschedule(row, e)
+                return
+            await self.mongo_db.order_outbox.update_one(
+                {"_id": row["_id"], "claim_id": row["claim_id"]},
+                {"$set": {"status": "sent", "sent_at": datetime.datetime.now(datetime.timezone.utc)}},
+            )
+            self.stats["sent"] += 1
+
+    async def _handle(self, row: dict):
+        if row["type"] != OUTBOX_ORDER_CREATED:
+            raise ValueError(f"Unknown outbox row type '{row['type']}'")
+
+        from src.order.services import OrderService
+        payload = row["payload"]
+        async with self.pg_sessionmaker() as session:
+            service = OrderService(session, self.mongo_db, self.producer, self.payments)
+            await service.process_payment_and_publish(
+                row["order_id"], payload["items"], payload["total"], payload["customer"]
+            )
+
+    async def _reschedule(self, row: dict, error: Exception):
+        if row["attempts"] >= s.OUTBOX_MAX_ATTEMPTS:
+            from src.order.services import OrderService
+            try:
+                async with self.pg_sessionmaker() as session:
+                    service = OrderService(session, self.mongo_db, self.producer)
+                    await service.fail_order(row["order_id"], row["payload"]["items"])
+            except Exception as e:
+                # The order keeps its releasing status; retrying the row finishes the release
+                error = e
+            else:
+                self.stats["failed"] += 1
+                await self.mongo_db.order_outbox.update_one(
+                    {"_id": row["_id"], "claim_id": row["claim_id"]},
+                    {"$set": {"status": "failed", "error": str(error)}},
+                )
+                return
+
+        self.stats["retried"] += 1
+        backoff = datetime.timedelta(seconds=2 ** row["attempts"])
+        await self.mongo_db.order_outbox.update_one(
+            {"_id": row["_id"], "claim_id": row["claim_id"]},
+            {"$set": {
+                "status": "pending",
+                "available_at": datetime.datetime.now(datetime.timezone.utc) + backoff,
+                "error": str(error),
+            }},
+        )
@@ -1,114 +1,316 @@
-import uuid
-import datetime
-import asyncio
-from typing import Optional, Set
-from aiokafka import AIOKafkaProducer
-from google.protobuf.timestamp_pb2 import Timestamp
-from src.config.settings import settings as s
-from src.order.proto import order_events_pb2
-
-
-class KafkaProducer:
-    def __init__(self):
-        self._producer: Optional[AIOKafkaProducer] = None
-        self._bootstrap_servers = s.KAFKA_BOOTSTRAP_SERVERS
-        self._started = False
-        self._lock = asyncio.Lock()  # Prevent concurrent starts
-        self._pending_tasks: Set[asyncio.Task] = set()  # Track background tasks
-
-    async def start(self):
-        """Start Kafka producer with retry and lock"""
-        async with self._lock:
-            if self._started and self._producer:
-                return
-            max_retries = 3
-            for attempt in range(max_retries):
-                try:
-                    if self._producer:
-                        try:
-                            await self._producer.stop()
-                        except Exception:
-                            pass
-                        self._producer = None
-                    self._producer = AIOKafkaProducer(
-                        bootstrap_servers=self._bootstrap_servers,
-                        retry_backoff_ms=300,
-                        request_timeout_ms=10000,
-                        enable_idempotence=True,
-                    )
-                    await self._producer.start()
-                    self._started = True
-                    return
-                except Exception as e:
-                    self._producer = None
-                    self._started = False
-                    if attempt == max_retries - 1:
-                        raise Exception(f"Failed to start Kafka producer after {max_retries} attempts: {e}")
-                    await asyncio.sleep(2 ** attempt)
-
-    async def stop(self):
-        """Stop Kafka producer safely after all tasks complete"""
-        if self._producer and self._started:
-            # Wait for pending tasks
-            if self._pending_tasks:
-                await asyncio.wait(self._pending_tasks, return_when=asyncio.ALL_COMPLETED)
-            try:
-                await self._producer.stop()
-            finally:
-                self._started = False
-                self._producer = None
-
-    async def is_healthy(self) -> bool:
-        return self._started
-
-    async def publish_order_created(self, order_id: str, customer: dict, items: list, background: bool = True):
-        """Publish order created event, optionally in background"""
-        if not await self.is_healthy():
-            await self.start()
-        if not await self.is_healthy():
-            raise ValueError({
-                "message": "Kafka producer is not available",
-                "method": "KafkaProducer.publish_order_created"
-            })
-
-        async def _send():
-            try:
-                event = order_events_pb2.OrderEvent()
-                event.event_id = str(uuid.uuid4())
-                event.order_id = order_id
-                event.event_type = order_events_pb2.ORDER_CREATED
-                ts = Timestamp()
-                ts.FromDatetime(datetime.datetime.utcnow())
-                event.timestamp.CopyFrom(ts)
-
-                oc = order_events_pb2.OrderCreated()
-                oc.order_id = order_id
-                oc.customer.user_id = customer["user_id"]
-                oc.customer.email = customer["email"]
-
-                for item in items:
-                    oi = order_events_pb2.OrderItem()
-                    oi.sku = item["sku"]
-                    oi.quantity = item["quantity"]
-                    oc.items.append(oi)
-
-                event.order_created.CopyFrom(oc)
-          
-            except Exception as e:
-                # Log properly
-                print(f"Failed to publish order {order_id} event: {e}")
-
-        if background:
-            task = asyncio.create_task(_send())
-            self._pending_tasks.add(task)
-            task.add_done_callback(lambda t: self._pending_tasks.discard(t))
-            return task
-        else:
-            await _send()
-
-    async def __aenter__(self):
-        await self.start()
-        return self
-
-    async def __aexit__(self, exc_type, exc_val, exc_tb):
-        await self.stop()
+import uuid
+import time
+import datetime
+import asyncio
+from typing import Optional
+from aiokafka import AIOKafkaProducer
+from aiokafka.partitioner import DefaultPartitioner
+from google.protobuf.timestamp_pb2 import Timestamp
+from src.config.settings import settings as s
+from src.order.constants import EVENT_BATCH_CONTENT_TYPE, EVENT_CONTENT_TYPE_HEADER, KAFKA_DEAD_LETTER_TOPIC, KAFKA_TOPIC
+from src.order.proto import order_events_pb2
+
+# Wire tag of OrderEventBatch.events: field 3, length-delimited
+_ENVELOPE_EVENTS_TAG = b"\x1a"
+
+
+def _varint(value: int) -> bytes:
+    encoded = bytearray()
+    while value > 0x7F:
+        encoded.append((value & 0x7F) | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+
+class KafkaProducer:
+    """
+    Publishing pipeline for order events.
+
+    Events are serialized on the caller side and put on a bounded in-memory queue.
+    A single sender task drains the queue in batches and hands them to aiokafka,
+    which groups them by partition (linger/batch size) and compresses them.
+    Messages are keyed by order_id, so every event of an order lands on the same
+    partition and keeps its order. A full queue blocks publishers (backpressure)
+    up to KAFKA_PUBLISH_TIMEOUT_SECONDS before the publish is rejected.
+
+    With KAFKA_EVENT_BATCHING_ENABLED the sender packs the events of a drained batch
+    that hash to the same partition into OrderEventBatch envelopes, one record per
+    envelope, flagged with the `content-type: order-event-batch` header. Consumers
+    still accept plain single-event records, so both formats can share the topic.
+    """
+    # Monotonic entries of `stats`, exported as Prometheus counters
+    COUNTERS = ("enqueued", "delivered", "failed", "batches", "envelopes")
+
+    def __init__(self):
+        self._producer: Optional[AIOKafkaProducer] = None
+        self._bootstrap_servers = s.KAFKA_BOOTSTRAP_SERVERS
+        self._started = False
+        self._lock = asyncio.Lock()  # Prevent concurrent starts
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=s.KAFKA_PUBLISH_QUEUE_SIZE)
+        self._sender: Optional[asyncio.Task] = None
+        self._created_at = time.monotonic()
+        self._counters = dict.fromkeys(self.COUNTERS, 0)
+        self._partitioner = DefaultPartitioner()
+
+    def _build_producer(self) -> AIOKafkaProducer:
+        return AIOKafkaProducer(
+            bootstrap_servers=self._bootstrap_servers,
+            retry_backoff_ms=300,
+            request_timeout_ms=10000,
+            enable_idempotence=True,
+            linger_ms=s.KAFKA_LINGER_MS,
+            max_batch_size=s.KAFKA_MAX_BATCH_SIZE,
+            compression_type=s.KAFKA_COMPRESSION_TYPE,
+        )
+
+    async def start(self):
+        """Start Kafka producer with retry and lock"""
+        async with self._lock:
+            if self._sender is None or self._sender.done():
+                self._sender = asyncio.create_task(self._run_sender())
+            if self._started and self._producer:
+                return
+            max_retries = 3
+            for attempt in range(max_retries):
+                try:
+                    if self._producer:
+                        try:
+                            await self._producer.stop()
+                        except Exception:
+                            pass
+                        self._producer = None
+                    self._producer = self._build_producer()
+                    await self._producer.start()
+                    self._started = True
+                    return
+                except Exception as e:
+                    self._producer = None
+                    self._started = False
+                    if attempt == max_retries - 1:
+                        raise Exception(f"Failed to start Kafka producer after {max_retries} attempts: {e}")
+                    await asyncio.sleep(2 ** attempt)
+
+    async def stop(self):
+        """Stop Kafka producer safely after the queue is drained"""
+        if self._sender and not self._sender.done():
+            await self._queue.join()
+            self._sender.cancel()
+            try:
+                await self._sender
+            except asyncio.CancelledError:
+                pass
+        self._sender = None
+        async with self._lock:
+            if not self._producer:
+                return
+            try:
+                await self._producer.stop()
+            finally:
+                self._started = False
+                self._producer = None
+
+    def _mark_unhealthy(self):
+        """Force the next batch to rebuild the connection"""
+        self._started = False
+
+    async def is_healthy(self) -> bool:
+        return self._started
+
+    async def _ensure_started(self) -> AIOKafkaProducer:
+        """
+        The connected AIOKafkaProducer, (re)built first if nothing was published yet or
+        a failed send marked it unhealthy. Callers keep the returned reference, since
+        `self._producer` is None while another task rebuilds it.
+        """
+        if not self._started or self._producer is None:
+            await self.start()
+        producer = self._producer
+        if producer is None:
+            raise ValueError({
+                "message": "Kafka producer is not available",
+                "method": "KafkaProducer._ensure_started"
+            })
+        return producer
+
+    async def ping(self):
+        """Round trip to the brokers, connecting first if nothing was published yet"""
+        producer = await self._ensure_started()
+        await producer.client.fetch_all_metadata()
+
+    @property
+    def stats(self) -> dict:
+        """Throughput and queue-depth counters of the publishing pipeline"""
+        elapsed = max(time.monotonic() - self._created_at, 1e-9)
+        return {
+            **self._counters,
+            "queue_depth": self._queue.qsize(),
+            "queue_capacity": self._queue.maxsize,
+            "events_per_second": self._counters["delivered"] / elapsed,
+        }
+
+    async def _run_sender(self):
+        """Drain the queue in batches until cancelled"""
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < s.KAFKA_PUBLISH_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            try:
+                await self._deliver(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _deliver(self, batch: list[tuple]):
+        """Send a batch and resolve every waiter with its delivery ack"""
+        self._counters["batches"] += 1
+        try:
+            producer = await self._ensure_started()
+            if s.KAFKA_EVENT_BATCHING_ENABLED:
+                results = await self._send_envelopes(producer, batch)
+            else:
+                acks = [
+                    await producer.send(KAFKA_TOPIC, value=value, key=key)
+                    for key, value, _ in batch
+                ]
+                results = await asyncio.gather(*acks, return_exceptions=True)
+        except Exception as e:
+            results = [e] * len(batch)
+
+        for (_, _, waiter), result in zip(batch, results):
+            if isinstance(result, Exception):
+                self._counters["failed"] += 1
+                self._mark_unhealthy()
+                if waiter and not waiter.done():
+                    waiter.set_exception(result)
+            else:
+                self._counters["delivered"] += 1
+                if waiter and not waiter.done():
+                    waiter.set_result(result)
+
+    async def _send_envelopes(self, producer: AIOKafkaProducer, batch: list[tuple]) -> list:
+        """
+        Group the batch by the partition each key hashes to and send every group as
+        envelopes of up to KAFKA_EVENT_BATCH_MAX_EVENTS events. Events keep their queue
+        order inside an envelope, so per-order ordering holds; each event resolves with
+        the ack of its envelope.
+        """
+        partitions = sorted(await producer.partitions_for(KAFKA_TOPIC))
+        groups: dict[int, list[int]] = {}
+        for index, (key, _, _) in enumerate(batch):
+            groups.setdefault(self._partitioner(key, partitions, partitions), []).append(index)
+
+        chunks, acks = [], []
+        for partition, indexes in groups.items():
+            for start in range(0, len(indexes), s.KAFKA_EVENT_BATCH_MAX_EVENTS):
+                chunk = indexes[start:start + s.KAFKA_EVENT_BATCH_MAX_EVENTS]
+                acks.append(await producer.send(
+                    KAFKA_TOPIC,
+                    value=self._build_envelope([batch[index][1] for index in chunk]),
+                    partition=partition,
+                    headers=[(EVENT_CONTENT_TYPE_HEADER, EVENT_BATCH_CONTENT_TYPE)],
+                ))
+                chunks.append(chunk)
+        self._counters["envelopes"] += len(acks)
+
+        results = [None] * len(batch)
+        for chunk, result in zip(chunks, await asyncio.gather(*acks, return_exceptions=True)):
+            for index in chunk:
+                results[index] = result
+        return results
+
+    @staticmethod
+    def _build_envelope(values: list[bytes]) -> bytes:
+        """
+        Wrap already serialized OrderEvents in an OrderEventBatch. Each event is appended
+        as an encoded `events` entry instead of being parsed back into a message.
+        """
+        envelope = order_events_pb2.OrderEventBatch(batch_id=str(uuid.uuid4()), count=len(values))
+        return envelope.SerializeToString() + b"".join(
+            _ENVELOPE_EVENTS_TAG + _varint(len(value)) + value for value in values
+        )
+
+    async def _enqueue(self, key: str, value: bytes, wait_for_ack: bool):
+        waiter = asyncio.get_running_loop().create_future() if wait_for_ack else None
+        entry = (key.encode("utf-8"), value, waiter)
+        try:
+            self._queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            await self._wait_for_capacity(entry)
+        self._counters["enqueued"] += 1
+        if waiter:
+            return await waiter
+
+    async def _wait_for_capacity(self, entry: tuple):
+        """Backpressure: block the publisher until the sender frees a slot"""
+        try:
+            await asyncio.wait_for(self._queue.put(entry), timeout=s.KAFKA_PUBLISH_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            raise ValueError({
+                "message": "Kafka publish queue is full",
+                "queue_depth": self._queue.qsize(),
+                "method": "KafkaProducer._wait_for_capacity"
+            })
+
+    def _build_order_created(self, order_id: str, customer: dict, items: list) -> order_events_pb2.OrderEvent:
+        event = order_events_pb2.OrderEvent()
+        event.event_id = str(uuid.uuid4())
+        event.order_id = order_id
+        event.event_type = order_events_pb2.ORDER_CREATED
+        ts = Timestamp()
+        ts.FromDatetime(datetime.datetime.utcnow())
+        event.timestamp.CopyFrom(ts)
+
+        oc = order_events_pb2.OrderCreated()
+        oc.order_id = order_id
+        oc.customer.user_id = customer["user_id"]
+        oc.customer.email = customer["email"]
+
+        for item in items:
+            oi = order_events_pb2.OrderItem()
+            oi.sku = item["sku"]
+            oi.quantity = item["quantity"]
+            oc.items.append(oi)
+
+        event.order_created.CopyFrom(oc)
+        return event
+
+    async def publish_order_created(self, order_id: str, customer: dict, items: list, background: bool = True):
+        """
+        Publish order created event.
+        With background=True the event is only enqueued; otherwise this waits for the broker ack.
+        """
+        if not await self.is_healthy():
+            await self.start()
+        if not await self.is_healthy():
+            raise ValueError({
+                "message": "Kafka producer is not available",
+                "method": "KafkaProducer.publish_order_created"
+            })
+
+        event = self._build_order_created(order_id, customer, items)
+        return await self._enqueue(order_id, event.SerializeToString(), wait_for_ack=not background)
+
+    async def publish_dead_letter(self, key: str, value: bytes, headers: list[tuple[str, bytes]]):
+        """
+        Publish a record the consumer gave up on to the dead-letter topic and wait for
+        the broker ack. Bypasses the queue: the consumer must not move on before it lands.
+        """
+        producer = await self._ensure_started()
+        try:
+            await producer.send_and_wait(
+                KAFKA_DEAD_LETTER_TOPIC, value=value, key=key.encode("utf-8"), headers=headers
+            )
+        except Exception:
+            self._mark_unhealthy()
+            raise
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
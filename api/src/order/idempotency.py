@@ -0,0 +1,170 @@
+import datetime
+import logging
+from typing import Optional
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from src.config.settings import settings as s
+from src.order.exceptions import OrderIdempotencyError
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyStore:
+    """
+    Idempotency keys for order creation, one document per key in `idempotency_keys`.
+
+    The key is the document `_id`, so claiming it is a single insert that either wins
+    or hits the unique index. Keys expire through a TTL index on `expires_at`.
+
+    An `in_progress` claim also carries a short lease (IDEMPOTENCY_LEASE_SECONDS): if
+    the process that owns it dies before completing or releasing it, a retry of the same
+    request takes the key over once the lease runs out instead of getting a conflict
+    until the key expires. The lease must outlast a slow order creation.
+
+    Orders are written with their key and response (`idempotency`), so a takeover
+    whose original request did create the order, but never completed the key, replays
+    that order instead of creating a second one.
+    """
+
+    def __init__(self, mongo_db):
+        self.collection = mongo_db.idempotency_keys
+        self.orders = mongo_db.orders
+
+    @staticmethod
+    def build_key(user_id: str, idempotency_key: Optional[str], order_hash: str) -> tuple[str, int]:
+        """
+        Client keys are scoped per user and kept for a day; without one, the request hash
+        collapses retried submissions for a short window only.
+        """
+        if idempotency_key:
+            return f"key:{user_id}:{idempotency_key}", s.IDEMPOTENCY_KEY_TTL_SECONDS
+        return f"hash:{order_hash}", s.IDEMPOTENCY_HASH_TTL_SECONDS
+
+    @staticmethod
+    def _claim_document(key: str, request_hash: str, ttl_seconds: int, now: datetime.datetime) -> dict:
+        # Timezone-aware so the TTL index expires keys in UTC whatever the server's local time
+        return {
+            "_id": key,
+            "request_hash": request_hash,
+            "status": "in_progress",
+            "created_at": now,
+            "expires_at": now + datetime.timedelta(seconds=ttl_seconds),
+            "lease_expires_at": now + datetime.timedelta(seconds=min(s.IDEMPOTENCY_LEASE_SECONDS, ttl_seconds)),
+        }
+
+    async def claim(self, key: str, request_hash: str, ttl_seconds: int) -> Optional[dict]:
+        """
+        Claim `key` for a new request.
+        Returns None when the caller owns the key, or the stored response when the
+        original request already completed (or created its order before it died).
+        """
+        now = datetime.datetime.now(datetime.timezone.utc)
+        doc = self._claim_document(key, request_hash, ttl_seconds, now)
+        try:
+            await self.collection.insert_one(doc)
+            return None
+        except DuplicateKeyError:
+            pass
+
+        # Take over a key the TTL monitor (which only runs once a minute) has not reaped
+        # yet, or a claim of this same request whose owner died and let its lease run out
+        expired = (await self.collection.delete_one({"_id": key, "expires_at": {"$lte": now}})).deleted_count
+        abandoned = False
+        if not expired:
+            abandoned = bool((await self.collection.delete_one({
+                "_id": key, "status": "in_progress", "request_hash": request_hash, "lease_expires_at": {"$lte": now},
+            })).deleted_count)
+        if expired or abandoned:
+            try:
+                await self.collection.insert_one(doc)
+            except DuplicateKeyError:
+                pass
+            else:
+                if abandoned:
+                    return await self._recover(key, since=now - datetime.timedelta(seconds=ttl_seconds))
+                return None
+
+        existing = await self.collection.find_one({"_id": key})
+        if existing is None:
+            raise OrderIdempotencyError("Idempotency key was released concurrently, retry the request")
+        if existing["request_hash"] != request_hash:
+            raise OrderIdempotencyError("Idempotency key was already used with a different order payload")
+        if existing["status"] != "completed":
+            raise OrderIdempotencyError("An order with this idempotency key is already being processed")
+        return existing["response"]
+
+    async def _recover(self, key: str, since: datetime.datetime) -> Optional[dict]:
+        """
+        Response of the order an abandoned claim created before it could complete the key,
+        stored as the key's response; None when it created none and the new owner goes ahead.
+        Orders older than `since` (one TTL) belong to an earlier use of a reused key.
+        """
+        order = await self.orders.find_one(
+            {"idempotency.key": key, "created_at": {"$gt": since}}, {"_id": 0, "idempotency.response": 1}
+        )
+        if order is None:
+            return None
+        response = order["idempotency"]["response"]
+        await self.complete(key, response)
+        return response
+
+    async def claim_many(self, claims: list[tuple[str, str, int]]) -> list[Optional[dict] | Exception]:
+        """
+        Claim several (key, request_hash, ttl_seconds) at once with one unordered insert.
+        Keys that already exist go through `claim`; their conflicts are returned, not raised.
+        """
+        now = datetime.datetime.now(datetime.timezone.utc)
+        docs = [
+            self._claim_document(key, request_hash, ttl_seconds, now)
+            for key, request_hash, ttl_seconds in claims
+        ]
+        results: list[Optional[dict] | Exception] = [None] * len(claims)
+        if not docs:
+            return results
+        try:
+            await self.collection.insert_many(docs, ordered=False)
+            return results
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(error["code"] != 11000 for error in errors):
+                raise
+            taken = [error["index"] for error in errors]
+
+        for index in taken:
+            try:
+                results[index] = await self.claim(*claims[index])
+            except OrderIdempotencyError as e:
+                results[index] = e
+        return results
+
+    async def complete(self, key: str, response: dict):
+        """Store the response so retries can replay it."""
+        await self.collection.update_one(
+            {"_id": key},
+            {"$set": {"status": "completed", "response": response}},
+        )
+
+    async def release(self, key: str):
+        """Drop a claim whose request failed so the client can retry."""
+        try:
+            await self.collection.delete_one({"_id": key, "status": "in_progress"})
+        except Exception:
+            logger.exception("Failed to release idempotency key %s", key)
+
+    async def complete_many(self, responses: dict[str, dict]):
+        if responses:
+            await self.collection.bulk_write(
+                [
+                    UpdateOne({"_id": key}, {"$set": {"status": "completed", "response": response}})
+                    for key, response in responses.items()
+                ],
+                ordered=False,
+            )
+
+    async def release_many(self, keys: list[str]):
+        if not keys:
+            return
+        try:
+            await self.collection.delete_many({"_id": {"$in": keys}, "status": "in_progress"})
+        except Exception:
+            logger.exception("Failed to release %d idempotency keys", len(keys))
@@ -0,0 +1,68 @@
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+from src.config.settings import settings as s
+
+
+# Indexes made redundant by a wider one; dropped on startup so writes stop maintaining them.
+# Both are prefixes of user_order_history.
+SUPERSEDED_ORDERS_INDEXES = [
+    "customer_user_id_created_at_order_id",
+    "customer.user_id_1_created_at_-1",
+]
+
+ORDERS_INDEXES = [
+    # Covers the user order history query: filter, sort and every projected field live in the index.
+    IndexModel(
+        [
+            ("customer.user_id", ASCENDING),
+            ("created_at", DESCENDING),
+            ("order_id", DESCENDING),
+            ("status", ASCENDING),
+            ("pricing.total", ASCENDING),
+        ],
+        name="user_order_history",
+    ),
+    IndexModel([("status", ASCENDING), ("reservation_expires_at", ASCENDING)], name="status_reservation_expires_at"),
+    IndexModel([("reservation_sweep_id", ASCENDING)], sparse=True, name="reservation_sweep_id"),
+    # Lets a retry find the order of an idempotency key whose claim was never completed
+    IndexModel([("idempotency.key", ASCENDING)], sparse=True, name="idempotency_key"),
+]
+
+PROCESSED_EVENTS_INDEXES = [
+    IndexModel([("event_id", ASCENDING)], unique=True, name="event_id_unique"),
+    IndexModel(
+        [("processed_at", ASCENDING)],
+        expireAfterSeconds=s.PROCESSED_EVENTS_TTL_SECONDS,
+        name="processed_at_ttl",
+    ),
+]
+
+ORDER_OUTBOX_INDEXES = [
+    IndexModel([("status", ASCENDING), ("available_at", ASCENDING)], name="status_available_at"),
+    IndexModel([("status", ASCENDING), ("claimed_at", ASCENDING)], name="status_claimed_at"),
+    IndexModel([("claim_id", ASCENDING)], name="claim_id"),
+    IndexModel(
+        [("sent_at", ASCENDING)],
+        expireAfterSeconds=s.OUTBOX_RETENTION_SECONDS,
+        name="sent_at_ttl",
+    ),
+]
+
+IDEMPOTENCY_KEYS_INDEXES = [
+    IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, name="expires_at_ttl"),
+]
+
+
+async def ensure_indexes(mongo_db):
+    """
+    Create the indexes the order service relies on. Safe to run on every startup.
+    """
+    await mongo_db.orders.create_indexes(ORDERS_INDEXES)
+    for name in SUPERSEDED_ORDERS_INDEXES:
+        try:
+            await mongo_db.orders.drop_index(name)
+        except OperationFailure:
+            pass  # already gone
+    await mongo_db.processed_events.create_indexes(PROCESSED_EVENTS_INDEXES)
+    await mongo_db.order_outbox.create_indexes(ORDER_OUTBOX_INDEXES)
+    await mongo_db.idempotency_keys.create_indexes(IDEMPOTENCY_KEYS_INDEXES)
@@ -25,35 +25,37 @@ _sym_db = _symbol_database.Default()
 from google.protobuf import timestamp_pb2 as google_dot_protobuf_dot_timestamp__pb2
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x12order_events.proto\x12\x10\x65\x63ommerce.orders\x1a\x1fgoogle/protobuf/timestamp.proto\"\x89\x03\n\nOrderEvent\x12\x10\n\x08\x65vent_id\x18\x01 \x01(\t\x12\x10\n\x08order_id\x18\x02 \x01(\t\x12/\n\nevent_type\x18\x03 \x01(\x0e\x32\x1b.ecommerce.orders.EventType\x12-\n\ttimestamp\x18\x04 \x01(\x0b\x32\x1a.google.protobuf.Timestamp\x12\x37\n\rorder_created\x18\x05 \x01(\x0b\x32\x1e.ecommerce.orders.OrderCreatedH\x00\x12?\n\x11payment_processed\x18\x06 \x01(\x0b\x32\".ecommerce.orders.PaymentProcessedH\x00\x12;\n\x0forder_confirmed\x18\x07 \x01(\x0b\x32 .ecommerce.orders.OrderConfirmedH\x00\x12\x35\n\x0corder_failed\x18\x08 \x01(\x0b\x32\x1d.ecommerce.orders.OrderFailedH\x00\x42\t\n\x07payload\"z\n\x0cOrderCreated\x12\x10\n\x08order_id\x18\x01 \x01(\t\x12,\n\x08\x63ustomer\x18\x02 \x01(\x0b\x32\x1a.ecommerce.orders.Customer\x12*\n\x05items\x18\x03 \x03(\x0b\x32\x1b.ecommerce.orders.OrderItem\"]\n\x10PaymentProcessed\x12\x10\n\x08order_id\x18\x01 \x01(\t\x12\x37\n\x0epayment_result\x18\x02 \x01(\x0b\x32\x1f.ecommerce.orders.PaymentResult\"S\n\x0eOrderConfirmed\x12\x10\n\x08order_id\x18\x01 \x01(\t\x12/\n\x07summary\x18\x02 \x01(\x0b\x32\x1e.ecommerce.orders.OrderSummary\"g\n\x0bOrderFailed\x12\x10\n\x08order_id\x18\x01 \x01(\t\x12/\n\x06reason\x18\x02 \x01(\x0e\x32\x1f.ecommerce.orders.FailureReason\x12\x15\n\rerror_message\x18\x03 \x01(\t\"*\n\x08\x43ustomer\x12\x0f\n\x07user_id\x18\x01 \x01(\t\x12\r\n\x05\x65mail\x18\x02 \x01(\t\"[\n\tOrderItem\x12\x12\n\nproduct_id\x18\x01 \x01(\t\x12\x0b\n\x03sku\x18\x02 \x01(\t\x12\x0c\n\x04name\x18\x03 \x01(\t\x12\r\n\x05price\x18\x04 \x01(\x01\x12\x10\n\x08quantity\x18\x05 \x01(\x05\"\x80\x01\n\rPaymentResult\x12/\n\x06status\x18\x01 \x01(\x0e\x32\x1f.ecommerce.orders.PaymentStatus\x12\x16\n\x0etransaction_id\x18\x02 \x01(\t\x12\x0e\n\x06\x61mount\x18\x03 \x01(\x01\x12\x16\n\x0e\x66\x61ilure_reason\x18\x04 \x01(\t\"J\n\x0cOrderSummary\x12\x10\n\x08subtotal\x18\x01 \x01(\x01\x12\x12\n\ntax_amount\x18\x02 \x01(\x01\x12\x14\n\x0ctotal_amount\x18\x03 \x01(\x01*\\\n\tEventType\x12\x11\n\rORDER_CREATED\x10\x00\x12\x15\n\x11PAYMENT_PROCESSED\x10\x01\x12\x13\n\x0fORDER_CONFIRMED\x10\x02\x12\x10\n\x0cORDER_FAILED\x10\x03*O\n\rPaymentStatus\x12\x13\n\x0fPAYMENT_PENDING\x10\x00\x12\x15\n\x11PAYMENT_COMPLETED\x10\x01\x12\x12\n\x0ePAYMENT_FAILED\x10\x02*h\n\rFailureReason\x12\x1a\n\x16INSUFFICIENT_INVENTORY\x10\x00\x12\x14\n\x10PAYMENT_DECLINED\x10\x01\x12\x13\n\x0fINVALID_PRODUCT\x10\x02\x12\x10\n\x0cSYSTEM_ERROR\x10\x03\x62\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x12order_events.proto\x12\x10\x65\x63ommerce.orders\x1a\x1fgoogle/protobuf/timestamp.proto\"\x89\x03\n\nOrderEvent\x12\x10\n\x08\x65vent_id\x18\x01 \x01(\t\x12\x10\n\x08order_id\x18\x02 \x01(\t\x12/\n\nevent_type\x18\x03 \x01(\x0e\x32\x1b.ecommerce.orders.EventType\x12-\n\ttimestamp\x18\x04 \x01(\x0b\x32\x1a.google.protobuf.Timestamp\x12\x37\n\rorder_created\x18\x05 \x01(\x0b\x32\x1e.ecommerce.orders.OrderCreatedH\x00\x12?\n\x11payment_processed\x18\x06 \x01(\x0b\x32\".ecommerce.orders.PaymentProcessedH\x00\x12;\n\x0forder_confirmed\x18\x07 \x01(\x0b\x32 .ecommerce.orders.OrderConfirmedH\x00\x12\x35\n\x0corder_failed\x18\x08 \x01(\x0b\x32\x1d.ecommerce.orders.OrderFailedH\x00\x42\t\n\x07payload\"`\n\x0fOrderEventBatch\x12\x10\n\x08\x62\x61tch_id\x18\x01 \x01(\t\x12\r\n\x05\x63ount\x18\x02 \x01(\r\x12,\n\x06\x65vents\x18\x03 \x03(\x0b\x32\x1c.ecommerce.orders.OrderEvent\"z\n\x0cOrderCreated\x12\x10\n\x08order_id\x18\x01 \x01(\t\x12,\n\x08\x63ustomer\x18\x02 \x01(\x0b\x32\x1a.ecommerce.orders.Customer\x12*\n\x05items\x18\x03 \x03(\x0b\x32\x1b.ecommerce.orders.OrderItem\"]\n\x10PaymentProcessed\x12\x10\n\x08order_id\x18\x01 \x01(\t\x12\x37\n\x0epayment_result\x18\x02 \x01(\x0b\x32\x1f.ecommerce.orders.PaymentResult\"S\n\x0eOrderConfirmed\x12\x10\n\x08order_id\x18\x01 \x01(\t\x12/\n\x07summary\x18\x02 \x01(\x0b\x32\x1e.ecommerce.orders.OrderSummary\"g\n\x0bOrderFailed\x12\x10\n\x08order_id\x18\x01 \x01(\t\x12/\n\x06reason\x18\x02 \x01(\x0e\x32\x1f.ecommerce.orders.FailureReason\x12\x15\n\rerror_message\x18\x03 \x01(\t\"*\n\x08\x43ustomer\x12\x0f\n\x07user_id\x18\x01 \x01(\t\x12\r\n\x05\x65mail\x18\x02 \x01(\t\"[\n\tOrderItem\x12\x12\n\nproduct_id\x18\x01 \x01(\t\x12\x0b\n\x03sku\x18\x02 \x01(\t\x12\x0c\n\x04name\x18\x03 \x01(\t\x12\r\n\x05price\x18\x04 \x01(\x01\x12\x10\n\x08quantity\x18\x05 \x01(\x05\"\x80\x01\n\rPaymentResult\x12/\n\x06status\x18\x01 \x01(\x0e\x32\x1f.ecommerce.orders.PaymentStatus\x12\x16\n\x0etransaction_id\x18\x02 \x01(\t\x12\x0e\n\x06\x61mount\x18\x03 \x01(\x01\x12\x16\n\x0e\x66\x61ilure_reason\x18\x04 \x01(\t\"J\n\x0cOrderSummary\x12\x10\n\x08subtotal\x18\x01 \x01(\x01\x12\x12\n\ntax_amount\x18\x02 \x01(\x01\x12\x14\n\x0ctotal_amount\x18\x03 \x01(\x01*\\\n\tEventType\x12\x11\n\rORDER_CREATED\x10\x00\x12\x15\n\x11PAYMENT_PROCESSED\x10\x01\x12\x13\n\x0fORDER_CONFIRMED\x10\x02\x12\x10\n\x0cORDER_FAILED\x10\x03*O\n\rPaymentStatus\x12\x13\n\x0fPAYMENT_PENDING\x10\x00\x12\x15\n\x11PAYMENT_COMPLETED\x10\x01\x12\x12\n\x0ePAYMENT_FAILED\x10\x02*h\n\rFailureReason\x12\x1a\n\x16INSUFFICIENT_INVENTORY\x10\x00\x12\x14\n\x10PAYMENT_DECLINED\x10\x01\x12\x13\n\x0fINVALID_PRODUCT\x10\x02\x12\x10\n\x0cSYSTEM_ERROR\x10\x03\x62\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'order_events_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
-  _globals['_EVENTTYPE']._serialized_start=1222
-  _globals['_EVENTTYPE']._serialized_end=1314
-  _globals['_PAYMENTSTATUS']._serialized_start=1316
-  _globals['_PAYMENTSTATUS']._serialized_end=1395
-  _globals['_FAILUREREASON']._serialized_start=1397
-  _globals['_FAILUREREASON']._serialized_end=1501
+  _globals['_EVENTTYPE']._serialized_start=1320
+  _globals['_EVENTTYPE']._serialized_end=1412
+  _globals['_PAYMENTSTATUS']._serialized_start=1414
+  _globals['_PAYMENTSTATUS']._serialized_end=1493
+  _globals['_FAILUREREASON']._serialized_start=1495
+  _globals['_FAILUREREASON']._serialized_end=1599
   _globals['_ORDEREVENT']._serialized_start=74
   _globals['_ORDEREVENT']._serialized_end=467
-  _globals['_ORDERCREATED']._serialized_start=469
-  _globals['_ORDERCREATED']._serialized_end=591
-  _globals['_PAYMENTPROCESSED']._serialized_start=593
-  _globals['_PAYMENTPROCESSED']._serialized_end=686
-  _globals['_ORDERCONFIRMED']._serialized_start=688
-  _globals['_ORDERCONFIRMED']._serialized_end=771
-  _globals['_ORDERFAILED']._serialized_start=773
-  _globals['_ORDERFAILED']._serialized_end=876
-  _globals['_CUSTOMER']._serialized_start=878
-  _globals['_CUSTOMER']._serialized_end=920
-  _globals['_ORDERITEM']._serialized_start=922
-  _globals['_ORDERITEM']._serialized_end=1013
-  _globals['_PAYMENTRESULT']._serialized_start=1016
-  _globals['_PAYMENTRESULT']._serialized_end=1144
-  _globals['_ORDERSUMMARY']._serialized_start=1146
-  _globals['_ORDERSUMMARY']._serialized_end=1220
+  _globals['_ORDEREVENTBATCH']._serialized_start=469
+  _globals['_ORDEREVENTBATCH']._serialized_end=565
+  _globals['_ORDERCREATED']._serialized_start=567
+  _globals['_ORDERCREATED']._serialized_end=689
+  _globals['_PAYMENTPROCESSED']._serialized_start=691
+  _globals['_PAYMENTPROCESSED']._serialized_end=784
+  _globals['_ORDERCONFIRMED']._serialized_start=786
+  _globals['_ORDERCONFIRMED']._serialized_end=869
+  _globals['_ORDERFAILED']._serialized_start=871
+  _globals['_ORDERFAILED']._serialized_end=974
+  _globals['_CUSTOMER']._serialized_start=976
+  _globals['_CUSTOMER']._serialized_end=1018
+  _globals['_ORDERITEM']._serialized_start=1020
+  _globals['_ORDERITEM']._serialized_end=1111
+  _globals['_PAYMENTRESULT']._serialized_start=1114
+  _globals['_PAYMENTRESULT']._serialized_end=1242
+  _globals['_ORDERSUMMARY']._serialized_start=1244
+  _globals['_ORDERSUMMARY']._serialized_end=1318
 # @@protoc_insertion_point(module_scope)
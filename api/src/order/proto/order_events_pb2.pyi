@@ -61,6 +61,16 @@ class OrderEvent(_message.Message):
     order_failed: OrderFailed
     def __init__(self, event_id: _Optional[str] = ..., order_id: _Optional[str] = ..., event_type: _Optional[_Union[EventType, str]] = ..., timestamp: _Optional[_Union[datetime.datetime, _timestamp_pb2.Timestamp, _Mapping]] = ..., order_created: _Optional[_Union[OrderCreated, _Mapping]] = ..., payment_processed: _Optional[_Union[PaymentProcessed, _Mapping]] = ..., order_confirmed: _Optional[_Union[OrderConfirmed, _Mapping]] = ..., order_failed: _Optional[_Union[OrderFailed, _Mapping]] = ...) -> None: ...
 
+class OrderEventBatch(_message.Message):
+    __slots__ = ("batch_id", "count", "events")
+    BATCH_ID_FIELD_NUMBER: _ClassVar[int]
+    COUNT_FIELD_NUMBER: _ClassVar[int]
+    EVENTS_FIELD_NUMBER: _ClassVar[int]
+    batch_id: str
+    count: int
+    events: _containers.RepeatedCompositeFieldContainer[OrderEvent]
+    def __init__(self, batch_id: _Optional[str] = ..., count: _Optional[int] = ..., events: _Optional[_Iterable[_Union[OrderEvent, _Mapping]]] = ...) -> None: ...
+
 class OrderCreated(_message.Message):
     __slots__ = ("order_id", "customer", "items")
     ORDER_ID_FIELD_NUMBER: _ClassVar[int]
@@ -1,78 +1,164 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Body
-from sqlalchemy.ext.asyncio import AsyncSession
-from src.order.schemas import OrderCreateSchema, OrderReadSchema, OrderReadByIdSchema, OrdersUserSearchSchema
-from src.order.services import OrderService
-from src.order.dependencies import get_mongo_db, get_kafka_producer
-from src.order.exceptions import OrderInventoryError, OrderProductNotFound, OrderNotFound
-from src.config.database import get_db
-from fastapi_pagination import  Params
-
-router = APIRouter(
-    prefix="/orders",
-    tags=["Orders"]
-)
-
-@router.post("/", status_code=status.HTTP_201_CREATED, response_model=OrderReadSchema)
-async def create_order(
-    order: OrderCreateSchema = Body(),
-    db: AsyncSession = Depends(get_db),
-    mongo_db=Depends(get_mongo_db),
-    kafka_producer=Depends(get_kafka_producer)
-):
-    """
-    1. Validate inventory & reserve
-    2. Publish Kafka event
-    3. Payment + Mongo persistence handled asynchronously by KafkaWorker
-    """
-    try:
-        service = OrderService(db, mongo_db, kafka_producer)
-        customer_dict = order.customer.model_dump()  
-        items_dicts = [item.model_dump() for item in order.items]
-        result = await service.create_order(customer_dict, items_dicts)
-        return result
-    except OrderProductNotFound as e:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
-    except OrderInventoryError as e:
-        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
-    except Exception as e:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
-    
-@router.get("/{order_id}", status_code=status.HTTP_200_OK, response_model=OrderReadByIdSchema)
-async def get_order_by_id(
-    order_id: str,
-    db: AsyncSession = Depends(get_db),
-    mongo_db=Depends(get_mongo_db),
-    kafka_producer=Depends(get_kafka_producer)
-):
-    """
-    Retrieve an order by ID with its products and customer details.
-    """
-    try:
-        service = OrderService(db, mongo_db, kafka_producer)
-        result = await service.get_order_by_id(order_id)
-        return result
-    except OrderNotFound as e:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
-    except Exception as e:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
-
-
-@router.get("/{user_id}/orders", status_code=status.HTTP_200_OK, response_model=OrdersUserSearchSchema)
-async def get_user_orders(
-    user_id: str,
-    params: Params = Depends(),
-    db: AsyncSession = Depends(get_db),
-    mongo_db=Depends(get_mongo_db),
-    kafka_producer=Depends(get_kafka_producer)
-):
-    """
-    Retrieve all orders for a specific user.
-    """
-    try:
-        service = OrderService(db, mongo_db, kafka_producer)
-        return await service.get_orders_by_user(user_id, params)
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=str(e)
-        )
+from datetime import datetime
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Query, Header, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.order.schemas import (
+    OrderCreateSchema,
+    OrderReadSchema,
+    OrderBatchCreateSchema,
+    OrderBatchReadSchema,
+    OrderReadByIdSchema,
+    OrdersUserSearchSchema,
+    OrdersUserCursorSchema,
+)
+from src.order.services import OrderService
+from src.order.dependencies import get_mongo_db, get_kafka_producer
+from src.order.exceptions import OrderInventoryError, OrderProductNotFound, OrderNotFound, OrderIdempotencyError
+from src.config.database import get_db
+from src.utils.pagination import InvalidCursor
+from src.utils.general import etag_matches
+from src.utils.streaming import gzip_chunks
+from src.utils.responses import fast_json
+from fastapi_pagination import  Params
+
+router = APIRouter(
+    prefix="/orders",
+    tags=["Orders"]
+)
+
+@router.post("/", status_code=status.HTTP_201_CREATED, response_model=OrderReadSchema)
+async def create_order(
+    order: OrderCreateSchema = Body(),
+    db: AsyncSession = Depends(get_db),
+    mongo_db=Depends(get_mongo_db),
+    kafka_producer=Depends(get_kafka_producer),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255)
+):
+    """
+    0. Claim the idempotency key (replays the original response on retry)
+    1. Validate inventory & reserve
+    2. Publish Kafka event
+    3. Payment + Mongo persistence handled asynchronously by KafkaWorker
+    """
+    try:
+        service = OrderService(db, mongo_db, kafka_producer)
+        customer_dict = order.customer.model_dump()  
+        items_dicts = [item.model_dump() for item in order.items]
+        result = await service.create_order(customer_dict, items_dicts, idempotency_key)
+        return result
+    except OrderProductNotFound as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except OrderIdempotencyError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except OrderInventoryError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@router.post("/batch", status_code=status.HTTP_200_OK, response_model=OrderBatchReadSchema)
+async def create_orders_batch(
+    batch: OrderBatchCreateSchema = Body(),
+    db: AsyncSession = Depends(get_db),
+    mongo_db=Depends(get_mongo_db),
+    kafka_producer=Depends(get_kafka_producer),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255)
+):
+    """
+    Create up to ORDER_BATCH_MAX_SIZE orders in one call.
+    Orders succeed or fail independently; each result carries its position in the request.
+    """
+    try:
+        service = OrderService(db, mongo_db, kafka_producer)
+        orders = [
+            {"customer": order.customer.model_dump(), "items": [item.model_dump() for item in order.items]}
+            for order in batch.orders
+        ]
+        return await service.create_orders_batch(orders, idempotency_key)
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@router.get("/export", status_code=status.HTTP_200_OK, response_class=StreamingResponse)
+async def export_orders(
+    user_id: Optional[str] = Query(None, description="Only orders of this user"),
+    order_status: Optional[List[str]] = Query(None, alias="status", description="Only orders in these statuses"),
+    created_from: Optional[datetime] = Query(None, description="created_at lower bound, inclusive"),
+    created_to: Optional[datetime] = Query(None, description="created_at upper bound, exclusive"),
+    gzip: bool = Query(False, description="Gzip-compress the stream"),
+    db: AsyncSession = Depends(get_db),
+    mongo_db=Depends(get_mongo_db),
+    kafka_producer=Depends(get_kafka_producer)
+):
+    """
+    Export orders as newline-delimited JSON, streamed straight from the database cursor.
+    """
+    if created_from and created_to and created_from >= created_to:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="created_from must be before created_to")
+
+    service = OrderService(db, mongo_db, kafka_producer)
+    chunks = service.export_orders(user_id, order_status, created_from, created_to)
+    headers = {"Content-Disposition": 'attachment; filename="orders.ndjson"'}
+    if gzip:
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(chunks, media_type="application/x-ndjson", headers=headers)
+
+
+@router.get("/{order_id}", status_code=status.HTTP_200_OK, response_model=OrderReadByIdSchema)
+async def get_order_by_id(
+    order_id: str,
+    db: AsyncSession = Depends(get_db),
+    mongo_db=Depends(get_mongo_db),
+    kafka_producer=Depends(get_kafka_producer),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match")
+):
+    """
+    Retrieve an order by ID with its products and customer details.
+    Responses carry an ETag; send it back in If-None-Match to get a 304 while the order is unchanged.
+    """
+    try:
+        service = OrderService(db, mongo_db, kafka_producer)
+        snapshot = await service.get_order_snapshot(order_id)
+        headers = {"ETag": snapshot["etag"], "Cache-Control": "no-cache"}
+        if etag_matches(if_none_match, snapshot["etag"]):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(content=snapshot["body"], media_type="application/json", headers=headers)
+    except OrderNotFound as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@router.get(
+    "/{user_id}/orders",
+    status_code=status.HTTP_200_OK,
+    response_model=OrdersUserSearchSchema | OrdersUserCursorSchema
+)
+async def get_user_orders(
+    user_id: str,
+    pagination: Literal["offset", "cursor"] = Query("offset", description="Pagination mode"),
+    cursor: str | None = Query(None, description="Opaque cursor from a previous page (cursor mode)"),
+    include_total: bool = Query(False, description="Also count the user's orders (cursor mode)"),
+    params: Params = Depends(),
+    db: AsyncSession = Depends(get_db),
+    mongo_db=Depends(get_mongo_db),
+    kafka_producer=Depends(get_kafka_producer)
+):
+    """
+    Retrieve all orders for a specific user.
+    Cursor mode walks the history newest first by (created_at, order_id) without skip or count.
+    """
+    try:
+        service = OrderService(db, mongo_db, kafka_producer)
+        if pagination == "cursor" or cursor:
+            return fast_json(await service.get_orders_by_user_cursor(user_id, params.size, cursor, include_total))
+        return fast_json(await service.get_orders_by_user(user_id, params))
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
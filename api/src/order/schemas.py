@@ -1,58 +1,82 @@
-from typing import List, Optional, Annotated
-from pydantic import BaseModel, EmailStr, Field
-from datetime import datetime
-
-
-
-class OrderItemSchema(BaseModel):
-    sku: str
-    quantity: Annotated[int, Field(strict=True, gt=0)]
-
-class CustomerSchema(BaseModel):
-    user_id: str
-    email: EmailStr
-
-class OrderCreateSchema(BaseModel):
-    customer: CustomerSchema
-    items: List[OrderItemSchema]
-    
-class OrderReadSchema(BaseModel):
-    order_id: str
-    status: str
-    message: str
-    estimated_total: float
-    created_at: datetime
-    
-class PricingSchema(BaseModel):
-    subtotal: float
-    tax: float
-    total: float
-
-class PaymentSchema(BaseModel):
-    status: str
-    transaction_id: Optional[str]
-    
-class OrderReadByIdSchema(BaseModel):
-    order_id: str = Field(..., description="Custom formatted order ID")
-    status: str
-    customer: CustomerSchema
-    items: List[OrderItemSchema]
-    pricing: PricingSchema
-    payment: PaymentSchema
-    created_at: datetime
-    updated_at: datetime
-    
-class OrderUserItemSearchSchema(BaseModel):
-    order_id: str
-    status: str
-    total: float
-    created_at: str
-    
-
-class OrdersUserSearchSchema(BaseModel):
-    items: List[OrderUserItemSearchSchema]
-    
-    total: int
-    page: int
-    size: int
-    pages: int
+from typing import List, Optional, Annotated
+from pydantic import BaseModel, EmailStr, Field
+from datetime import datetime
+from src.config.settings import settings as s
+
+
+
+class OrderItemSchema(BaseModel):
+    sku: str
+    quantity: Annotated[int, Field(strict=True, gt=0)]
+
+class CustomerSchema(BaseModel):
+    user_id: str
+    email: EmailStr
+
+class OrderCreateSchema(BaseModel):
+    customer: CustomerSchema
+    items: List[OrderItemSchema]
+    
+class OrderReadSchema(BaseModel):
+    order_id: str
+    status: str
+    message: str
+    estimated_total: float
+    created_at: datetime
+
+class OrderBatchCreateSchema(BaseModel):
+    orders: Annotated[List[OrderCreateSchema], Field(min_length=1, max_length=s.ORDER_BATCH_MAX_SIZE)]
+
+class OrderBatchResultSchema(BaseModel):
+    index: int
+    success: bool
+    order: Optional[OrderReadSchema] = None
+    error: Optional[str] = None
+    detail: Optional[str] = None
+
+class OrderBatchReadSchema(BaseModel):
+    results: List[OrderBatchResultSchema]
+    created: int
+    failed: int
+    
+class PricingSchema(BaseModel):
+    subtotal: float
+    tax: float
+    total: float
+
+class PaymentSchema(BaseModel):
+    status: str
+    transaction_id: Optional[str]
+    
+class OrderReadByIdSchema(BaseModel):
+    order_id: str = Field(..., description="Custom formatted order ID")
+    status: str
+    customer: CustomerSchema
+    items: List[OrderItemSchema]
+    pricing: PricingSchema
+    payment: PaymentSchema
+    created_at: datetime
+    updated_at: datetime
+    
+class OrderUserItemSearchSchema(BaseModel):
+    order_id: str
+    status: str
+    total: float
+    created_at: str
+    
+
+class OrdersUserSearchSchema(BaseModel):
+    items: List[OrderUserItemSearchSchema]
+    
+    total: int
+    page: int
+    size: int
+    pages: int
+
+
+class OrdersUserCursorSchema(BaseModel):
+    items: List[OrderUserItemSearchSchema]
+
+    next_cursor: Optional[str]
+    size: int
+    total: Optional[int] = None
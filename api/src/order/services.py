@@ -1,227 +1,526 @@
-import datetime
-import asyncio
-import random
-from decimal import Decimal
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
-from sqlalchemy.ext.asyncio import AsyncSession
-from src.product.models import Product
-from src.order.exceptions import OrderInventoryError, OrderProductNotFound, OrderNotFound
-from src.order.constants import TAX_RATE
-from src.utils.general import generate_short_uuid
-from src.order.event.producer import KafkaProducer
-from fastapi_pagination import Params
-from fastapi_pagination.ext.motor import apaginate
-from src.inventory.models import Inventory
-from src.utils.general import generate_order_hash
-
-
-class OrderService:
-    def __init__(self, db: AsyncSession, mongo_db, kafka_producer: KafkaProducer):
-        self.db = db
-        self.mongo_db = mongo_db
-        self.producer = kafka_producer
-
-    async def get_orders_by_user(self, user_id: str, params: Params = Params()):
-        """Retrieve paginated orders for a specific user."""
-        try:
-            query_filter = {"customer.user_id": user_id}
-            paginated = await apaginate(
-                self.mongo_db.orders,
-                query_filter,
-                params=params,
-                sort=[("created_at", -1)]
-            )
-            paginated.items = [
-                {
-                    "order_id": o.get("order_id"),
-                    "status": o.get("status"),
-                    "total": float(o.get("pricing", {}).get("total", 0)),
-                    "created_at": o.get("created_at").isoformat()
-                }
-                for o in paginated.items
-            ]
-            return paginated
-        except Exception as e:
-            raise ValueError({
-                "message": "Failed to fetch user orders",
-                "user_id": user_id,
-                "error": str(e)
-            })
-
-    async def get_order_by_id(self, order_id: str):
-        """Retrieve an order by its ID."""
-        order_doc = await self.mongo_db.orders.find_one({"order_id": order_id})
-        if not order_doc:
-            raise OrderNotFound(f"Order with ID '{order_id}' not found.")
-        return order_doc
-
-    async def _fetch_product_and_inventory(self, sku: str):
-        """Fetch product and its inventory details by SKU."""
-        result = await self.db.execute(
-            select(Product)
-            .options(selectinload(Product.inventory))
-            .where(Product.sku == sku)
-        )
-        product = result.scalars().first()
-        if not product:
-            raise OrderProductNotFound(f"Product with SKU '{sku}' not found.")
-        if not product.inventory:
-            raise OrderInventoryError(f"Inventory for SKU '{sku}' not found.")
-        return product, product.inventory
-
-    async def create_order(self, customer: dict, items: list[dict]):
-        """
-        Create a new order.
-        Implements idempotency by checking if the user already has a 
-        pending/processing order with the same items.
-        """
-        order_hash = generate_order_hash(customer, items)
-
-        # Check for existing order with same hash
-        existing_order = await self.mongo_db.orders.find_one({
-            "idempotency_hash": order_hash,
-            "status": {"$in": ["pending", "processing"]}
-        })
-
-        if existing_order:
-            return {
-                "order_id": existing_order["order_id"],
-                "status": existing_order["status"],
-                "estimated_total": existing_order["pricing"]["total"],
-                "created_at": existing_order["created_at"].isoformat(),
-                "message": "Duplicate order detected, returning existing order"
-            }
-
-        order_id = f"ORD-{generate_short_uuid()}"
-        subtotal = Decimal("0")
-        reserved_items = []
-
-        try:
-            for item in items:
-                product, inventory = await self._fetch_product_and_inventory(item["sku"])
-
-                if item["quantity"] > inventory.available_quantity:
-                    raise OrderInventoryError(
-                        f"Insufficient inventory for {item['sku']}. "
-                        f"Requested: {item['quantity']}, "
-                        f"Available: {inventory.available_quantity}"
-                    )
-
-                inventory.available_quantity -= item["quantity"]
-                inventory.reserved_quantity += item["quantity"]
-                self.db.add(inventory)
-
-                reserved_items.append({
-                    "sku": item["sku"],
-                    "quantity": item["quantity"],
-                    "price": float(product.price),
-                    "name": product.name
-                })
-                subtotal += Decimal(str(product.price)) * Decimal(str(item["quantity"]))
-            await self.db.commit()
-        except Exception as e:
-            await self.db.rollback()
-            raise e
-
-        tax = (subtotal * TAX_RATE).quantize(Decimal("0.01"))
-        total = (subtotal + tax).quantize(Decimal("0.01"))
-
-        order_doc = {
-            "order_id": order_id,
-            "idempotency_hash": order_hash,
-            "status": "pending",
-            "customer": {
-                "user_id": customer["user_id"],
-                "email": customer.get("email"),
-            },
-            "items": reserved_items,
-            "pricing": {
-                "subtotal": float(subtotal),
-                "tax": float(tax),
-                "total": float(total)
-            },
-            "payment": {
-                "status": "pending",
-                "transaction_id": generate_short_uuid(),
-                "method": "mock_gateway"
-            },
-            "created_at": datetime.datetime.now(),
-            "updated_at": datetime.datetime.now(),
-            
-        }
-
-        try:
-            await self.mongo_db.orders.insert_one(order_doc)
-        except Exception as e:
-            await self._release_reserved_inventory(reserved_items)
-            raise Exception(f"Order persistence failed: {str(e)}")
-
-        asyncio.create_task(
-            self._process_payment_and_publish(order_id, reserved_items, total, customer)
-        )
-
-        return {
-            "order_id": order_id,
-            "status": "pending",
-            "estimated_total": float(total),
-            "created_at": datetime.datetime.now().isoformat(),
-            "message": "Order created successfully and is pending processing"
-        }
-
-    async def _process_payment_and_publish(self, order_id, reserved_items, total, customer):
-        """Background task to handle payment and Kafka publishing"""
-        try:
-            payment_success = await self._simulate_payment()
-
-            if payment_success:
-                await self.mongo_db.orders.update_one(
-                    {"order_id": order_id},
-                    {"$set": {
-                        "status": "processing",
-                        "payment.status": "completed",
-                        "audit.updated_at": datetime.datetime.now()
-                    }}
-                )
-            else:
-                await self.mongo_db.orders.update_one(
-                    {"order_id": order_id},
-                    {"$set": {
-                        "status": "cancelled",
-                        "payment.status": "failed",
-                        "audit.updated_at": datetime.datetime.now()
-                    }}
-                )
-                await self._release_reserved_inventory(reserved_items)
-                return
-
-            try:
-                await self.producer.publish_order_created(order_id, customer, reserved_items)
-                final_status = "confirmed"
-            except Exception:
-                final_status = "processing"
-
-            await self.mongo_db.orders.update_one(
-                {"order_id": order_id},
-                {"$set": {"status": final_status, "audit.updated_at": datetime.datetime.now()}}
-            )
-
-        except Exception:
-            await self.mongo_db.orders.update_one(
-                {"order_id": order_id},
-                {"$set": {"status": "error", "audit.updated_at": datetime.datetime.now()}}
-            )
-            await self._release_reserved_inventory(reserved_items)
-
-    async def _release_reserved_inventory(self, reserved_items: list[dict]):
-        """Release reserved inventory in case of failure"""
-        for item in reserved_items:
-            product, inventory = await self._fetch_product_and_inventory(item["sku"])
-            inventory.available_quantity += item["quantity"]
-            inventory.reserved_quantity -= item["quantity"]
-            self.db.add(inventory)
-        await self.db.commit()
-
-    async def _simulate_payment(self) -> bool:
-        await asyncio.sleep(3)
-        return random.random() >= 0.5
+import datetime
+import math
+import time
+from decimal import Decimal
+from typing import AsyncIterator, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.order.exceptions import OrderInventoryError, OrderProductNotFound, OrderNotFound, OrderIdempotencyError
+from src.order.constants import TAX_RATE, OUTBOX_ORDER_CREATED, ORDER_RELEASING_STATUSES
+from src.config.settings import settings as s
+from src.utils.general import generate_short_uuid
+from src.order.event.producer import KafkaProducer
+from fastapi_pagination import Params
+from src.inventory.services import InventoryReservationService
+from src.inventory.exceptions import InventoryNotFound, InventoryInsufficientStock
+from src.product.exceptions import ProductNotFound
+from src.payment.services import PaymentProcessor
+from src.utils.general import generate_order_hash
+from src.order.idempotency import IdempotencyStore
+from src.order.cache import order_cache
+from src.metrics.collectors import observe_stage
+from src.utils.pagination import InvalidCursor, decode_cursor, encode_cursor
+from src.utils.streaming import iter_ndjson
+
+
+class OrderService:
+    def __init__(
+        self,
+        db: AsyncSession,
+        mongo_db,
+        kafka_producer: KafkaProducer,
+        payments: Optional[PaymentProcessor] = None,
+    ):
+        self.db = db
+        self.mongo_db = mongo_db
+        self.producer = kafka_producer
+        self.payments = payments
+        self.reservations = InventoryReservationService(db)
+        self.idempotency = IdempotencyStore(mongo_db)
+        self.cache = order_cache
+
+    @staticmethod
+    def _user_history_pipeline(query_filter: dict, skip: int, limit: int) -> list[dict]:
+        """
+        Aggregation returning history rows already in response shape. Every field it touches
+        is in the user_order_history index, so the query is answered from the index alone.
+        """
+        return [
+            {"$match": query_filter},
+            {"$sort": {"created_at": -1, "order_id": -1}},
+            {"$skip": skip},
+            {"$limit": limit},
+            {"$project": {
+                "_id": 0,
+                "order_id": 1,
+                "status": 1,
+                "total": "$pricing.total",
+                "created_at": {"$dateToString": {"date": "$created_at", "format": "%Y-%m-%dT%H:%M:%S.%L"}},
+            }},
+        ]
+
+    async def get_orders_by_user(self, user_id: str, params: Params = Params()):
+        """Retrieve paginated orders for a specific user."""
+        try:
+            query_filter = {"customer.user_id": user_id}
+            total = await self.mongo_db.orders.count_documents(query_filter)
+            pipeline = self._user_history_pipeline(query_filter, (params.page - 1) * params.size, params.size)
+            items = await self.mongo_db.orders.aggregate(pipeline).to_list(length=params.size)
+            return {
+                "items": items,
+                "total": total,
+                "page": params.page,
+                "size": params.size,
+                "pages": math.ceil(total / params.size) if total else 0,
+            }
+        except Exception as e:
+            raise ValueError({
+                "message": "Failed to fetch user orders",
+                "user_id": user_id,
+                "error": str(e)
+            })
+
+    async def get_orders_by_user_cursor(self, user_id: str, size: int, cursor: str | None, include_total: bool = False):
+        """
+        Keyset page of a user's orders, newest first, ordered by (created_at, order_id).
+        """
+        try:
+            query_filter: dict = {"customer.user_id": user_id}
+            if cursor:
+                position = decode_cursor(cursor, ("created_at", "order_id"))
+                query_filter["$or"] = [
+                    {"created_at": {"$lt": position["created_at"]}},
+                    {"created_at": position["created_at"], "order_id": {"$lt": position["order_id"]}},
+                ]
+            pipeline = self._user_history_pipeline(query_filter, 0, size + 1)
+            orders = await self.mongo_db.orders.aggregate(pipeline).to_list(length=size + 1)
+            page = orders[:size]
+
+            next_cursor = None
+            if len(orders) > size:
+                last = page[-1]
+                # Mongo keeps millisecond precision, so the rendered timestamp round-trips exactly.
+                next_cursor = encode_cursor({
+                    "created_at": datetime.datetime.fromisoformat(last["created_at"]),
+                    "order_id": last["order_id"],
+                })
+
+            total = None
+            if include_total:
+                total = await self.mongo_db.orders.count_documents({"customer.user_id": user_id})
+            return {
+                "items": page,
+                "next_cursor": next_cursor,
+                "size": size,
+                "total": total,
+            }
+        except InvalidCursor:
+            raise
+        except Exception as e:
+            raise ValueError({
+                "message": "Failed to fetch user orders",
+                "user_id": user_id,
+                "error": str(e)
+            })
+
+    def export_orders(
+        self,
+        user_id: Optional[str] = None,
+        statuses: Optional[list[str]] = None,
+        created_from: Optional[datetime.datetime] = None,
+        created_to: Optional[datetime.datetime] = None,
+    ) -> AsyncIterator[bytes]:
+        """
+        Stream matching orders as NDJSON chunks, oldest first.
+        Documents are pulled from a Motor cursor ORDER_EXPORT_BATCH_SIZE at a time and
+        encoded per batch, so memory does not grow with the number of orders.
+        """
+        query: dict = {}
+        if user_id:
+            query["customer.user_id"] = user_id
+        if statuses:
+            query["status"] = {"$in": statuses}
+        if created_from or created_to:
+            query["created_at"] = {}
+            if created_from:
+                query["created_at"]["$gte"] = created_from
+            if created_to:
+                query["created_at"]["$lt"] = created_to
+
+        cursor = self.mongo_db.orders.find(
+            query, {"_id": 0, "reservation_sweep_id": 0, "idempotency": 0}, batch_size=s.ORDER_EXPORT_BATCH_SIZE
+        ).sort("created_at", 1)
+        return iter_ndjson(cursor, flush_every=s.ORDER_EXPORT_BATCH_SIZE)
+
+    async def get_order_by_id(self, order_id: str):
+        """Retrieve an order by its ID."""
+        order_doc = await self.mongo_db.orders.find_one({"order_id": order_id})
+        if not order_doc:
+            raise OrderNotFound(f"Order with ID '{order_id}' not found.")
+        return order_doc
+
+    async def get_order_snapshot(self, order_id: str) -> dict:
+        """
+        Serialized order body and its ETag, served from the order cache when fresh.
+        """
+        entry = self.cache.get(order_id)
+        if entry is None:
+            entry = self.cache.build_entry(await self.get_order_by_id(order_id))
+            self.cache.put(order_id, entry)
+        return entry
+
+    async def create_order(self, customer: dict, items: list[dict], idempotency_key: Optional[str] = None):
+        """
+        Create a new order.
+        Implements idempotency by claiming a key before any stock is reserved: the
+        client's Idempotency-Key when given, otherwise a hash of the user and items.
+        Retries of a completed request replay its original response.
+        """
+        started = time.perf_counter()
+        order_hash = generate_order_hash(customer, items)
+        key, ttl_seconds = IdempotencyStore.build_key(customer["user_id"], idempotency_key, order_hash)
+
+        cached = await self.idempotency.claim(key, order_hash, ttl_seconds)
+        observe_stage("idempotency", started)
+        if cached is not None:
+            return {**cached, "message": "Duplicate order detected, returning existing order"}
+
+        try:
+            response = await self._create_order(customer, key, order_hash, items)
+        except Exception:
+            await self.idempotency.release(key)
+            raise
+        await self.idempotency.complete(key, response)
+        observe_stage("create_order", started)
+        return response
+
+    async def create_orders_batch(self, orders: list[dict], idempotency_key: Optional[str] = None) -> dict:
+        """
+        Create many orders in one request, allowing partial success.
+
+        Idempotency keys are claimed with one insert, stock for the whole batch is
+        reserved in bulk (falling back to per-order savepoints when it falls short),
+        and the orders and their outbox rows are written with one insert_many each.
+        The outbox relay then publishes the events in producer batches.
+        An Idempotency-Key applies to the whole batch, scoped per order position.
+        """
+        claims = []
+        for index, order in enumerate(orders):
+            order_hash = generate_order_hash(order["customer"], order["items"])
+            key, ttl_seconds = IdempotencyStore.build_key(
+                order["customer"]["user_id"],
+                f"{idempotency_key}:{index}" if idempotency_key else None,
+                order_hash,
+            )
+            claims.append((key, order_hash, ttl_seconds))
+
+        results: list[Optional[dict]] = [None] * len(orders)
+        to_create = []
+        for index, claimed in enumerate(await self.idempotency.claim_many(claims)):
+            if isinstance(claimed, Exception):
+                results[index] = self._batch_error(index, claimed)
+            elif claimed is not None:
+                results[index] = {
+                    "index": index,
+                    "success": True,
+                    "order": {**claimed, "message": "Duplicate order detected, returning existing order"},
+                }
+            else:
+                to_create.append(index)
+
+        try:
+            reservations = await self.reservations.reserve_batch([orders[index]["items"] for index in to_create])
+            await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            await self.idempotency.release_many([claims[index][0] for index in to_create])
+            raise
+
+        created = []
+        rejected_keys = []
+        for index, reserved_items in zip(to_create, reservations):
+            if isinstance(reserved_items, Exception):
+                results[index] = self._batch_error(index, reserved_items)
+                rejected_keys.append(claims[index][0])
+            else:
+                documents = self._build_order_documents(
+                    orders[index]["customer"], claims[index][0], claims[index][1], reserved_items
+                )
+                created.append((index, *documents))
+
+        if created:
+            try:
+                await self._persist_orders([c[1] for c in created], [c[2] for c in created])
+            except Exception as e:
+                await self._release_reserved_inventory([item for c in created for item in c[1]["items"]])
+                await self.idempotency.release_many(rejected_keys + [claims[c[0]][0] for c in created])
+                raise Exception(f"Order persistence failed: {str(e)}")
+
+        await self.idempotency.release_many(rejected_keys)
+        await self.idempotency.complete_many({claims[index][0]: response for index, _, _, response in created})
+        for index, _, _, response in created:
+            results[index] = {"index": index, "success": True, "order": response}
+
+        return {
+            "results": results,
+            "created": len(created),
+            "failed": sum(1 for result in results if not result["success"]),
+        }
+
+    @staticmethod
+    def _batch_error(index: int, error: Exception) -> dict:
+        if isinstance(error, ProductNotFound):
+            code = "product_not_found"
+        elif isinstance(error, (InventoryNotFound, InventoryInsufficientStock)):
+            code = "inventory_error"
+        elif isinstance(error, OrderIdempotencyError):
+            code = "idempotency_conflict"
+        else:
+            code = "error"
+        return {"index": index, "success": False, "error": code, "detail": str(error)}
+
+    async def _create_order(self, customer: dict, idempotency_key: str, order_hash: str, items: list[dict]):
+        try:
+            stage_started = time.perf_counter()
+            reserved_items = await self.reservations.reserve_items(items)
+            stage_started = observe_stage("reserve", stage_started)
+            await self.db.commit()
+            observe_stage("commit", stage_started)
+        except ProductNotFound as e:
+            await self.db.rollback()
+            raise OrderProductNotFound(str(e))
+        except (InventoryNotFound, InventoryInsufficientStock) as e:
+            await self.db.rollback()
+            raise OrderInventoryError(str(e))
+        except Exception as e:
+            await self.db.rollback()
+            raise e
+
+        order_doc, outbox_doc, response = self._build_order_documents(
+            customer, idempotency_key, order_hash, reserved_items
+        )
+
+        try:
+            stage_started = time.perf_counter()
+            await self._persist_order(order_doc, outbox_doc)
+            observe_stage("persist", stage_started)
+        except Exception as e:
+            await self._release_reserved_inventory(reserved_items)
+            raise Exception(f"Order persistence failed: {str(e)}")
+
+        return response
+
+    @staticmethod
+    def _build_order_documents(
+        customer: dict, idempotency_key: str, order_hash: str, reserved_items: list[dict]
+    ) -> tuple[dict, dict, dict]:
+        """
+        Price the reserved lines and build the order document, its outbox row and the API response.
+        The order carries its idempotency key and response, so a retry can replay it even if
+        the key was never completed.
+        """
+        created_at = datetime.datetime.now(datetime.timezone.utc)
+        order_id = f"ORD-{generate_short_uuid()}"
+        subtotal = sum(
+            (Decimal(str(item["price"])) * Decimal(str(item["quantity"])) for item in reserved_items),
+            Decimal("0"),
+        )
+
+        tax = (subtotal * TAX_RATE).quantize(Decimal("0.01"))
+        total = (subtotal + tax).quantize(Decimal("0.01"))
+
+        order_doc = {
+            "order_id": order_id,
+            "idempotency_hash": order_hash,
+            "status": "pending",
+            "customer": {
+                "user_id": customer["user_id"],
+                "email": customer.get("email"),
+            },
+            "items": reserved_items,
+            "pricing": {
+                "subtotal": float(subtotal),
+                "tax": float(tax),
+                "total": float(total)
+            },
+            "payment": {
+                "status": "pending",
+                "transaction_id": generate_short_uuid(),
+                "method": f"{s.PAYMENT_GATEWAY}_gateway"
+            },
+            "created_at": created_at,
+            "updated_at": created_at,
+            "reservation_expires_at": created_at + datetime.timedelta(seconds=s.RESERVATION_TTL_SECONDS),
+        }
+
+        outbox_doc = {
+            "order_id": order_id,
+            "type": OUTBOX_ORDER_CREATED,
+            "payload": {
+                "customer": order_doc["customer"],
+                "items": reserved_items,
+                "total": float(total),
+            },
+            "status": "pending",
+            "attempts": 0,
+            "available_at": order_doc["created_at"],
+            "created_at": order_doc["created_at"],
+        }
+
+        response = {
+            "order_id": order_id,
+            "status": "pending",
+            "estimated_total": float(total),
+            "created_at": order_doc["created_at"].isoformat(),
+            "message": "Order created successfully and is pending processing"
+        }
+        order_doc["idempotency"] = {"key": idempotency_key, "response": response}
+        return order_doc, outbox_doc, response
+
+    async def _persist_order(self, order_doc: dict, outbox_doc: dict):
+        """
+        Write the order and its outbox row together. Uses a Mongo transaction when the
+        deployment supports it, otherwise removes the order again if the outbox write fails.
+        """
+        if s.MONGO_TRANSACTIONS_ENABLED:
+            async with await self.mongo_db.client.start_session() as session:
+                async with session.start_transaction():
+                    await self.mongo_db.orders.insert_one(order_doc, session=session)
+                    await self.mongo_db.order_outbox.insert_one(outbox_doc, session=session)
+            return
+
+        await self.mongo_db.orders.insert_one(order_doc)
+        try:
+            await self.mongo_db.order_outbox.insert_one(outbox_doc)
+        except Exception:
+            await self.mongo_db.orders.delete_one({"order_id": order_doc["order_id"]})
+            self.cache.invalidate(order_doc["order_id"])
+            raise
+
+    async def _persist_orders(self, order_docs: list[dict], outbox_docs: list[dict]):
+        """Bulk counterpart of `_persist_order`."""
+        if s.MONGO_TRANSACTIONS_ENABLED:
+            async with await self.mongo_db.client.start_session() as session:
+                async with session.start_transaction():
+                    await self.mongo_db.orders.insert_many(order_docs, session=session)
+                    await self.mongo_db.order_outbox.insert_many(outbox_docs, session=session)
+            return
+
+        await self.mongo_db.orders.insert_many(order_docs)
+        try:
+            await self.mongo_db.order_outbox.insert_many(outbox_docs)
+        except Exception:
+            await self.mongo_db.orders.delete_many({"order_id": {"$in": [doc["order_id"] for doc in order_docs]}})
+            raise
+
+    async def process_payment_and_publish(self, order_id, reserved_items, total, customer):
+        """
+        Outbox handler: charge the order and publish its event.
+        Safe to retry: a completed payment is not charged again, an order left in a
+        releasing status by an earlier attempt gets its stock released, and any
+        exception is left to the relay, which retries the row or gives up via `fail_order`.
+        """
+        started = time.perf_counter()
+        order = await self.mongo_db.orders.find_one(
+            {"order_id": order_id}, {"_id": 0, "status": 1, "payment.status": 1, "payment.transaction_id": 1}
+        )
+        if order and order["status"] in ORDER_RELEASING_STATUSES:
+            await self._finish_release(order_id, reserved_items, order["status"])
+            return
+        if not order or order["status"] not in ("pending", "processing"):
+            return
+
+        if order["status"] == "pending":
+            # Take the order away from the reservation sweeper before charging it
+            claimed = await self._update_order_status(order_id, "processing", expected_status="pending")
+            if not claimed.modified_count:
+                return
+
+        if order["payment"]["status"] != "completed":
+            stage_started = time.perf_counter()
+            payment_success = await self.payments.charge(
+                order_id, float(total), order["payment"].get("transaction_id") or order_id
+            )
+            observe_stage("payment", stage_started)
+
+            if not payment_success:
+                # Stays `cancelling` until the stock is back, so a failed release is retried
+                claimed = await self._update_order_status(
+                    order_id, "cancelling", {"payment.status": "failed"}, expected_status="processing"
+                )
+                if claimed.modified_count:
+                    await self._finish_release(order_id, reserved_items, "cancelling")
+                return
+
+            await self._update_order_status(order_id, "processing", {"payment.status": "completed"})
+
+        stage_started = time.perf_counter()
+        await self.producer.publish_order_created(order_id, customer, reserved_items, background=False)
+        observe_stage("publish", stage_started)
+
+        await self._update_order_status(order_id, "confirmed")
+        observe_stage("process_payment", started)
+
+    async def fail_order(self, order_id, reserved_items):
+        """
+        Mark an order as errored and give its stock back once the outbox gives up.
+        Only an order still in flight is failed, so stock that the sweeper or a
+        cancellation already released is not released twice; an order stopped halfway
+        through a release has it finished instead.
+        """
+        claimed = await self._update_order_status(order_id, "failing", expected_status=("pending", "processing"))
+        if claimed.modified_count:
+            await self._finish_release(order_id, reserved_items, "failing")
+            return
+        order = await self.mongo_db.orders.find_one({"order_id": order_id}, {"_id": 0, "status": 1})
+        if order and order["status"] in ORDER_RELEASING_STATUSES:
+            await self._finish_release(order_id, reserved_items, order["status"])
+
+    async def _finish_release(self, order_id: str, reserved_items: list[dict], releasing_status: str):
+        """
+        Release the stock of an order claimed into a releasing status, then move it to
+        its final status. If anything fails the order keeps the releasing status, so the
+        next outbox attempt (or `fail_order`) finishes it; the release is recorded per
+        order, so stock that already went back is not released twice.
+        """
+        try:
+            await self.reservations.release_orders([{"order_id": order_id, "items": reserved_items}])
+            await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            raise
+        await self._update_order_status(
+            order_id, ORDER_RELEASING_STATUSES[releasing_status], expected_status=releasing_status
+        )
+
+    async def _update_order_status(
+        self,
+        order_id: str,
+        status: str,
+        fields: Optional[dict] = None,
+        expected_status: Optional[str | tuple[str, ...]] = None,
+    ):
+        """
+        Write a status change (plus any extra `fields`) and drop the order from the read cache.
+        With `expected_status` (one status or a tuple of them) the write only applies if
+        the order is still in that status.
+        """
+        query = {"order_id": order_id}
+        if isinstance(expected_status, tuple):
+            query["status"] = {"$in": list(expected_status)}
+        elif expected_status is not None:
+            query["status"] = expected_status
+        result = await self.mongo_db.orders.update_one(
+            query,
+            {"$set": {"status": status, **(fields or {}), "audit.updated_at": datetime.datetime.now(datetime.timezone.utc)}}
+        )
+        self.cache.invalidate(order_id)
+        return result
+
+    async def _release_reserved_inventory(self, reserved_items: list[dict]):
+        """Release reserved inventory in case of failure"""
+        try:
+            await self.reservations.release_items(reserved_items)
+            await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            raise
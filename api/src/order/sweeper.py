@@ -0,0 +1,108 @@
+import uuid
+import asyncio
+import datetime
+import logging
+from src.config.settings import settings as s
+from src.inventory.services import InventoryReservationService
+from src.order.cache import order_cache
+
+logger = logging.getLogger(__name__)
+
+
+class ReservationSweeper:
+    """
+    Releases the stock of pending orders whose reservation expired, e.g. because the
+    process that should have charged them died.
+
+    Each pass claims up to `batch_size` expired orders with one `update_many`
+    (pending -> expiring, tagged with a sweep id), returns all of their quantities
+    to inventory with a single bulk release statement and only then marks them
+    `expired`. If anything fails on the way the orders stay `expiring`, and a later
+    pass claims them again once the claim is older than `claim_timeout_seconds`, so
+    stock is never left reserved by an order nobody will sweep. The release records
+    each order in Postgres in the same transaction, so an order whose release already
+    committed is not released again by that later pass. Orders are only
+    claimed while still `pending`; the outbox moves an order to `processing` before
+    charging it, so the two never race for the same order.
+    """
+    def __init__(
+        self,
+        mongo_db,
+        pg_sessionmaker,
+        batch_size: int = s.RESERVATION_SWEEP_BATCH_SIZE,
+        interval_seconds: float = s.RESERVATION_SWEEP_INTERVAL_SECONDS,
+        claim_timeout_seconds: float = s.RESERVATION_SWEEP_CLAIM_TIMEOUT_SECONDS,
+    ):
+        self.mongo_db = mongo_db
+        self.pg_sessionmaker = pg_sessionmaker
+        self.batch_size = batch_size
+        self.interval_seconds = interval_seconds
+        self.claim_timeout_seconds = claim_timeout_seconds
+        self._stopped = asyncio.Event()
+        self.stats = {"sweeps": 0, "expired_orders": 0, "released_units": 0}
+
+    async def run(self):
+        while not self._stopped.is_set():
+            try:
+                while await self.sweep_once() == self.batch_size:
+                    pass
+            except Exception:
+                logger.exception("Reservation sweep failed")
+            try:
+                await asyncio.wait_for(self._stopped.wait(), timeout=self.interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    async def stop(self):
+        self._stopped.set()
+
+    async def sweep_once(self) -> int:
+        """Expire one batch of orders; returns how many were claimed"""
+        now = datetime.datetime.now(datetime.timezone.utc)
+        claimable = {"$or": [
+            {"status": "pending", "reservation_expires_at": {"$lte": now}},
+            # Claimed by a pass that failed; release_orders skips those it already released
+            {
+                "status": "expiring",
+                "reservation_swept_at": {"$lte": now - datetime.timedelta(seconds=self.claim_timeout_seconds)},
+            },
+        ]}
+        ids = [
+            order["_id"]
+            async for order in self.mongo_db.orders.find(claimable, {"_id": 1}).limit(self.batch_size)
+        ]
+        if not ids:
+            return 0
+
+        sweep_id = uuid.uuid4().hex
+        await self.mongo_db.orders.update_many(
+            {"_id": {"$in": ids}, **claimable},
+            {"$set": {
+                "status": "expiring",
+                "reservation_sweep_id": sweep_id,
+                "reservation_swept_at": now,
+                "audit.updated_at": now,
+            }},
+        )
+        orders = await self.mongo_db.orders.find(
+            {"reservation_sweep_id": sweep_id, "status": "expiring"},
+            {"_id": 0, "order_id": 1, "items.sku": 1, "items.quantity": 1},
+        ).to_list(length=None)
+        for order in orders:
+            order_cache.invalidate(order["order_id"])
+
+        async with self.pg_sessionmaker() as session:
+            released = await InventoryReservationService(session).release_orders(orders)
+            await session.commit()
+
+        await self.mongo_db.orders.update_many(
+            {"reservation_sweep_id": sweep_id, "status": "expiring"},
+            {"$set": {"status": "expired", "audit.updated_at": datetime.datetime.now(datetime.timezone.utc)}},
+        )
+        for order in orders:
+            order_cache.invalidate(order["order_id"])
+
+        self.stats["sweeps"] += 1
+        self.stats["expired_orders"] += len(orders)
+        self.stats["released_units"] += released
+        return len(ids)
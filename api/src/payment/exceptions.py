@@ -0,0 +1,10 @@
+from src.exceptions import InvalidOperation
+
+class PaymentGatewayError(InvalidOperation):
+    pass
+
+class PaymentTimeoutError(PaymentGatewayError):
+    pass
+
+class PaymentCircuitOpenError(PaymentGatewayError):
+    pass
@@ -0,0 +1,60 @@
+import asyncio
+import random
+from abc import ABC, abstractmethod
+
+import httpx
+
+from src.payment.exceptions import PaymentGatewayError
+
+
+class PaymentGateway(ABC):
+    """
+    Charges an order. Returns True when approved and False when declined;
+    transport problems must raise so the caller can retry.
+    """
+    @abstractmethod
+    async def charge(self, order_id: str, amount: float, transaction_id: str) -> bool:
+        ...
+
+    async def close(self):
+        pass
+
+
+class MockPaymentGateway(PaymentGateway):
+    """The original simulated gateway: fixed latency and a random outcome."""
+    def __init__(self, delay_seconds: float = 3, success_rate: float = 0.5):
+        self.delay_seconds = delay_seconds
+        self.success_rate = success_rate
+
+    async def charge(self, order_id: str, amount: float, transaction_id: str) -> bool:
+        await asyncio.sleep(self.delay_seconds)
+        return random.random() < self.success_rate
+
+
+class HttpPaymentGateway(PaymentGateway):
+    """
+    Gateway reached over HTTP through one pooled httpx client.
+
+    Expects `POST {base_url}/charges` to answer with `{"status": "approved" | "declined"}`,
+    which makes it easy to point at a local stub server.
+    """
+    def __init__(self, base_url: str, max_connections: int = 100):
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+
+    async def charge(self, order_id: str, amount: float, transaction_id: str) -> bool:
+        try:
+            response = await self._client.post(
+                "/charges",
+                json={"order_id": order_id, "amount": amount, "transaction_id": transaction_id},
+                headers={"Idempotency-Key": transaction_id},
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise PaymentGatewayError(f"Payment gateway request failed: {e}")
+        return response.json().get("status") == "approved"
+
+    async def close(self):
+        await self._client.aclose()
@@ -0,0 +1,170 @@
+import time
+import asyncio
+from typing import Optional
+
+from src.config.settings import settings as s
+from src.payment.gateways import PaymentGateway, MockPaymentGateway, HttpPaymentGateway
+from src.payment.exceptions import PaymentGatewayError, PaymentTimeoutError, PaymentCircuitOpenError
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive gateway failures and rejects calls
+    for `reset_seconds`. Then a single trial call is let through (half-open): success
+    closes the circuit, failure opens it again.
+    """
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+
+    def is_open(self) -> bool:
+        """Whether calls are currently rejected, without consuming the half-open trial"""
+        return self.state == "open" and time.monotonic() - self._opened_at < self.reset_seconds
+
+    def check(self):
+        if self.state == "closed":
+            return
+        if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_seconds:
+            self.state = "half_open"
+            return
+        raise PaymentCircuitOpenError("Payment gateway circuit is open.")
+
+    def record_success(self):
+        self.state = "closed"
+        self._failures = 0
+
+    def record_failure(self):
+        self._failures += 1
+        if self.state == "half_open" or self._failures >= self.failure_threshold:
+            self.state = "open"
+            self._opened_at = time.monotonic()
+
+
+class PaymentProcessor:
+    """
+    Bounded worker pool in front of a payment gateway.
+
+    At most `concurrency` charges run at once; further requests wait on a bounded
+    queue (callers block when it is full). Every call has a timeout and goes through
+    a circuit breaker, and `stats` exposes in-flight count and queue wait time.
+    """
+    def __init__(
+        self,
+        gateway: PaymentGateway,
+        concurrency: int = s.PAYMENT_CONCURRENCY,
+        queue_size: int = s.PAYMENT_QUEUE_SIZE,
+        timeout_seconds: float = s.PAYMENT_TIMEOUT_SECONDS,
+    ):
+        self.gateway = gateway
+        self.concurrency = concurrency
+        self.timeout_seconds = timeout_seconds
+        self.breaker = CircuitBreaker(s.PAYMENT_CIRCUIT_FAILURE_THRESHOLD, s.PAYMENT_CIRCUIT_RESET_SECONDS)
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._workers: list[asyncio.Task] = []
+        self._in_flight = 0
+        self._dequeued = 0
+        self._queue_wait_total = 0.0
+        self._queue_wait_max = 0.0
+        self._counters = {"approved": 0, "declined": 0, "errors": 0, "timeouts": 0, "rejected": 0}
+
+    def start(self):
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        if self._workers:
+            await self._queue.join()
+            for worker in self._workers:
+                worker.cancel()
+            await asyncio.gather(*self._workers, return_exceptions=True)
+            self._workers = []
+        await self.gateway.close()
+
+    @property
+    def stats(self) -> dict:
+        dequeued = self._dequeued
+        return {
+            **self._counters,
+            "in_flight": self._in_flight,
+            "queue_depth": self._queue.qsize(),
+            "queue_wait_avg_ms": self._queue_wait_total / dequeued * 1000 if dequeued else 0.0,
+            "queue_wait_max_ms": self._queue_wait_max * 1000,
+            "circuit_state": self.breaker.state,
+        }
+
+    async def charge(self, order_id: str, amount: float, transaction_id: str) -> bool:
+        """Queue a charge and wait for its outcome"""
+        if self.breaker.is_open():
+            self._counters["rejected"] += 1
+            raise PaymentCircuitOpenError("Payment gateway circuit is open.")
+        self.start()
+        result: asyncio.Future = asyncio.get_running_loop().create_future()
+        await self._queue.put((order_id, amount, transaction_id, time.monotonic(), result))
+        return await result
+
+    async def _work(self):
+        while True:
+            order_id, amount, transaction_id, enqueued_at, result = await self._queue.get()
+            try:
+                waited = time.monotonic() - enqueued_at
+                self._dequeued += 1
+                self._queue_wait_total += waited
+                self._queue_wait_max = max(self._queue_wait_max, waited)
+                if not result.done():
+                    await self._execute(order_id, amount, transaction_id, result)
+            finally:
+                self._queue.task_done()
+
+    async def _execute(self, order_id: str, amount: float, transaction_id: str, result: asyncio.Future):
+        try:
+            self.breaker.check()
+        except PaymentCircuitOpenError as e:
+            self._counters["rejected"] += 1
+            result.set_exception(e)
+            return
+
+        self._in_flight += 1
+        try:
+            approved = await asyncio.wait_for(
+                self.gateway.charge(order_id, amount, transaction_id), timeout=self.timeout_seconds
+            )
+        except asyncio.TimeoutError:
+            self._counters["timeouts"] += 1
+            self.breaker.record_failure()
+            error: Optional[Exception] = PaymentTimeoutError(
+                f"Payment for order '{order_id}' timed out after {self.timeout_seconds}s."
+            )
+        except Exception as e:
+            self._counters["errors"] += 1
+            self.breaker.record_failure()
+            error = e if isinstance(e, PaymentGatewayError) else PaymentGatewayError(str(e))
+        else:
+            self._counters["approved" if approved else "declined"] += 1
+            self.breaker.record_success()
+            error = None
+        finally:
+            self._in_flight -= 1
+
+        if result.done():
+            return
+        if error:
+            result.set_exception(error)
+        else:
+            result.set_result(approved)
+
+
+def build_payment_processor() -> PaymentProcessor:
+    """Build the processor for the gateway selected by PAYMENT_GATEWAY"""
+    if s.PAYMENT_GATEWAY == "http":
+        if not s.PAYMENT_GATEWAY_URL:
+            raise ValueError({
+                "message": "PAYMENT_GATEWAY_URL is required for the http payment gateway",
+                "method": "build_payment_processor"
+            })
+        gateway: PaymentGateway = HttpPaymentGateway(s.PAYMENT_GATEWAY_URL, max_connections=s.PAYMENT_CONCURRENCY)
+    else:
+        gateway = MockPaymentGateway(s.PAYMENT_MOCK_DELAY_SECONDS, s.PAYMENT_MOCK_SUCCESS_RATE)
+    return PaymentProcessor(gateway)
@@ -0,0 +1,168 @@
+import asyncio
+import logging
+from typing import Iterable
+
+import asyncpg
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config.database import DATABASE_URL, reads_from_replica
+from src.config.settings import settings as s
+from src.product.models import Product
+from src.utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogCache:
+    """
+    In-process cache of product metadata (id, sku, name, price) keyed by SKU.
+    Inventory counts are never cached here; they always come from Postgres.
+
+    Only rows read from the primary fill the cache: a lagging replica can still return
+    a price whose NOTIFY invalidation has already run, and caching it would serve the
+    stale price for a whole TTL. Replica reads still use the entries already cached.
+    """
+    def __init__(self, max_size: int = s.CATALOG_CACHE_MAX_SIZE, ttl_seconds: float = s.CATALOG_CACHE_TTL_SECONDS):
+        self._cache = LRUCache(max_size, ttl_seconds)
+        self._replica_fills_skipped = 0
+
+    @staticmethod
+    def _entry(row) -> dict:
+        return {"id": row.id, "sku": row.sku, "name": row.name, "price": row.price}
+
+    def _fills_from(self, db: AsyncSession) -> bool:
+        if reads_from_replica(db):
+            self._replica_fills_skipped += 1
+            return False
+        return True
+
+    def put_rows(self, db: AsyncSession, rows: Iterable):
+        """Warm the cache from rows read through `db` that expose id, sku, name and price"""
+        if not self._fills_from(db):
+            return
+        for row in rows:
+            self._cache.put(row.sku, self._entry(row))
+
+    async def get_many(self, db: AsyncSession, skus: Iterable[str]) -> dict[str, dict]:
+        """Return the cached entries for `skus`, loading every miss with one query"""
+        found: dict[str, dict] = {}
+        missing = []
+        for sku in skus:
+            entry = self._cache.get(sku)
+            if entry is None:
+                missing.append(sku)
+            else:
+                found[sku] = entry
+
+        if missing:
+            result = await db.execute(
+                select(Product.id, Product.sku, Product.name, Product.price).where(Product.sku.in_(missing))
+            )
+            fill = self._fills_from(db)
+            for row in result.all():
+                entry = self._entry(row)
+                if fill:
+                    self._cache.put(row.sku, entry)
+                found[row.sku] = entry
+        return found
+
+    def invalidate(self, sku: str):
+        self._cache.invalidate(sku)
+
+    def clear(self):
+        self._cache.clear()
+
+    @property
+    def stats(self) -> dict:
+        return {**self._cache.stats, "replica_fills_skipped": self._replica_fills_skipped}
+
+
+catalog_cache = CatalogCache()
+
+
+def notify_trigger_sql(channel: str) -> str:
+    """
+    DDL binding the `product` trigger to `channel`: notify_product_changed() notifies
+    on its first argument. Used by the catalog notify migration and the listener.
+    """
+    literal = "'" + channel.replace("'", "''") + "'"
+    return (
+        "CREATE OR REPLACE TRIGGER notify_product_changed "
+        "AFTER INSERT OR UPDATE OR DELETE ON product "
+        f"FOR EACH ROW EXECUTE FUNCTION notify_product_changed({literal})"
+    )
+
+
+class CatalogInvalidationListener:
+    """
+    Keeps `catalog_cache` coherent with Postgres through LISTEN/NOTIFY.
+
+    The `product` table trigger (installed by the catalog notify migration) notifies
+    the changed SKU on CATALOG_NOTIFY_CHANNEL. The listener holds one dedicated asyncpg
+    connection outside the SQLAlchemy pool, and clears the whole cache whenever it
+    (re)connects because notifications sent while disconnected are lost. On connect it
+    also re-points the trigger if it notifies another channel, e.g. after the setting
+    changed. Without the trigger, entries still expire after CATALOG_CACHE_TTL_SECONDS.
+    """
+    TRIGGER_ARGS_QUERY = (
+        "SELECT tgargs FROM pg_trigger "
+        "WHERE tgname = 'notify_product_changed' AND tgrelid = 'product'::regclass"
+    )
+
+    def __init__(self, cache: CatalogCache = catalog_cache, channel: str = s.CATALOG_NOTIFY_CHANNEL):
+        self.cache = cache
+        self.channel = channel
+        self._dsn = make_url(DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+        self._stopped = asyncio.Event()
+
+    async def _check_trigger(self, connection):
+        """Make the product trigger notify `channel`; only warns when that is not possible"""
+        try:
+            args = await connection.fetchval(self.TRIGGER_ARGS_QUERY)
+            if args is None:
+                logger.warning(
+                    "No notify_product_changed trigger on product; run the migrations. "
+                    "Catalog entries only refresh once they expire"
+                )
+                return
+            channel = bytes(args).split(b"\x00")[0].decode()
+            if channel != self.channel:
+                logger.warning("Product trigger notifies %r, re-pointing it to %r", channel, self.channel)
+                await connection.execute(notify_trigger_sql(self.channel))
+        except Exception as e:
+            logger.warning("Could not check the product notify trigger: %s", e)
+
+    def _on_notify(self, connection, pid, channel, payload: str):
+        if payload and payload != "*":
+            self.cache.invalidate(payload)
+        else:
+            self.cache.clear()
+
+    async def run(self):
+        while not self._stopped.is_set():
+            connection = None
+            try:
+                connection = await asyncpg.connect(self._dsn)
+                lost = asyncio.Event()
+                connection.add_termination_listener(lambda _: lost.set())
+                await self._check_trigger(connection)
+                await connection.add_listener(self.channel, self._on_notify)
+                self.cache.clear()
+                waiters = [asyncio.create_task(self._stopped.wait()), asyncio.create_task(lost.wait())]
+                _, pending = await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+                for waiter in pending:
+                    waiter.cancel()
+            except Exception as e:
+                logger.warning("Catalog invalidation listener disconnected, reconnecting in 5s: %s", e)
+                try:
+                    await asyncio.wait_for(self._stopped.wait(), timeout=5)
+                except asyncio.TimeoutError:
+                    pass
+            finally:
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+
+    async def stop(self):
+        self._stopped.set()
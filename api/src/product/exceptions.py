@@ -0,0 +1,4 @@
+from src.exceptions import ElementNotFound
+
+class ProductNotFound(ElementNotFound):
+    pass
@@ -1,20 +1,20 @@
-import datetime
-from sqlalchemy import String, Numeric
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy.sql import func
-
-from src.config.database import Base
-
-class Product(Base):
-    __tablename__ = "product"
-
-    id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=func.gen_random_uuid())
-    sku: Mapped[str] = mapped_column(String(50), unique=True, nullable=False, index=True)
-    name: Mapped[str] = mapped_column(String(255), nullable=False)
-    price: Mapped[int] = mapped_column(Numeric(10, 2), nullable=False)
-    created_at: Mapped[datetime.datetime] = mapped_column(default=datetime.datetime.now)
-
-    inventory = relationship(
-        "Inventory", back_populates="product", uselist=False, cascade="all, delete-orphan"
-    )
+import datetime
+from sqlalchemy import String, Numeric
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.sql import func
+
+from src.config.database import Base
+
+class Product(Base):
+    __tablename__ = "product"
+
+    id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=func.gen_random_uuid())
+    sku: Mapped[str] = mapped_column(String(50), unique=True, nullable=False, index=True)
+    name: Mapped[str] = mapped_column(String(255), nullable=False)
+    price: Mapped[int] = mapped_column(Numeric(10, 2), nullable=False)
+    created_at: Mapped[datetime.datetime] = mapped_column(default=datetime.datetime.now)
+
+    inventory = relationship(
+        "Inventory", back_populates="product", uselist=False, cascade="all, delete-orphan"
+    )
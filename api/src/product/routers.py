@@ -1,25 +1,36 @@
-from fastapi import APIRouter, Depends, Query, status, HTTPException
-from fastapi_pagination import Page
-from sqlalchemy.ext.asyncio import AsyncSession
-from fastapi_pagination import Params
-from src.product.services import ProductService
-from src.config.database import get_db
-from src.product.schemas import ProductSearchSchema
-
-router = APIRouter(prefix="/products", tags=["Products"])
-
-@router.get("/", response_model=ProductSearchSchema, status_code=status.HTTP_200_OK)
-async def get_products(
-    sku: str | None = Query(None, description="Filter products by SKU"),
-    params: Params = Depends(),
-    db: AsyncSession = Depends(get_db)
-):
-    """
-    Retrieve all products with optional SKU filter and pagination
-    """
-    try:
-        service = ProductService(db)
-        result = await service.get_search_products(sku, params)
-        return result
-    except Exception as e:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+from typing import Literal
+from fastapi import APIRouter, Depends, Query, status, HTTPException
+from fastapi_pagination import Page
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi_pagination import Params
+from src.product.services import ProductService
+from src.config.database import get_read_db
+from src.product.schemas import ProductSearchSchema, ProductCursorSchema
+from src.utils.pagination import InvalidCursor
+from src.utils.responses import fast_json
+
+router = APIRouter(prefix="/products", tags=["Products"])
+
+@router.get("/", response_model=ProductSearchSchema | ProductCursorSchema, status_code=status.HTTP_200_OK)
+async def get_products(
+    sku: str | None = Query(None, description="Filter products by SKU"),
+    pagination: Literal["offset", "cursor"] = Query("offset", description="Pagination mode"),
+    cursor: str | None = Query(None, description="Opaque cursor from a previous page (cursor mode)"),
+    include_total: bool = Query(False, description="Also count all products (cursor mode)"),
+    params: Params = Depends(),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Retrieve all products with optional SKU filter and pagination.
+    Cursor mode walks the catalog by SKU without OFFSET or COUNT.
+    """
+    try:
+        service = ProductService(db)
+        if (pagination == "cursor" or cursor) and not sku:
+            return fast_json(await service.get_products_by_cursor(params.size, cursor, include_total))
+        result = await service.get_search_products(sku, params)
+        return fast_json(result)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
@@ -1,22 +1,27 @@
-from pydantic import BaseModel
-from uuid import UUID
-
-
-class ProductItemSchema(BaseModel):
-    id: UUID
-    sku: str
-    name: str
-    price: float
-    available_quantity: int
-
-
-class ProductSearchSchema(BaseModel):
-    items: list[ProductItemSchema]
-    
-    total: int
-    page: int
-    size: int
-    pages: int
-    
-    
-    
\ No newline at end of file
+from pydantic import BaseModel
+from uuid import UUID
+
+
+class ProductItemSchema(BaseModel):
+    id: UUID
+    sku: str
+    name: str
+    price: float
+    available_quantity: int
+
+
+class ProductSearchSchema(BaseModel):
+    items: list[ProductItemSchema]
+    
+    total: int
+    page: int
+    size: int
+    pages: int
+
+
+class ProductCursorSchema(BaseModel):
+    items: list[ProductItemSchema]
+
+    next_cursor: str | None
+    size: int
+    total: int | None = None
@@ -1,60 +1,139 @@
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from fastapi_pagination.ext.sqlalchemy import paginate 
-from fastapi_pagination import Params
-from src.product.models import Product
-from sqlalchemy.orm import selectinload
-
-
-
-
-class ProductService:
-    def __init__(self, db: AsyncSession):
-        self.db = db
-        
-    async def get_product_by_sku(self, sku: str | None):
-        try:
-            query = select(Product).options(selectinload(Product.inventory)).where(Product.sku == sku) 
-            return query
-        except Exception as e:
-            raise ValueError({
-                "message": "Error retrieving product by SKU",
-                "error": str(e),
-                "method": "ProductService.get_product_by_sku",
-            })
-
-    async def get_all_products_with_relationships(self):
-        """
-            Retrieve all products.
-        """
-        try:
-            query = select(Product).options(selectinload(Product.inventory))
-            return query
-        except Exception as e:
-            raise ValueError({
-                "message": "Error retrieving all products",
-                "error": str(e),
-                "method": "ProductService.get_all_products",
-            })
-
-    async def get_search_products(self, sku: str | None, params: Params):
-        """
-        Retrieve products by SKU.
-        """
-        try:
-            product = await self.get_all_products_with_relationships()
-            if sku:
-                product = await self.get_product_by_sku(sku)
-            paginate_query = await paginate(conn=self.db, query=product, params=params)
-            for i in paginate_query.items:
-                i.available_quantity = i.inventory.available_quantity if i.inventory else 0
-            return paginate_query
-        except Exception as e:
-            raise ValueError({
-                "message": "Error retrieving search products",
-                "error": str(e),
-                "method": "ProductService.get_search_products",
-            })
-            
-            
-
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func
+from fastapi_pagination.ext.sqlalchemy import paginate 
+from fastapi_pagination import Params
+from src.product.models import Product
+from src.product.cache import CatalogCache, catalog_cache
+from src.inventory.models import Inventory
+from src.inventory.sharding import inventory_totals
+from src.utils.pagination import InvalidCursor, decode_cursor, encode_cursor
+from sqlalchemy.orm import selectinload
+
+
+
+
+class ProductService:
+    def __init__(self, db: AsyncSession, catalog: CatalogCache = catalog_cache):
+        self.db = db
+        self.catalog = catalog
+        
+    async def get_product_by_sku(self, sku: str | None):
+        try:
+            query = select(Product).options(selectinload(Product.inventory)).where(Product.sku == sku) 
+            return query
+        except Exception as e:
+            raise ValueError({
+                "message": "Error retrieving product by SKU",
+                "error": str(e),
+                "method": "ProductService.get_product_by_sku",
+            })
+
+    async def get_all_products_with_relationships(self):
+        """
+            Retrieve all products.
+        """
+        try:
+            query = select(Product).options(selectinload(Product.inventory))
+            return query
+        except Exception as e:
+            raise ValueError({
+                "message": "Error retrieving all products",
+                "error": str(e),
+                "method": "ProductService.get_all_products",
+            })
+
+    async def get_listing_query(self):
+        """
+        Products joined with their live available quantity, in one query.
+        Sharded products report the sum of their shards.
+        """
+        totals = inventory_totals()
+        return (
+            select(
+                Product.id,
+                Product.sku,
+                Product.name,
+                Product.price,
+                func.coalesce(totals.c.available_quantity, 0).label("available_quantity"),
+            )
+            .outerjoin(totals, totals.c.product_id == Product.id)
+            .order_by(Product.sku)
+        )
+
+    async def get_product_page_by_sku(self, sku: str, params: Params):
+        """
+        Single-SKU lookup: metadata from the catalog cache, stock from Postgres.
+        """
+        products = await self.catalog.get_many(self.db, [sku])
+        items = []
+        if sku in products and params.page == 1:
+            product = products[sku]
+            totals = inventory_totals()
+            available = await self.db.scalar(
+                select(totals.c.available_quantity).where(totals.c.product_id == product["id"])
+            )
+            items.append({**product, "available_quantity": available or 0})
+        return {
+            "items": items,
+            "total": 1 if sku in products else 0,
+            "page": params.page,
+            "size": params.size,
+            "pages": 1 if sku in products else 0,
+        }
+
+    async def get_products_by_cursor(self, size: int, cursor: str | None, include_total: bool = False):
+        """
+        Keyset pagination over SKU: no OFFSET and no COUNT unless asked for.
+        """
+        try:
+            query = await self.get_listing_query()
+            if cursor:
+                position = decode_cursor(cursor, ("sku",))
+                query = query.where(Product.sku > position["sku"])
+            rows = (await self.db.execute(query.limit(size + 1))).all()
+            items = rows[:size]
+            self.catalog.put_rows(self.db, items)
+
+            total = None
+            if include_total:
+                total = await self.db.scalar(select(func.count()).select_from(Product))
+            return {
+                "items": items,
+                "next_cursor": encode_cursor({"sku": items[-1].sku}) if len(rows) > size else None,
+                "size": size,
+                "total": total,
+            }
+        except InvalidCursor:
+            raise
+        except Exception as e:
+            raise ValueError({
+                "message": "Error retrieving products by cursor",
+                "error": str(e),
+                "method": "ProductService.get_products_by_cursor",
+            })
+
+    async def get_search_products(self, sku: str | None, params: Params):
+        """
+        Retrieve products by SKU.
+        """
+        try:
+            if sku:
+                return await self.get_product_page_by_sku(sku, params)
+            query = await self.get_listing_query()
+            paginate_query = await paginate(conn=self.db, query=query, params=params)
+            self.catalog.put_rows(self.db, paginate_query.items)
+            return {
+                "items": paginate_query.items,
+                "total": paginate_query.total,
+                "page": paginate_query.page,
+                "size": paginate_query.size,
+                "pages": paginate_query.pages,
+            }
+        except Exception as e:
+            raise ValueError({
+                "message": "Error retrieving search products",
+                "error": str(e),
+                "method": "ProductService.get_search_products",
+            })
+            
+            
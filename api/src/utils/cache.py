@@ -0,0 +1,58 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+class LRUCache:
+    """
+    Size-bounded LRU cache whose entries also expire after `ttl_seconds`.
+    Not thread-safe; meant to be used from a single event loop.
+    """
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            self._counters["misses"] += 1
+            return default
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self._counters["expirations"] += 1
+            self._counters["misses"] += 1
+            return default
+        self._entries.move_to_end(key)
+        self._counters["hits"] += 1
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def invalidate(self, key: Hashable):
+        if self._entries.pop(key, None) is not None:
+            self._counters["invalidations"] += 1
+
+    def clear(self):
+        self._counters["invalidations"] += len(self._entries)
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def stats(self) -> dict:
+        lookups = self._counters["hits"] + self._counters["misses"]
+        return {
+            **self._counters,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hit_ratio": self._counters["hits"] / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,38 @@
+import json
+import base64
+import datetime
+
+from src.exceptions import InvalidOperation
+
+
+class InvalidCursor(InvalidOperation):
+    pass
+
+
+def encode_cursor(position: dict) -> str:
+    """
+    Encode the sort key of the last row of a page into an opaque, URL-safe cursor.
+    Datetimes are tagged so they round-trip exactly.
+    """
+    payload = {
+        key: {"$dt": value.isoformat()} if isinstance(value, datetime.datetime) else value
+        for key, value in position.items()
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, keys: tuple[str, ...]) -> dict:
+    """Decode a cursor produced by `encode_cursor`, checking it carries `keys`."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        position = {
+            key: datetime.datetime.fromisoformat(value["$dt"]) if isinstance(value, dict) else value
+            for key, value in payload.items()
+        }
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor("Invalid pagination cursor.")
+    if set(position) != set(keys):
+        raise InvalidCursor("Invalid pagination cursor.")
+    return position
@@ -0,0 +1,47 @@
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from src.config.settings import settings as s
+
+
+def _orjson_default(value: Any):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if hasattr(value, "_asdict"):  # SQLAlchemy Row
+        return value._asdict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Encode trusted service output straight to JSON bytes.
+    datetime, date and UUID are handled natively by orjson; Decimal becomes float.
+    """
+    return orjson.dumps(content, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered with orjson.
+
+    Returning it from a route bypasses `response_model` validation and serialization,
+    so only use it for payloads that the service already built in the schema's shape.
+    """
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def fast_json(content: Any, status_code: int = 200, headers: dict | None = None):
+    """
+    Wrap hot read payloads in a FastJSONResponse when FAST_JSON_RESPONSES is on;
+    otherwise return them untouched so FastAPI validates them against `response_model`.
+    """
+    if not s.FAST_JSON_RESPONSES:
+        return content
+    return FastJSONResponse(content, status_code=status_code, headers=headers)
@@ -0,0 +1,40 @@
+import datetime
+import json
+import zlib
+from decimal import Decimal
+from typing import Any, AsyncIterable, AsyncIterator
+
+
+def _json_default(value: Any):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+
+async def iter_ndjson(documents: AsyncIterable[dict], flush_every: int) -> AsyncIterator[bytes]:
+    """
+    Encode documents as NDJSON, yielding one chunk per `flush_every` documents so
+    memory stays bounded by a single chunk whatever the size of the result.
+    """
+    lines: list[str] = []
+    async for document in documents:
+        lines.append(json.dumps(document, default=_json_default, separators=(",", ":")))
+        if len(lines) >= flush_every:
+            lines.append("")
+            yield "\n".join(lines).encode("utf-8")
+            lines = []
+    if lines:
+        lines.append("")
+        yield "\n".join(lines).encode("utf-8")
+
+
+async def gzip_chunks(chunks: AsyncIterable[bytes], level: int = 6) -> AsyncIterator[bytes]:
+    """Compress a byte stream incrementally into a single gzip member."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
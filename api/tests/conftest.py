@@ -0,0 +1,48 @@
+"""
+Tests run without Postgres, Mongo or Kafka: Mongo and Kafka are replaced by the
+stand-ins in `tests.fakes`, and Postgres sessions by FakeSession where a test
+needs one. Settings are read at import time, so the environment is configured here,
+before any test module imports `src`.
+"""
+import pytest
+
+from tests.fakes import FakeMongoDatabase, configure_environment
+
+configure_environment(None)
+
+
+class FakeSession:
+    """AsyncSession stand-in for code that only commits or rolls back around a mocked service"""
+    def __init__(self):
+        self.commits = 0
+        self.rollbacks = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+
+@pytest.fixture
+def mongo():
+    return FakeMongoDatabase()
+
+
+@pytest.fixture
+def pg_sessionmaker():
+    sessions = []
+
+    def sessionmaker():
+        session = FakeSession()
+        sessions.append(session)
+        return session
+
+    sessionmaker.sessions = sessions
+    return sessionmaker
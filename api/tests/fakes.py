@@ -0,0 +1,609 @@
+"""
+In-process stand-ins for the services the API talks to, shared by the tests and the
+benchmark harness.
+
+FakeMongoDatabase implements the subset of the Motor API the application uses
+(CRUD, $-operators it queries with, the aggregation stages of the order history,
+unique indexes and bulk errors). FakeKafkaProducer replaces AIOKafkaProducer and
+acknowledges sends after a configurable broker latency. configure_environment points
+the settings at them before `src` is imported.
+"""
+import asyncio
+import copy
+import datetime
+import itertools
+import os
+from types import SimpleNamespace
+from typing import Any, Iterable, Optional
+from urllib.parse import urlparse
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+
+
+def configure_environment(database_url: Optional[str]):
+    """
+    Settings are read at import time, so this has to run before anything from `src` is imported.
+    Without a database the Postgres settings point at a closed local port, so the
+    dependents fail fast instead of hanging.
+    """
+    if database_url:
+        url = urlparse(database_url)
+        postgres = {
+            "POSTGRES_USER": url.username or "postgres",
+            "POSTGRES_PASSWORD": url.password or "",
+            "POSTGRES_HOST": url.hostname or "localhost",
+            "POSTGRES_PORT": str(url.port or 5432),
+            "POSTGRES_DB": url.path.lstrip("/") or "postgres",
+        }
+    else:
+        postgres = {
+            "POSTGRES_USER": "bench",
+            "POSTGRES_PASSWORD": "bench",
+            "POSTGRES_HOST": "127.0.0.1",
+            "POSTGRES_PORT": "1",
+            "POSTGRES_DB": "bench",
+        }
+    os.environ.update(postgres)
+    os.environ.update({
+        "MONGO_URI": "mongodb://127.0.0.1:1",
+        "MONGO_TRANSACTIONS_ENABLED": "false",
+        "KAFKA_BOOTSTRAP_SERVERS": "bench-fake:9092",
+        "PAYMENT_GATEWAY": "mock",
+        "PAYMENT_MOCK_DELAY_SECONDS": os.environ.get("BENCH_PAYMENT_DELAY_SECONDS", "0.05"),
+        "PAYMENT_MOCK_SUCCESS_RATE": "1.0",
+        "RESERVATION_SWEEP_ENABLED": str(bool(database_url)).lower(),
+        "CATALOG_LISTEN_ENABLED": str(bool(database_url)).lower(),
+        "OUTBOX_POLL_INTERVAL_SECONDS": "0.2",
+    })
+
+
+_MISSING = object()
+
+# Fields looked up by equality on hot paths; the fake keeps a hash index on each
+HASHED_FIELDS = ("order_id", "customer.user_id", "event_id", "claim_id", "reservation_sweep_id", "status")
+
+
+def _hashable(value: Any) -> bool:
+    try:
+        hash(value)
+        return True
+    except TypeError:
+        return False
+
+
+def _get(doc: Any, path: str) -> Any:
+    value = doc
+    for part in path.split("."):
+        if isinstance(value, dict):
+            value = value.get(part, _MISSING)
+        elif isinstance(value, list):
+            values = [item.get(part, _MISSING) for item in value if isinstance(item, dict)]
+            value = [v for v in values if v is not _MISSING] or _MISSING
+        else:
+            return _MISSING
+        if value is _MISSING:
+            return _MISSING
+    return value
+
+
+def _set(doc: dict, path: str, value: Any):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = value
+
+
+def _unset(doc: dict, path: str):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(parts[-1], None)
+
+
+def _compare(value: Any, op: str, operand: Any) -> bool:
+    candidates = value if isinstance(value, list) else [value]
+    for candidate in candidates:
+        if candidate is _MISSING or candidate is None:
+            continue
+        try:
+            if op == "$lt" and candidate < operand:
+                return True
+            if op == "$lte" and candidate <= operand:
+                return True
+            if op == "$gt" and candidate > operand:
+                return True
+            if op == "$gte" and candidate >= operand:
+                return True
+        except TypeError:
+            continue
+    return False
+
+
+def _equals(value: Any, operand: Any) -> bool:
+    if value is _MISSING:
+        return operand is None
+    if isinstance(value, list) and not isinstance(operand, list):
+        return operand in value
+    return value == operand
+
+
+def _matches_condition(value: Any, condition: Any) -> bool:
+    if not (isinstance(condition, dict) and condition and all(key.startswith("$") for key in condition)):
+        return _equals(value, condition)
+    for op, operand in condition.items():
+        if op == "$eq":
+            ok = _equals(value, operand)
+        elif op == "$ne":
+            ok = not _equals(value, operand)
+        elif op == "$in":
+            ok = any(_equals(value, item) for item in operand)
+        elif op == "$nin":
+            ok = not any(_equals(value, item) for item in operand)
+        elif op == "$exists":
+            ok = (value is not _MISSING) == bool(operand)
+        elif op in ("$lt", "$lte", "$gt", "$gte"):
+            ok = _compare(value, op, operand)
+        else:
+            raise NotImplementedError(f"Query operator {op} is not supported by the fake")
+        if not ok:
+            return False
+    return True
+
+
+def matches(doc: dict, query: Optional[dict]) -> bool:
+    for key, condition in (query or {}).items():
+        if key == "$or":
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        elif key == "$and":
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+        elif not _matches_condition(_get(doc, key), condition):
+            return False
+    return True
+
+
+def _format_date(value: datetime.datetime, fmt: str) -> str:
+    fmt = fmt.replace("%L", f"{value.microsecond // 1000:03d}")
+    return value.strftime(fmt)
+
+
+def _evaluate(doc: dict, expression: Any) -> Any:
+    if isinstance(expression, str) and expression.startswith("$"):
+        value = _get(doc, expression[1:])
+        return None if value is _MISSING else value
+    if isinstance(expression, dict) and "$dateToString" in expression:
+        spec = expression["$dateToString"]
+        value = _evaluate(doc, spec["date"])
+        return _format_date(value, spec.get("format", "%Y-%m-%dT%H:%M:%S.%LZ")) if value else None
+    return expression
+
+
+def _include(source: dict, target: dict, parts: list[str]):
+    """Copy one projected path; through arrays it keeps an array of sub-documents, like Mongo"""
+    head, rest = parts[0], parts[1:]
+    if head not in source:
+        return
+    value = source[head]
+    if not rest:
+        target[head] = copy.deepcopy(value)
+    elif isinstance(value, dict):
+        _include(value, target.setdefault(head, {}), rest)
+    elif isinstance(value, list):
+        items = [item for item in value if isinstance(item, dict)]
+        projected = target.setdefault(head, [{} for _ in items])
+        for item, out in zip(items, projected):
+            _include(item, out, rest)
+
+
+def project(doc: dict, projection: Optional[dict]) -> dict:
+    if not projection:
+        return copy.deepcopy(doc)
+    fields = {key: value for key, value in projection.items() if key != "_id"}
+    include_id = projection.get("_id", 1)
+    computed = {key: value for key, value in fields.items() if not isinstance(value, (int, bool))}
+    inclusive = (
+        any(value for value in fields.values() if isinstance(value, (int, bool)))
+        or bool(computed)
+        or (not fields and bool(include_id))
+    )
+
+    if inclusive:
+        result: dict = {}
+        if include_id and "_id" in doc:
+            result["_id"] = doc["_id"]
+        for key, value in fields.items():
+            if key in computed:
+                result[key] = _evaluate(doc, value)
+            elif value:
+                _include(doc, result, key.split("."))
+        return result
+
+    result = copy.deepcopy(doc)
+    if not include_id:
+        result.pop("_id", None)
+    for key in fields:
+        _unset(result, key)
+    return result
+
+
+def _sort_key(value: Any):
+    if value is _MISSING or value is None:
+        return (0, 0)
+    return (1, value)
+
+
+def sort_documents(docs: list[dict], spec: Iterable[tuple[str, int]]) -> list[dict]:
+    for key, direction in reversed(list(spec)):
+        docs.sort(key=lambda doc: _sort_key(_get(doc, key)), reverse=direction < 0)
+    return docs
+
+
+def _sort_spec(key_or_list, direction=None) -> list[tuple[str, int]]:
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction or 1)]
+    if isinstance(key_or_list, dict):
+        return list(key_or_list.items())
+    return list(key_or_list)
+
+
+class FakeCursor:
+    def __init__(self, collection: "FakeCollection", query: Optional[dict], projection: Optional[dict]):
+        self._collection = collection
+        self._query = query
+        self._projection = projection
+        self._sort: list[tuple[str, int]] = []
+        self._skip = 0
+        self._limit = 0
+        self._results: Optional[list] = None
+
+    def sort(self, key_or_list, direction=None):
+        self._sort = _sort_spec(key_or_list, direction)
+        return self
+
+    def skip(self, count: int):
+        self._skip = count
+        return self
+
+    def limit(self, count: int):
+        self._limit = count
+        return self
+
+    def batch_size(self, size: int):
+        return self
+
+    def _materialize(self) -> list[dict]:
+        if self._results is None:
+            docs = self._collection._scan(self._query)
+            if self._sort:
+                docs = sort_documents(docs, self._sort)
+            docs = docs[self._skip:]
+            if self._limit:
+                docs = docs[:self._limit]
+            self._results = [project(doc, self._projection) for doc in docs]
+        return self._results
+
+    async def to_list(self, length: Optional[int] = None) -> list[dict]:
+        await self._collection._round_trip()
+        results = self._materialize()
+        return results[:length] if length else list(results)
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        await self._collection._round_trip()
+        for doc in self._materialize():
+            yield doc
+
+
+class FakeAggregation:
+    def __init__(self, collection: "FakeCollection", pipeline: list[dict]):
+        self._collection = collection
+        self._pipeline = pipeline
+
+    def _run(self) -> list[dict]:
+        pipeline = list(self._pipeline)
+        if pipeline and "$match" in pipeline[0]:
+            docs = self._collection._scan(pipeline.pop(0)["$match"])
+        else:
+            docs = list(self._collection._docs.values())
+        for stage in pipeline:
+            (name, spec), = stage.items()
+            if name == "$match":
+                docs = [doc for doc in docs if matches(doc, spec)]
+            elif name == "$sort":
+                docs = sort_documents(list(docs), spec.items())
+            elif name == "$skip":
+                docs = docs[spec:]
+            elif name == "$limit":
+                docs = docs[:spec]
+            elif name == "$project":
+                docs = [project(doc, spec) for doc in docs]
+            elif name == "$count":
+                docs = [{spec: len(docs)}]
+            else:
+                raise NotImplementedError(f"Aggregation stage {name} is not supported by the fake")
+        return docs
+
+    async def to_list(self, length: Optional[int] = None) -> list[dict]:
+        await self._collection._round_trip()
+        results = self._run()
+        return results[:length] if length else results
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        await self._collection._round_trip()
+        for doc in self._run():
+            yield doc
+
+
+class FakeCollection:
+    def __init__(self, database: "FakeMongoDatabase", name: str):
+        self.database = database
+        self.name = name
+        self._docs: dict[Any, dict] = {}
+        self._unique: dict[str, tuple[str, ...]] = {}
+        self._unique_values: dict[str, set] = {}
+        self._hash: dict[str, dict[Any, set]] = {field: {} for field in HASHED_FIELDS}
+
+    def _index(self, doc: dict):
+        for field, index in self._hash.items():
+            value = _get(doc, field)
+            if value is not _MISSING and _hashable(value):
+                index.setdefault(value, set()).add(doc["_id"])
+
+    def _unindex(self, doc: dict):
+        for field, index in self._hash.items():
+            value = _get(doc, field)
+            if value is not _MISSING and _hashable(value):
+                ids = index.get(value)
+                if ids:
+                    ids.discard(doc["_id"])
+
+    def _scan(self, query: Optional[dict]) -> list[dict]:
+        """Documents matching `query`, narrowed through a hash index when the query allows it"""
+        for field, condition in (query or {}).items():
+            if field not in self._hash:
+                continue
+            if isinstance(condition, dict) and set(condition) == {"$in"}:
+                values = condition["$in"]
+            elif not isinstance(condition, (dict, list)):
+                values = [condition]
+            else:
+                continue
+            if not all(_hashable(value) for value in values):
+                continue
+            ids = set().union(*(self._hash[field].get(value, ()) for value in values))
+            candidates = [self._docs[doc_id] for doc_id in ids]
+            break
+        else:
+            candidates = list(self._docs.values())
+        return [doc for doc in candidates if matches(doc, query)]
+
+    async def _round_trip(self):
+        self.database.round_trips += 1
+        if self.database.latency_seconds:
+            await asyncio.sleep(self.database.latency_seconds)
+        else:
+            await asyncio.sleep(0)
+
+    def _unique_keys(self, doc: dict) -> dict[str, tuple]:
+        return {name: tuple(repr(_get(doc, k)) for k in keys) for name, keys in self._unique.items()}
+
+    def _insert(self, doc: dict) -> Any:
+        doc = copy.deepcopy(doc)
+        doc.setdefault("_id", ObjectId())
+        if doc["_id"] in self._docs:
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: _id_", 11000)
+        keys = self._unique_keys(doc)
+        for name, key in keys.items():
+            if key in self._unique_values[name]:
+                raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: {name}", 11000)
+        for name, key in keys.items():
+            self._unique_values[name].add(key)
+        self._docs[doc["_id"]] = doc
+        self._index(doc)
+        return doc["_id"]
+
+    def _remove(self, doc_id: Any):
+        doc = self._docs.pop(doc_id)
+        self._unindex(doc)
+        for name, key in self._unique_keys(doc).items():
+            self._unique_values[name].discard(key)
+
+    async def create_indexes(self, models):
+        for model in models:
+            document = model.document
+            if document.get("unique"):
+                self._unique[document["name"]] = tuple(document["key"].keys())
+                self._unique_values[document["name"]] = {
+                    tuple(repr(_get(doc, k)) for k in document["key"]) for doc in self._docs.values()
+                }
+        return [model.document["name"] for model in models]
+
+    async def drop_index(self, name: str):
+        if self._unique.pop(name, None) is None:
+            raise OperationFailure(f"index not found with name [{name}]", 27)
+        self._unique_values.pop(name, None)
+
+    async def insert_one(self, doc: dict, session=None):
+        await self._round_trip()
+        inserted_id = self._insert(doc)
+        doc.setdefault("_id", inserted_id)
+        return SimpleNamespace(inserted_id=inserted_id, acknowledged=True)
+
+    async def insert_many(self, docs: list[dict], ordered: bool = True, session=None):
+        await self._round_trip()
+        inserted, errors = [], []
+        for index, doc in enumerate(docs):
+            try:
+                inserted_id = self._insert(doc)
+                doc.setdefault("_id", inserted_id)
+                inserted.append(inserted_id)
+            except DuplicateKeyError as e:
+                errors.append({"index": index, "code": 11000, "errmsg": str(e)})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(inserted)})
+        return SimpleNamespace(inserted_ids=inserted, acknowledged=True)
+
+    async def find_one(self, query: Optional[dict] = None, projection: Optional[dict] = None, session=None):
+        await self._round_trip()
+        for doc in self._scan(query):
+            return project(doc, projection)
+        return None
+
+    def find(self, query: Optional[dict] = None, projection: Optional[dict] = None, batch_size: int = 0, **kwargs):
+        return FakeCursor(self, query, projection)
+
+    def aggregate(self, pipeline: list[dict], **kwargs):
+        return FakeAggregation(self, pipeline)
+
+    async def count_documents(self, query: dict, **kwargs) -> int:
+        await self._round_trip()
+        return len(self._scan(query))
+
+    def _apply_update(self, doc: dict, update: dict) -> bool:
+        before = copy.deepcopy(doc)
+        self._unindex(doc)
+        for op, fields in update.items():
+            for key, value in fields.items():
+                if op == "$set":
+                    _set(doc, key, copy.deepcopy(value))
+                elif op == "$inc":
+                    current = _get(doc, key)
+                    _set(doc, key, (0 if current is _MISSING else current) + value)
+                elif op == "$unset":
+                    _unset(doc, key)
+                else:
+                    raise NotImplementedError(f"Update operator {op} is not supported by the fake")
+        self._index(doc)
+        return doc != before
+
+    async def _update(self, query: dict, update: dict, many: bool):
+        await self._round_trip()
+        matched = modified = 0
+        for doc in self._scan(query):
+            matched += 1
+            modified += self._apply_update(doc, update)
+            if not many:
+                break
+        return SimpleNamespace(matched_count=matched, modified_count=modified, acknowledged=True)
+
+    async def update_one(self, query: dict, update: dict, session=None, **kwargs):
+        return await self._update(query, update, many=False)
+
+    async def update_many(self, query: dict, update: dict, session=None, **kwargs):
+        return await self._update(query, update, many=True)
+
+    async def bulk_write(self, requests: list, ordered: bool = True, **kwargs):
+        await self._round_trip()
+        matched = modified = 0
+        for request in requests:
+            for doc in self._scan(request._filter):
+                matched += 1
+                modified += self._apply_update(doc, request._doc)
+                break
+        return SimpleNamespace(matched_count=matched, modified_count=modified, acknowledged=True)
+
+    async def _delete(self, query: dict, many: bool):
+        await self._round_trip()
+        deleted = 0
+        for doc in self._scan(query):
+            self._remove(doc["_id"])
+            deleted += 1
+            if not many:
+                break
+        return SimpleNamespace(deleted_count=deleted, acknowledged=True)
+
+    async def delete_one(self, query: dict, session=None):
+        return await self._delete(query, many=False)
+
+    async def delete_many(self, query: dict, session=None):
+        return await self._delete(query, many=True)
+
+
+class FakeMongoDatabase:
+    """
+    Motor-like database whose collections live in process memory.
+    `latency_seconds` is awaited on every round trip to model network cost;
+    `round_trips` counts them.
+    """
+    def __init__(self, latency_seconds: float = 0.0):
+        self.latency_seconds = latency_seconds
+        self.round_trips = 0
+        self._collections: dict[str, FakeCollection] = {}
+        self.client = SimpleNamespace(start_session=self._no_transactions)
+
+    async def _no_transactions(self):
+        raise OperationFailure("Transactions are not supported by the fake; set MONGO_TRANSACTIONS_ENABLED=false")
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        if name not in self._collections:
+            self._collections[name] = FakeCollection(self, name)
+        return self._collections[name]
+
+    def __getattr__(self, name: str) -> FakeCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    async def command(self, name: str, *args, **kwargs):
+        self.round_trips += 1
+        await asyncio.sleep(self.latency_seconds)
+        return {"ok": 1.0}
+
+    async def list_collection_names(self) -> list[str]:
+        return list(self._collections)
+
+
+class FakeKafkaProducer:
+    """
+    AIOKafkaProducer stand-in: `send` returns a future resolved after `ack_latency_seconds`,
+    like a broker acknowledging a linger-batched request.
+    """
+    def __init__(self, ack_latency_seconds: float = 0.002, partitions: int = 3):
+        self.ack_latency_seconds = ack_latency_seconds
+        self.partitions = partitions
+        self.sent: list[tuple[str, bytes, bytes]] = []
+        self._offsets = itertools.count()
+        self.client = SimpleNamespace(fetch_all_metadata=self._fetch_all_metadata)
+
+    async def start(self):
+        await asyncio.sleep(0)
+
+    async def stop(self):
+        await asyncio.sleep(0)
+
+    async def _fetch_all_metadata(self):
+        await asyncio.sleep(0)
+
+    async def partitions_for(self, topic: str) -> set[int]:
+        return set(range(self.partitions))
+
+    async def send(self, topic: str, value: bytes = None, key: bytes = None, partition: int = None, **kwargs):
+        self.sent.append((topic, key, value))
+        future = asyncio.get_running_loop().create_future()
+        if partition is None:
+            partition = hash(key) % self.partitions if key else 0
+        metadata = SimpleNamespace(topic=topic, partition=partition, offset=next(self._offsets))
+        asyncio.get_running_loop().call_later(self.ack_latency_seconds, future.set_result, metadata)
+        return future
+
+    async def send_and_wait(self, topic: str, value: bytes = None, key: bytes = None, **kwargs):
+        return await (await self.send(topic, value=value, key=key, **kwargs))
+
+
+def consumer_record(topic: str, partition: int, offset: int, key: bytes, value: bytes, headers=()) -> SimpleNamespace:
+    """Shape of aiokafka's ConsumerRecord, as far as KafkaWorker reads it."""
+    return SimpleNamespace(
+        topic=topic, partition=partition, offset=offset, key=key, value=value,
+        headers=list(headers), timestamp=int(datetime.datetime.now().timestamp() * 1000),
+    )
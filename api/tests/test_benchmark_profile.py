@@ -0,0 +1,35 @@
+import asyncio
+import random
+
+from fastapi_pagination import Params
+
+from tests.fakes import FakeKafkaProducer
+from benchmarks.run import DEEP_PAGE_SIZE, Fixtures, seed_orders
+from src.order.services import OrderService
+
+
+def test_deep_cursor_points_at_the_deep_offset_page(mongo):
+    fixtures = Fixtures(random.Random(7), deep_page=3)
+    service = OrderService(None, mongo, FakeKafkaProducer())
+
+    async def scenario():
+        await seed_orders(mongo, fixtures, users=2, orders_per_user=5, heavy_users=2, heavy_user_orders=70)
+        user_id, cursor = fixtures.heavy_users[1]
+        by_offset = await service.get_orders_by_user(user_id, Params(page=3, size=DEEP_PAGE_SIZE))
+        by_cursor = await service.get_orders_by_user_cursor(user_id, DEEP_PAGE_SIZE, cursor)
+        return by_offset["items"], by_cursor["items"]
+
+    by_offset, by_cursor = asyncio.run(scenario())
+    assert len(by_offset) == DEEP_PAGE_SIZE
+    assert by_cursor == by_offset
+    assert len(fixtures.heavy_users) == 2
+
+
+def test_heavy_user_and_cursor_are_filled_together():
+    fixtures = Fixtures(random.Random(7))
+    fixtures.heavy_users = [("user-a", "cursor-a"), ("user-b", "cursor-b")]
+
+    for _ in range(20):
+        path = fixtures.fill("/orders/{heavy_user_id}/orders?cursor={deep_order_cursor}", {})
+        user, cursor = path.removeprefix("/orders/").split("/orders?cursor=")
+        assert cursor == f"cursor-{user[-1]}"
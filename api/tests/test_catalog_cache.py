@@ -0,0 +1,106 @@
+import asyncio
+import importlib.util
+import pathlib
+from types import SimpleNamespace
+
+import pytest
+
+from src.config import database
+from src.config.settings import settings
+from src.product.cache import CatalogCache, CatalogInvalidationListener
+
+NOTIFY_MIGRATION = pathlib.Path(__file__).parents[1] / "alembic" / "versions" / "e7a3c9d15b20_catalog_notify_trigger.py"
+
+REPLICA = object()
+
+
+class CatalogSession:
+    """Session stand-in bound to `bind` that answers every catalog query with `rows`"""
+    def __init__(self, bind, rows):
+        self.bind = bind
+        self.rows = rows
+        self.queries = 0
+
+    async def execute(self, statement):
+        self.queries += 1
+        return SimpleNamespace(all=lambda: self.rows)
+
+
+def product_row(price: str):
+    return SimpleNamespace(id=1, sku="SKU-1", name="Laptop", price=price)
+
+
+@pytest.fixture
+def replica_configured(monkeypatch):
+    monkeypatch.setattr(database, "read_engine", REPLICA)
+
+
+def test_replica_reads_do_not_fill_the_cache(replica_configured):
+    cache = CatalogCache()
+    replica = CatalogSession(REPLICA, [product_row("10.00")])
+
+    async def scenario():
+        first = await cache.get_many(replica, ["SKU-1"])
+        second = await cache.get_many(replica, ["SKU-1"])
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    cache.put_rows(replica, [product_row("10.00")])
+
+    assert first["SKU-1"]["price"] == second["SKU-1"]["price"] == "10.00"
+    assert replica.queries == 2
+    assert cache.stats["replica_fills_skipped"] == 3
+
+
+def test_primary_reads_fill_the_cache_replica_reads_use_it(replica_configured):
+    cache = CatalogCache()
+    primary = CatalogSession(database.engine, [product_row("12.00")])
+    replica = CatalogSession(REPLICA, [product_row("10.00")])
+
+    async def scenario():
+        await cache.get_many(primary, ["SKU-1"])
+        return await cache.get_many(replica, ["SKU-1"])
+
+    assert asyncio.run(scenario())["SKU-1"]["price"] == "12.00"
+    assert replica.queries == 0
+
+
+class TriggerConnection:
+    """asyncpg connection stand-in exposing the product trigger's arguments"""
+    def __init__(self, tgargs):
+        self.tgargs = tgargs
+        self.executed = []
+
+    async def fetchval(self, query):
+        return self.tgargs
+
+    async def execute(self, statement):
+        self.executed.append(statement)
+
+
+def test_notify_migration_takes_the_channel_from_settings(monkeypatch):
+    monkeypatch.setattr(settings, "CATALOG_NOTIFY_CHANNEL", "catalog_events")
+    spec = importlib.util.spec_from_file_location("catalog_notify_migration", NOTIFY_MIGRATION)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    statements = []
+    monkeypatch.setattr(migration.op, "execute", statements.append, raising=False)
+
+    migration.upgrade()
+
+    function, trigger = statements
+    assert "pg_notify(TG_ARGV[0]" in function and "product_changed'" not in function
+    assert "CREATE OR REPLACE TRIGGER notify_product_changed" in trigger
+    assert trigger.endswith("notify_product_changed('catalog_events')")
+
+
+def test_listener_repoints_a_trigger_on_another_channel():
+    listener = CatalogInvalidationListener(CatalogCache(), channel="catalog_events")
+    stale, current = TriggerConnection(b"product_changed\x00"), TriggerConnection(b"catalog_events\x00")
+
+    asyncio.run(listener._check_trigger(stale))
+    asyncio.run(listener._check_trigger(current))
+
+    stale_ddl, = stale.executed
+    assert stale_ddl.endswith("notify_product_changed('catalog_events')")
+    assert current.executed == []
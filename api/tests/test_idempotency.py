@@ -0,0 +1,102 @@
+import asyncio
+import datetime
+
+import pytest
+
+from tests.fakes import FakeKafkaProducer
+from src.order.exceptions import OrderIdempotencyError
+from src.order.idempotency import IdempotencyStore
+from src.order.services import OrderService
+
+
+async def expire_lease(mongo, key: str):
+    past = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=1)
+    await mongo.idempotency_keys.update_one({"_id": key}, {"$set": {"lease_expires_at": past}})
+
+
+def test_claims_are_stamped_in_utc(mongo):
+    store = IdempotencyStore(mongo)
+
+    async def scenario():
+        await store.claim("key:u1:k1", "hash-1", 86400)
+        return await mongo.idempotency_keys.find_one({"_id": "key:u1:k1"})
+
+    doc = asyncio.run(scenario())
+    for field in ("created_at", "expires_at", "lease_expires_at"):
+        assert doc[field].utcoffset() == datetime.timedelta(0)
+    assert doc["lease_expires_at"] < doc["expires_at"]
+
+
+def test_in_progress_claim_blocks_until_its_lease_runs_out(mongo):
+    store = IdempotencyStore(mongo)
+
+    async def scenario():
+        await store.claim("key:u1:k1", "hash-1", 86400)
+        with pytest.raises(OrderIdempotencyError, match="already being processed"):
+            await store.claim("key:u1:k1", "hash-1", 86400)
+        await expire_lease(mongo, "key:u1:k1")
+        with pytest.raises(OrderIdempotencyError, match="different order payload"):
+            await store.claim("key:u1:k1", "hash-2", 86400)
+        return await store.claim("key:u1:k1", "hash-1", 86400)
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_completed_claim_replays_after_its_lease(mongo):
+    store = IdempotencyStore(mongo)
+
+    async def scenario():
+        await store.claim("key:u1:k1", "hash-1", 86400)
+        await store.complete("key:u1:k1", {"order_id": "ORD-1"})
+        await expire_lease(mongo, "key:u1:k1")
+        return await store.claim("key:u1:k1", "hash-1", 86400)
+
+    assert asyncio.run(scenario()) == {"order_id": "ORD-1"}
+
+
+class StubReservations:
+    async def reserve_items(self, items):
+        return [{**item, "price": 10.0, "name": item["sku"]} for item in items]
+
+
+def test_retry_after_a_failed_complete_replays_the_created_order(mongo, pg_sessionmaker):
+    service = OrderService(pg_sessionmaker(), mongo, FakeKafkaProducer())
+    service.reservations = StubReservations()
+    customer, items = {"user_id": "u1", "email": "u1@example.com"}, [{"sku": "SKU-1", "quantity": 1}]
+
+    async def complete_fails(key, response):
+        raise ConnectionError("mongo went away")
+
+    async def scenario():
+        complete = service.idempotency.complete
+        service.idempotency.complete = complete_fails
+        with pytest.raises(ConnectionError):
+            await service.create_order(customer, items, idempotency_key="k1")
+        service.idempotency.complete = complete
+
+        await expire_lease(mongo, "key:u1:k1")
+        replayed = await service.create_order(customer, items, idempotency_key="k1")
+        return replayed, await mongo.orders.find({}).to_list(length=None)
+
+    replayed, orders = asyncio.run(scenario())
+    assert len(orders) == 1
+    assert replayed["order_id"] == orders[0]["order_id"]
+    assert replayed["message"].startswith("Duplicate order detected")
+    assert orders[0]["created_at"].utcoffset() == datetime.timedelta(0)
+
+
+def test_reused_key_does_not_replay_an_order_from_its_previous_use(mongo):
+    store = IdempotencyStore(mongo)
+
+    async def scenario():
+        two_days_ago = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=2)
+        await mongo.orders.insert_one({
+            "order_id": "ORD-OLD",
+            "created_at": two_days_ago,
+            "idempotency": {"key": "key:u1:k1", "response": {"order_id": "ORD-OLD"}},
+        })
+        await store.claim("key:u1:k1", "hash-1", 86400)
+        await expire_lease(mongo, "key:u1:k1")
+        return await store.claim("key:u1:k1", "hash-1", 86400)
+
+    assert asyncio.run(scenario()) is None
@@ -0,0 +1,180 @@
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from tests.fakes import FakeKafkaProducer
+from src.inventory.exceptions import InventoryInsufficientStock, InventoryNotFound
+from src.inventory.services import InventoryReservationService
+from src.inventory.sharding import ShardDirectory
+from src.order.exceptions import OrderInventoryError
+from src.order.services import OrderService
+
+PRODUCTS = {
+    sku: {"id": uuid.UUID(int=n), "sku": sku, "name": sku, "price": "1.00"}
+    for n, sku in enumerate(["SKU-A", "SKU-B", "SKU-C"], start=1)
+}
+
+
+class StaticCatalog:
+    async def get_many(self, db, skus):
+        return {sku: PRODUCTS[sku] for sku in skus if sku in PRODUCTS}
+
+
+class RecordingSession:
+    """Session stand-in that records the statements and savepoints of a transaction"""
+    def __init__(self):
+        self.log = []
+
+    @asynccontextmanager
+    async def begin_nested(self):
+        self.log.append("savepoint")
+        yield
+
+    async def execute(self, statement):
+        self.log.append(str(statement.compile(dialect=postgresql.dialect())))
+
+
+class InventorySession:
+    """
+    Session stand-in holding inventory rows (product id -> [available, reserved]) that
+    runs the reservation statements the way Postgres would: the conditional UPDATE
+    only touches rows whose condition holds and returns those, and nothing is kept
+    unless the transaction commits.
+    """
+    def __init__(self, stock: dict[str, int]):
+        self.committed = {PRODUCTS[sku]["id"]: [quantity, 0] for sku, quantity in stock.items()}
+        self.rows = {product_id: list(row) for product_id, row in self.committed.items()}
+        self.statements = []
+
+    def stock(self, sku: str) -> tuple[int, int]:
+        return tuple(self.committed[PRODUCTS[sku]["id"]])
+
+    async def execute(self, statement):
+        compiled = statement.compile(dialect=postgresql.dialect())
+        sql, params = str(compiled), compiled.params
+        self.statements.append(sql)
+        if sql.lstrip().startswith("WITH locked") and "UPDATE inventory SET" in sql:
+            values = [params[name] for name in sorted(params, key=lambda name: int(name.split("_")[1]))]
+            requested = dict(zip(values[::2], values[1::2]))
+            reserve = "inventory.available_quantity >= locked.quantity" in sql
+            return self._update(requested, reserve)
+        if sql.startswith("SELECT inventory_totals.product_id, inventory_totals.available_quantity"):
+            product_ids, = params.values()
+            return SimpleNamespace(all=lambda: [
+                SimpleNamespace(product_id=product_id, available_quantity=self.rows[product_id][0])
+                for product_id in product_ids if product_id in self.rows
+            ])
+        raise AssertionError(f"Unexpected statement: {sql}")
+
+    def _update(self, requested: dict, reserve: bool):
+        updated = []
+        for product_id, quantity in requested.items():
+            row = self.rows.get(product_id)
+            if row is None or row[0 if reserve else 1] < quantity:
+                continue
+            sign = 1 if reserve else -1
+            row[0] -= sign * quantity
+            row[1] += sign * quantity
+            updated.append(SimpleNamespace(product_id=product_id, quantity=quantity))
+        return SimpleNamespace(
+            scalars=lambda: SimpleNamespace(all=lambda: [row.product_id for row in updated]),
+            all=lambda: updated,
+        )
+
+    async def commit(self):
+        self.committed = {product_id: list(row) for product_id, row in self.rows.items()}
+
+    async def rollback(self):
+        self.rows = {product_id: list(row) for product_id, row in self.committed.items()}
+
+
+def reservations(db) -> InventoryReservationService:
+    return InventoryReservationService(db, catalog=StaticCatalog(), shards=ShardDirectory())
+
+
+def test_every_line_is_reserved_with_one_statement():
+    db = InventorySession({"SKU-A": 5, "SKU-B": 5, "SKU-C": 5})
+
+    async def scenario():
+        lines = await reservations(db).reserve_items([
+            {"sku": "SKU-A", "quantity": 2}, {"sku": "SKU-B", "quantity": 3}, {"sku": "SKU-A", "quantity": 1},
+        ])
+        await db.commit()
+        return lines
+
+    lines = asyncio.run(scenario())
+    assert [(line["sku"], line["quantity"]) for line in lines] == [("SKU-A", 3), ("SKU-B", 3)]
+    assert len(db.statements) == 1
+    assert db.stock("SKU-A") == (2, 3) and db.stock("SKU-B") == (2, 3) and db.stock("SKU-C") == (5, 0)
+
+
+def test_short_sku_rolls_back_the_lines_already_updated(mongo):
+    db = InventorySession({"SKU-A": 5, "SKU-B": 1})
+    service = OrderService(db, mongo, FakeKafkaProducer())
+    service.reservations = reservations(db)
+
+    with pytest.raises(OrderInventoryError, match="Insufficient inventory for SKU-B. Requested: 2, Available: 1"):
+        asyncio.run(service.create_order(
+            {"user_id": "u1", "email": None}, [{"sku": "SKU-A", "quantity": 2}, {"sku": "SKU-B", "quantity": 2}],
+        ))
+
+    # The UPDATE reserved SKU-A, which the rollback undid: all or nothing
+    assert db.stock("SKU-A") == (5, 0) and db.stock("SKU-B") == (1, 0)
+
+
+def test_missing_inventory_row_fails_the_whole_order():
+    db = InventorySession({"SKU-A": 5})
+
+    with pytest.raises(InventoryNotFound, match="SKU-C"):
+        asyncio.run(reservations(db).reserve_items([{"sku": "SKU-A", "quantity": 1}, {"sku": "SKU-C", "quantity": 1}]))
+
+
+def test_release_restores_the_reserved_quantities():
+    db = InventorySession({"SKU-A": 5, "SKU-B": 5})
+    items = [{"sku": "SKU-A", "quantity": 2}, {"sku": "SKU-B", "quantity": 4}]
+
+    async def scenario():
+        service = reservations(db)
+        await service.reserve_items(items)
+        await db.commit()
+        released = await service.release_items(items)
+        await db.commit()
+        # Never more than what is reserved
+        over_released = await service.release_items([{"sku": "SKU-A", "quantity": 1}])
+        return released, over_released
+
+    assert asyncio.run(scenario()) == (6, 0)
+    assert db.stock("SKU-A") == (5, 0) and db.stock("SKU-B") == (5, 0)
+    assert len(db.statements) == 3
+
+
+def test_batch_fallback_locks_every_row_in_id_order_first():
+    db = RecordingSession()
+    service = InventoryReservationService(db, catalog=StaticCatalog(), shards=ShardDirectory())
+    stock = {"SKU-A": 1, "SKU-B": 5, "SKU-C": 5}
+
+    async def reserve_quantities(quantities, products):
+        db.log.append(sorted(quantities))
+        if any(quantity > stock[sku] for sku, quantity in quantities.items()):
+            raise InventoryInsufficientStock("short")
+        for sku, quantity in quantities.items():
+            stock[sku] -= quantity
+
+    service._reserve_quantities = reserve_quantities
+    orders = [
+        [{"sku": "SKU-C", "quantity": 1}, {"sku": "SKU-A", "quantity": 1}],
+        [{"sku": "SKU-B", "quantity": 1}, {"sku": "SKU-A", "quantity": 1}],
+    ]
+
+    results = asyncio.run(service.reserve_batch(orders))
+
+    assert isinstance(results[1], InventoryInsufficientStock)
+    assert [line["sku"] for line in results[0]] == ["SKU-C", "SKU-A"]
+    assert db.log[:2] == ["savepoint", ["SKU-A", "SKU-B", "SKU-C"]]
+    lock = db.log[2]
+    assert "FROM inventory" in lock and "ORDER BY inventory.id" in lock and lock.endswith("FOR UPDATE")
+    assert db.log[3:] == ["savepoint", ["SKU-A", "SKU-C"], "savepoint", ["SKU-A", "SKU-B"]]
@@ -0,0 +1,40 @@
+import importlib.util
+import pathlib
+import re
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from src.inventory.sharding import inventory_totals
+
+MIGRATION = pathlib.Path(__file__).parents[1] / "alembic" / "versions" / "5b2e8d41c7a3_inventory_shards.py"
+
+
+def compile_totals(sharding_enabled: bool) -> str:
+    totals = inventory_totals(sharding_enabled)
+    return str(select(totals.c.available_quantity).compile(dialect=postgresql.dialect()))
+
+
+def test_totals_skip_shards_when_sharding_is_disabled():
+    assert "inventory_shard" not in compile_totals(False)
+
+
+def test_totals_join_shards_only_for_sharded_products():
+    sql = compile_totals(True)
+    assert "inventory_shard" in sql
+    assert "inventory.shard_count > " in sql
+
+
+def test_shard_migration_is_idempotent(monkeypatch):
+    spec = importlib.util.spec_from_file_location("inventory_shards_migration", MIGRATION)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    statements = []
+    monkeypatch.setattr(migration.op, "execute", statements.append, raising=False)
+
+    migration.upgrade()
+
+    assert len(statements) == 4
+    for statement in statements:
+        ddl = " ".join(statement.split())
+        assert re.match(r"(ALTER TABLE \w+ ADD COLUMN IF NOT EXISTS|CREATE (TABLE IF NOT EXISTS|OR REPLACE))", ddl), ddl
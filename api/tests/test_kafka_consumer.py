@@ -0,0 +1,270 @@
+import asyncio
+
+import pytest
+from aiokafka import TopicPartition
+
+from tests.fakes import consumer_record
+from src.config.settings import settings
+from src.order.constants import KAFKA_TOPIC
+from src.order.event.consumer import KafkaWorker, _CommitOnRevoke
+from src.order.exceptions import OrderIdempotencyError, OrderInventoryError
+from src.order.proto import order_events_pb2
+
+TP = TopicPartition(KAFKA_TOPIC, 0)
+
+
+class FakeConsumer:
+    """AIOKafkaConsumer stand-in: hands out the queued `getmany` results, then idles"""
+    def __init__(self, polls: list[dict]):
+        self.polls = list(polls)
+        self.poll_count = 0
+        self.commits: list[dict] = []
+        self.paused: set = set()
+        self.seeks: list[tuple] = []
+
+    async def getmany(self, timeout_ms: int = 0, max_records: int = None) -> dict:
+        self.poll_count += 1
+        if self.polls:
+            return self.polls.pop(0)
+        await asyncio.sleep(timeout_ms / 1000)
+        return {}
+
+    async def commit(self, offsets: dict):
+        self.commits.append(dict(offsets))
+
+    def pause(self, *partitions):
+        self.paused.update(partitions)
+
+    def resume(self, *partitions):
+        self.paused.difference_update(partitions)
+
+    def seek(self, partition, offset: int):
+        self.seeks.append((partition, offset))
+
+    async def stop(self):
+        pass
+
+
+class DeadLetterProducer:
+    """The part of KafkaProducer the worker uses: records dead letters, or fails to"""
+    _bootstrap_servers = "test:9092"
+
+    def __init__(self):
+        self.dead_letters: list[tuple] = []
+        self.available = True
+
+    async def publish_dead_letter(self, key: str, value: bytes, headers: list):
+        if not self.available:
+            raise ConnectionError("dead-letter topic unavailable")
+        self.dead_letters.append((key, value, dict(headers)))
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(settings, "KAFKA_CONSUMER_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(settings, "KAFKA_CONSUMER_RETRY_BACKOFF_SECONDS", 0)
+    monkeypatch.setattr(settings, "KAFKA_CONSUMER_STALL_SECONDS", 0.05)
+
+
+def order_created(order_id: str) -> bytes:
+    event = order_events_pb2.OrderEvent(event_id=f"evt-{order_id}", order_id=order_id)
+    event.event_type = order_events_pb2.ORDER_CREATED
+    return event.SerializeToString()
+
+
+def records(partition: int, count: int, start: int = 0) -> list:
+    return [
+        consumer_record(KAFKA_TOPIC, partition, offset, f"ORD-{offset}".encode(), order_created(f"ORD-{partition}-{offset}"))
+        for offset in range(start, start + count)
+    ]
+
+
+async def make_worker(mongo, polls: list[dict] = (), producer: DeadLetterProducer = None) -> KafkaWorker:
+    worker = KafkaWorker(mongo, None, producer or DeadLetterProducer())
+    await worker.consumer.stop()  # never started; closes the client it created
+    worker.consumer = FakeConsumer(polls)
+    return worker
+
+
+def test_revoking_a_partition_mid_batch_waits_for_the_batch(mongo):
+    async def scenario():
+        worker = await make_worker(mongo, [{TP: records(0, 3)}])
+        started, release = asyncio.Event(), asyncio.Event()
+
+        async def process_event(event):
+            started.set()
+            await release.wait()
+        worker.process_event = process_event
+
+        consuming = asyncio.create_task(worker._consume_batches())
+        await asyncio.wait_for(started.wait(), 1)
+
+        revoke = asyncio.create_task(_CommitOnRevoke(worker).on_partitions_revoked([TP]))
+        await asyncio.sleep(0.05)
+        assert not revoke.done(), "revoke must wait for the batch in flight"
+
+        release.set()
+        await asyncio.wait_for(revoke, 1)
+        assert worker.consumer.commits == [{TP: 3}]
+        assert TP not in worker._offsets
+
+        # The consume loop survived the rebalance and keeps polling
+        polls = worker.consumer.poll_count
+        await asyncio.sleep(0.5)
+        assert not consuming.done()
+        assert worker.consumer.poll_count > polls
+        assert worker.stats["processed"] == 3
+
+        consuming.cancel()
+        await asyncio.gather(consuming, return_exceptions=True)
+
+    asyncio.run(scenario())
+
+
+def failing(times: int, error: Exception = None, only: str = None):
+    """process_event stand-in whose first `times` calls per event (or for event `only`) raise"""
+    calls = []
+
+    async def process_event(event):
+        calls.append(event.event_id)
+        if (only is None or event.event_id == only) and calls.count(event.event_id) <= times:
+            raise error or ConnectionError("postgres went away")
+    process_event.calls = calls
+    return process_event
+
+
+async def consume(worker: KafkaWorker, messages: list):
+    for msg in messages:
+        await worker._dispatch(msg)
+    await worker._drain()
+    await worker._commit()
+
+
+def test_failed_event_is_retried_before_its_offset_is_committed(mongo):
+    async def scenario():
+        worker = await make_worker(mongo)
+        worker.process_event = failing(2)
+
+        await consume(worker, records(0, 1))
+
+        assert worker.process_event.calls == ["evt-ORD-0-0"] * 3
+        assert worker.stats["retries"] == 2 and worker.stats["processed"] == 1
+        assert worker.consumer.commits == [{TP: 1}]
+        assert await mongo.processed_events.find_one({"event_id": "evt-ORD-0-0"})
+
+    asyncio.run(scenario())
+
+
+def test_event_that_keeps_failing_is_dead_lettered(mongo):
+    async def scenario():
+        producer = DeadLetterProducer()
+        worker = await make_worker(mongo, producer=producer)
+        worker.process_event = failing(99)
+
+        await consume(worker, records(0, 1))
+
+        (key, value, headers), = producer.dead_letters
+        assert key == "ORD-0-0"
+        assert order_events_pb2.OrderEvent.FromString(value).event_id == "evt-ORD-0-0"
+        assert headers["attempts"] == b"3" and headers["source"] == b"0:0"
+        assert worker.stats["dead_lettered"] == 1 and worker.stats["failed"] == 1
+        # Parked elsewhere, so the offset may move on; not marked processed, so it can be replayed
+        assert worker.consumer.commits == [{TP: 1}]
+        assert await mongo.processed_events.find_one({"event_id": "evt-ORD-0-0"}) is None
+
+    asyncio.run(scenario())
+
+
+def test_business_errors_are_dead_lettered_without_retries(mongo):
+    async def scenario():
+        producer = DeadLetterProducer()
+        worker = await make_worker(mongo, producer=producer)
+        worker.process_event = failing(99, OrderInventoryError("Insufficient stock"))
+
+        await consume(worker, records(0, 1))
+
+        assert len(worker.process_event.calls) == 1
+        assert worker.stats["retries"] == 0
+        assert producer.dead_letters[0][2]["attempts"] == b"1"
+
+    asyncio.run(scenario())
+
+
+def test_key_still_in_progress_is_retried_and_replayed_not_dead_lettered(mongo):
+    async def scenario():
+        producer = DeadLetterProducer()
+        worker = await make_worker(mongo, producer=producer)
+        worker.process_event = failing(3, OrderIdempotencyError("Order is already being processed"))
+
+        await consume(worker, records(0, 1))
+
+        # Retried, then left pending: nothing dead-lettered or committed
+        assert len(worker.process_event.calls) == 3
+        assert worker.stats["retries"] == 2
+        assert producer.dead_letters == []
+        assert worker.consumer.commits == []
+        assert TP in worker.consumer.paused
+
+        await asyncio.sleep(0.2)
+        assert worker.consumer.seeks == [(TP, 0)]
+
+        # Once the other attempt is done, the redelivered event goes through
+        await consume(worker, records(0, 1))
+        assert worker.consumer.commits == [{TP: 1}]
+        assert worker.stats["processed"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_partition_stalls_when_dead_lettering_fails_and_is_rewound(mongo):
+    async def scenario():
+        producer = DeadLetterProducer()
+        producer.available = False
+        worker = await make_worker(mongo, producer=producer)
+        worker.process_event = failing(3, only="evt-ORD-0-0")  # every attempt of offset 0 fails
+
+        await consume(worker, records(0, 2))
+
+        # Offset 1 succeeded, but nothing is committed past the failed offset 0
+        assert worker.consumer.commits == []
+        assert TP in worker.consumer.paused
+        assert worker.stats["stalls"] == 1
+
+        await asyncio.sleep(0.2)
+        assert worker.consumer.seeks == [(TP, 0)]
+        assert TP not in worker.consumer.paused
+        assert worker.stats["rewinds"] == 1
+
+        # Redelivered from offset 0: it succeeds now, offset 1 is skipped as processed
+        await consume(worker, records(0, 2))
+        assert worker.consumer.commits == [{TP: 2}]
+        assert worker.process_event.calls.count("evt-ORD-0-1") == 1
+        assert worker.stats["duplicates"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_failed_batch_leaves_its_offsets_uncommitted(mongo):
+    async def scenario():
+        producer = DeadLetterProducer()
+        producer.available = False
+        other = TopicPartition(KAFKA_TOPIC, 1)
+        worker = await make_worker(mongo, [{TP: records(0, 2), other: records(1, 1)}], producer)
+        worker.process_event = failing(3, only="evt-ORD-0-0")
+
+        consuming = asyncio.create_task(worker._consume_batches())
+        await asyncio.sleep(0.02)
+
+        assert worker.consumer.commits == []
+        assert worker.consumer.paused == {TP, other}
+        # What did succeed is recorded, so the replay skips it
+        assert await mongo.processed_events.count_documents({}) == 2
+
+        await asyncio.sleep(0.2)
+        assert sorted(worker.consumer.seeks) == [(TP, 0), (other, 0)]
+        assert not worker.consumer.paused
+
+        consuming.cancel()
+        await asyncio.gather(consuming, return_exceptions=True)
+
+    asyncio.run(scenario())
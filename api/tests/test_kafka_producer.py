@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+from tests.fakes import FakeKafkaProducer
+from src.order.constants import KAFKA_DEAD_LETTER_TOPIC
+from src.order.event.producer import KafkaProducer
+
+
+class FailingKafkaProducer(FakeKafkaProducer):
+    """Broker connection that rejects every send, like one dropped mid-flight"""
+    async def send_and_wait(self, topic: str, value: bytes = None, key: bytes = None, **kwargs):
+        raise ConnectionError("broker connection lost")
+
+
+class RebuildingProducer(KafkaProducer):
+    """KafkaProducer building its connections from `connections`, one per (re)start"""
+    def __init__(self, connections: list):
+        super().__init__()
+        self.connections = list(connections)
+
+    def _build_producer(self):
+        return self.connections.pop(0)
+
+
+def test_dead_letter_after_a_failed_send_goes_through_the_rebuilt_producer():
+    lost, rebuilt = FailingKafkaProducer(), FakeKafkaProducer(ack_latency_seconds=0)
+    producer = RebuildingProducer([lost, rebuilt])
+
+    async def scenario():
+        with pytest.raises(ConnectionError):
+            await producer.publish_dead_letter("ORD-1", b"event", [])
+        assert not await producer.is_healthy()
+        await producer.publish_dead_letter("ORD-1", b"event", [])
+        await producer.stop()
+
+    asyncio.run(scenario())
+
+    assert rebuilt.sent == [(KAFKA_DEAD_LETTER_TOPIC, b"ORD-1", b"event")]
+
+
+def test_dead_letter_without_a_producer_is_rejected_not_dereferenced():
+    producer = KafkaProducer()
+
+    async def start():
+        pass  # e.g. stop() ran while this publisher waited on the start lock
+
+    producer.start = start
+
+    with pytest.raises(ValueError) as error:
+        asyncio.run(producer.publish_dead_letter("ORD-1", b"event", []))
+
+    assert error.value.args[0]["message"] == "Kafka producer is not available"
@@ -0,0 +1,65 @@
+import asyncio
+import datetime
+
+import httpx
+import pytest
+
+from src.main import app
+from src.metrics.collectors import DB_POOL_CHECKOUTS
+from src.order.dependencies import get_kafka_producer, get_mongo_db
+
+
+def checkouts(route: str) -> float:
+    for family in DB_POOL_CHECKOUTS.collect():
+        for sample in family.samples:
+            if sample.name == "db_pool_checkouts_total" and sample.labels == {"method": "GET", "route": route}:
+                return sample.value
+    return 0.0
+
+
+@pytest.fixture
+def mongo_app(mongo):
+    """The app with the fake Mongo and no producer; Postgres keeps its real (unreachable) pool"""
+    app.dependency_overrides[get_mongo_db] = lambda: mongo
+    app.dependency_overrides[get_kafka_producer] = lambda: None
+    yield app
+    app.dependency_overrides.clear()
+
+
+def get(path: str) -> int:
+    async def request():
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return (await client.get(path)).status_code
+
+    return asyncio.run(request())
+
+
+@pytest.mark.parametrize("path, route", [
+    ("/api/v1/orders/ORD-1", "/api/v1/orders/{order_id}"),
+    ("/api/v1/orders/user-1/orders", "/api/v1/orders/{user_id}/orders"),
+])
+def test_mongo_only_routes_check_out_no_connection(mongo_app, mongo, path, route):
+    asyncio.run(mongo.orders.insert_one({
+        "order_id": "ORD-1",
+        "status": "confirmed",
+        "customer": {"user_id": "user-1", "email": "user1@example.com"},
+        "items": [{"sku": "SKU-1", "quantity": 1, "price": 10.0, "name": "Laptop"}],
+        "pricing": {"subtotal": 10.0, "tax": 0.8, "total": 10.8},
+        "payment": {"status": "completed", "transaction_id": "TX-1", "method": "mock_gateway"},
+        "created_at": datetime.datetime(2026, 1, 1),
+        "updated_at": datetime.datetime(2026, 1, 1),
+    }))
+    before = checkouts(route)
+
+    assert get(path) == 200
+    assert checkouts(route) == before
+
+
+def test_postgres_routes_are_counted(mongo_app):
+    route = "/api/v1/products/{sku}/inventory"
+    before = checkouts(route)
+
+    get("/api/v1/products/SKU-1/inventory")
+
+    assert checkouts(route) == before + 1
@@ -0,0 +1,78 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from src.metrics.collectors import DB_POOL_CHECKOUTS, HTTP_REQUEST_DURATION, REQUEST_POOL_CHECKOUTS
+from src.metrics.middleware import RequestMetricsMiddleware
+
+REQUESTS = 20_000
+# Added cost of the middleware per request, on top of calling the app directly. About
+# 2us on a laptop-class CPU and up to 3.5us on a throttled shared one: wrapping `send`,
+# setting and resetting the checkout ContextVar and one observe() already take about
+# 1us of that, so it stays above 1us.
+OVERHEAD_BUDGET_US = 4.0
+
+ROUTE = SimpleNamespace(path="/bench/{item_id}")
+START = {"type": "http.response.start", "status": 200, "headers": []}
+BODY = {"type": "http.response.body", "body": b"", "more_body": False}
+
+
+async def endpoint(scope, receive, send):
+    scope["route"] = ROUTE
+    counters = REQUEST_POOL_CHECKOUTS.get()
+    if counters is not None and scope["path"].endswith("/db"):
+        counters.checkouts += 1
+    await send(START)
+    await send(BODY)
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+def per_request_us(app, path: str = "/bench/1") -> float:
+    async def loop():
+        started = time.perf_counter()
+        for _ in range(REQUESTS):
+            await app({"type": "http", "method": "GET", "path": path}, receive, send)
+        return time.perf_counter() - started
+
+    # Best of a few rounds, so a noisy neighbour does not fail the test
+    return min(asyncio.run(loop()) for _ in range(5)) / REQUESTS * 1e6
+
+
+def sample_value(metric, name: str, labels: dict) -> float:
+    for family in metric.collect():
+        for sample in family.samples:
+            if sample.name == name and sample.labels == labels:
+                return sample.value
+    return 0.0
+
+
+def test_middleware_overhead_is_within_budget():
+    middleware = RequestMetricsMiddleware(endpoint)
+    overhead = per_request_us(middleware) - per_request_us(endpoint)
+    assert overhead < OVERHEAD_BUDGET_US, f"{overhead:.2f} us per request"
+    assert len(middleware._children) == 1
+
+
+def test_cached_children_keep_recording():
+    middleware = RequestMetricsMiddleware(endpoint)
+    labels = {"method": "GET", "route": ROUTE.path}
+
+    async def requests():
+        for path in ("/bench/1", "/bench/db", "/bench/db"):
+            await middleware({"type": "http", "method": "GET", "path": path}, receive, send)
+
+    before_count = sample_value(HTTP_REQUEST_DURATION, "http_request_duration_seconds_count", {**labels, "status": "200"})
+    before_checkouts = sample_value(DB_POOL_CHECKOUTS, "db_pool_checkouts_total", labels)
+    asyncio.run(requests())
+
+    assert sample_value(
+        HTTP_REQUEST_DURATION, "http_request_duration_seconds_count", {**labels, "status": "200"}
+    ) == before_count + 3
+    assert sample_value(DB_POOL_CHECKOUTS, "db_pool_checkouts_total", labels) == before_checkouts + 2
@@ -0,0 +1,15 @@
+from prometheus_client.core import CounterMetricFamily
+
+from src.metrics.collectors import StatsCollector
+from src.order.event.producer import KafkaProducer
+
+
+def test_producer_counters_are_exported_as_counters():
+    producer = KafkaProducer()
+    collector = StatsCollector()
+    collector.register("kafka_producer", lambda: producer.stats, KafkaProducer.COUNTERS)
+
+    counters = {family.name for family in collector.collect() if isinstance(family, CounterMetricFamily)}
+
+    assert "kafka_producer_envelopes" in counters
+    assert counters == {f"kafka_producer_{name}" for name in producer._counters}
@@ -0,0 +1,125 @@
+import asyncio
+import datetime
+import tracemalloc
+from types import SimpleNamespace
+
+import pytest
+
+from src.config.database import get_db
+from src.main import app
+from src.order.dependencies import get_kafka_producer, get_mongo_db
+from src.utils.streaming import gzip_chunks, iter_ndjson
+
+ORDERS = 20_000
+# Peak traced memory allowed while streaming; the export is ~10 MB of NDJSON
+MEMORY_CEILING_BYTES = 3 * 1024 * 1024
+
+
+class GeneratedOrders:
+    """`orders` collection whose find() cursor builds each document on demand"""
+    def __init__(self, count: int):
+        self.count = count
+
+    def find(self, query=None, projection=None, **kwargs):
+        return self
+
+    def sort(self, *args, **kwargs):
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        created_at = datetime.datetime(2026, 1, 1)
+        for n in range(self.count):
+            yield {
+                "order_id": f"ORD-{n:08d}",
+                "status": "confirmed",
+                "customer": {"user_id": f"user-{n % 977:05d}", "email": f"user{n % 977}@example.com"},
+                "items": [
+                    {"sku": f"SKU-{(n + line) % 1000:06d}", "quantity": 1 + line, "price": 19.99, "name": "Bench item"}
+                    for line in range(3)
+                ],
+                "pricing": {"subtotal": 119.94, "tax": 9.6, "total": 129.54},
+                "payment": {"status": "completed", "transaction_id": f"TX{n:010d}", "method": "mock_gateway"},
+                "created_at": created_at + datetime.timedelta(seconds=n),
+            }
+
+
+def traced_peak(consume) -> tuple[int, int]:
+    """Run the coroutine factory `consume` (returning bytes streamed) under tracemalloc"""
+    tracemalloc.start()
+    try:
+        streamed = asyncio.run(consume())
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return streamed, peak
+
+
+@pytest.mark.parametrize("gzip", [False, True])
+def test_ndjson_stream_memory_is_bounded(gzip):
+    async def consume():
+        streamed = 0
+
+        async def counted(chunks):
+            nonlocal streamed
+            async for chunk in chunks:
+                streamed += len(chunk)
+                yield chunk
+
+        chunks = counted(iter_ndjson(GeneratedOrders(ORDERS), flush_every=1000))
+        if gzip:
+            chunks = gzip_chunks(chunks)
+        async for _ in chunks:
+            pass
+        return streamed
+
+    streamed, peak = traced_peak(consume)
+    assert streamed > 3 * MEMORY_CEILING_BYTES
+    assert peak < MEMORY_CEILING_BYTES, peak
+
+
+@pytest.fixture
+def export_mongo():
+    mongo = SimpleNamespace(orders=GeneratedOrders(ORDERS), idempotency_keys=None)
+    app.dependency_overrides[get_mongo_db] = lambda: mongo
+    app.dependency_overrides[get_kafka_producer] = lambda: None
+    app.dependency_overrides[get_db] = lambda: None
+    yield mongo
+    app.dependency_overrides.clear()
+
+
+def test_export_route_streams_with_bounded_memory(export_mongo):
+    async def consume():
+        streamed = 0
+        statuses = []
+        messages = iter([{"type": "http.request", "body": b"", "more_body": False}])
+
+        async def receive():
+            return next(messages, {"type": "http.disconnect"})
+
+        async def send(message):
+            nonlocal streamed
+            if message["type"] == "http.response.start":
+                statuses.append(message["status"])
+            elif message["type"] == "http.response.body":
+                streamed += len(message.get("body", b""))
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": "/api/v1/orders/export", "raw_path": b"/api/v1/orders/export",
+            "query_string": b"", "headers": [(b"host", b"test")], "client": ("test", 1), "server": ("test", 80),
+            "root_path": "",
+        }
+        await app(scope, receive, send)
+        assert statuses == [200]
+        return streamed
+
+    # The first request pays for one-off lazy imports; measure a warm route
+    export_mongo.orders.count = 10
+    asyncio.run(consume())
+    export_mongo.orders.count = ORDERS
+    streamed, peak = traced_peak(consume)
+    assert streamed > 3 * MEMORY_CEILING_BYTES
+    assert peak < MEMORY_CEILING_BYTES, peak
@@ -0,0 +1,44 @@
+import asyncio
+import os
+import pathlib
+import uuid
+
+import pytest
+
+from benchmarks.order_history import explain_pipeline, seed
+from src.order.indexes import ORDERS_INDEXES, SUPERSEDED_ORDERS_INDEXES, ensure_indexes
+from src.order.services import OrderService
+
+MONGO_INIT_SCRIPT = pathlib.Path(__file__).parents[2] / "init-scripts" / "mongodb" / "01-init.js"
+
+
+def test_history_prefix_index_is_superseded():
+    history = next(model.document for model in ORDERS_INDEXES if model.document["name"] == "user_order_history")
+    assert list(history["key"].items())[:2] == [("customer.user_id", 1), ("created_at", -1)]
+    assert "customer.user_id_1_created_at_-1" in SUPERSEDED_ORDERS_INDEXES
+    assert "{ 'customer.user_id': 1, 'created_at': -1 }" not in MONGO_INIT_SCRIPT.read_text(encoding="utf-8")
+
+
+@pytest.mark.skipif(not os.environ.get("TEST_MONGO_URI"), reason="needs a MongoDB server (TEST_MONGO_URI)")
+def test_history_queries_are_covered_by_the_index():
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    async def scenario():
+        client = AsyncIOMotorClient(os.environ["TEST_MONGO_URI"])
+        name = f"test_order_history_{uuid.uuid4().hex[:8]}"
+        mongo_db = client[name]
+        try:
+            user_ids = await seed(mongo_db, users=50, orders_per_user=40)
+            await ensure_indexes(mongo_db)
+            user_filter = {"customer.user_id": user_ids[7]}
+            return [
+                await explain_pipeline(mongo_db, "orders", OrderService._user_history_pipeline(user_filter, skip, 20))
+                for skip in (0, 20)
+            ]
+        finally:
+            await client.drop_database(name)
+            client.close()
+
+    for plan in asyncio.run(scenario()):
+        assert plan["keys_examined"] > 0
+        assert plan["docs_examined"] == 0
@@ -0,0 +1,103 @@
+import asyncio
+
+from tests.fakes import FakeKafkaProducer
+from src.order.services import OrderService
+
+ITEMS = [{"sku": "SKU-1", "quantity": 2, "price": 10.0, "name": "Laptop"}]
+
+
+class DecliningPayments:
+    def __init__(self):
+        self.charges = 0
+
+    async def charge(self, order_id, amount, transaction_id):
+        self.charges += 1
+        return False
+
+
+class FlakyReleases:
+    """InventoryReservationService stand-in whose first `failures` releases raise"""
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.released = 0
+
+    async def release_items(self, items):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("connection reset by peer")
+        units = sum(item["quantity"] for item in items)
+        self.released += units
+        return units
+
+    async def release_orders(self, orders):
+        return await self.release_items([item for order in orders for item in order["items"]])
+
+
+def order_service(mongo, session, releases, payments=None):
+    service = OrderService(session, mongo, FakeKafkaProducer(), payments)
+    service.reservations = releases
+    return service
+
+
+async def insert_order(mongo, status: str):
+    await mongo.orders.insert_one({
+        "order_id": "ORD-1",
+        "status": status,
+        "items": ITEMS,
+        "payment": {"status": "pending", "transaction_id": "TX-1"},
+    })
+
+
+async def order_status(mongo) -> str:
+    return (await mongo.orders.find_one({"order_id": "ORD-1"}))["status"]
+
+
+def test_declined_payment_retries_a_failed_release(mongo, pg_sessionmaker):
+    releases = FlakyReleases(failures=1)
+    payments = DecliningPayments()
+    service = order_service(mongo, pg_sessionmaker(), releases, payments)
+
+    async def scenario():
+        await insert_order(mongo, "pending")
+        try:
+            await service.process_payment_and_publish("ORD-1", ITEMS, 21.6, {"user_id": "u1"})
+        except ConnectionError:
+            pass
+        stuck = await order_status(mongo)
+        await service.process_payment_and_publish("ORD-1", ITEMS, 21.6, {"user_id": "u1"})
+        return stuck, await order_status(mongo)
+
+    assert asyncio.run(scenario()) == ("cancelling", "cancelled")
+    assert releases.released == 2
+    assert payments.charges == 1
+
+
+def test_fail_order_releases_only_orders_in_flight(mongo, pg_sessionmaker):
+    releases = FlakyReleases()
+    service = order_service(mongo, pg_sessionmaker(), releases)
+
+    async def scenario():
+        await insert_order(mongo, "expired")
+        await service.fail_order("ORD-1", ITEMS)
+        return await order_status(mongo)
+
+    assert asyncio.run(scenario()) == "expired"
+    assert releases.released == 0
+
+
+def test_fail_order_finishes_an_interrupted_release(mongo, pg_sessionmaker):
+    releases = FlakyReleases(failures=1)
+    service = order_service(mongo, pg_sessionmaker(), releases)
+
+    async def scenario():
+        await insert_order(mongo, "processing")
+        try:
+            await service.fail_order("ORD-1", ITEMS)
+        except ConnectionError:
+            pass
+        stuck = await order_status(mongo)
+        await service.fail_order("ORD-1", ITEMS)
+        return stuck, await order_status(mongo)
+
+    assert asyncio.run(scenario()) == ("failing", "error")
+    assert releases.released == 2
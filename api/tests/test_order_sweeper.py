@@ -0,0 +1,154 @@
+import asyncio
+import datetime
+
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from src.inventory.services import InventoryReservationService
+from src.order import sweeper as sweeper_module
+from src.order.sweeper import ReservationSweeper
+
+
+class LedgerSession:
+    """
+    AsyncSession stand-in that keeps the reservation_release rows: the ones inserted
+    by a transaction become visible to later sessions only once it commits.
+    """
+    committed: set = set()
+
+    def __init__(self):
+        self.inserted = set()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+    async def execute(self, statement):
+        order_ids = [
+            value for name, value in statement.compile(dialect=postgresql.dialect()).params.items()
+            if name.startswith("order_id")
+        ]
+        new = [order_id for order_id in order_ids if order_id not in self.committed | self.inserted]
+        self.inserted.update(new)
+        return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: new))
+
+    async def commit(self):
+        LedgerSession.committed |= self.inserted
+
+    async def rollback(self):
+        self.inserted = set()
+
+
+class FlakyReservations(InventoryReservationService):
+    """Real release_orders over stock releases whose first `failures` calls raise"""
+    failures = 0
+    released: list = []
+
+    async def release_items(self, items):
+        if FlakyReservations.failures:
+            FlakyReservations.failures -= 1
+            raise ConnectionError("connection reset by peer")
+        FlakyReservations.released.extend(items)
+        return sum(item["quantity"] for item in items)
+
+
+@pytest.fixture
+def reservations(monkeypatch):
+    monkeypatch.setattr(FlakyReservations, "failures", 0)
+    monkeypatch.setattr(FlakyReservations, "released", [])
+    monkeypatch.setattr(LedgerSession, "committed", set())
+    monkeypatch.setattr(sweeper_module, "InventoryReservationService", FlakyReservations)
+    return FlakyReservations
+
+
+async def insert_expired_order(mongo, order_id: str, quantity: int):
+    await mongo.orders.insert_one({
+        "order_id": order_id,
+        "status": "pending",
+        "items": [{"sku": "SKU-1", "quantity": quantity}],
+        "reservation_expires_at": datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(minutes=1),
+    })
+
+
+def test_sweep_releases_stock_then_marks_orders_expired(mongo, reservations):
+    async def scenario():
+        await insert_expired_order(mongo, "ORD-1", 2)
+        sweeper = ReservationSweeper(mongo, LedgerSession)
+
+        assert await sweeper.sweep_once() == 1
+        assert reservations.released == [{"sku": "SKU-1", "quantity": 2}]
+        assert (await mongo.orders.find_one({"order_id": "ORD-1"}))["status"] == "expired"
+        assert await sweeper.sweep_once() == 0
+
+    asyncio.run(scenario())
+
+
+def test_failed_release_is_retried_by_a_later_sweep(mongo, reservations):
+    async def scenario():
+        await insert_expired_order(mongo, "ORD-1", 3)
+        reservations.failures = 1
+        sweeper = ReservationSweeper(mongo, LedgerSession, claim_timeout_seconds=0)
+
+        with pytest.raises(ConnectionError):
+            await sweeper.sweep_once()
+        assert reservations.released == []
+        assert (await mongo.orders.find_one({"order_id": "ORD-1"}))["status"] == "expiring"
+
+        assert await sweeper.sweep_once() == 1
+        assert reservations.released == [{"sku": "SKU-1", "quantity": 3}]
+        assert (await mongo.orders.find_one({"order_id": "ORD-1"}))["status"] == "expired"
+        assert sweeper.stats["released_units"] == 3
+
+        # Released exactly once
+        assert await sweeper.sweep_once() == 0
+        assert reservations.released == [{"sku": "SKU-1", "quantity": 3}]
+
+    asyncio.run(scenario())
+
+
+def test_recent_claims_are_left_to_their_sweep(mongo, reservations):
+    async def scenario():
+        await insert_expired_order(mongo, "ORD-1", 1)
+        reservations.failures = 1
+        sweeper = ReservationSweeper(mongo, LedgerSession, claim_timeout_seconds=120)
+
+        with pytest.raises(ConnectionError):
+            await sweeper.sweep_once()
+        # Another process may still be releasing it; not claimed again before the timeout
+        assert await sweeper.sweep_once() == 0
+        assert reservations.released == []
+
+    asyncio.run(scenario())
+
+
+def test_release_committed_before_a_failed_status_update_is_not_repeated(mongo, reservations, monkeypatch):
+    async def scenario():
+        await insert_expired_order(mongo, "ORD-1", 4)
+        sweeper = ReservationSweeper(mongo, LedgerSession, claim_timeout_seconds=0)
+        update_many = mongo.orders.update_many
+        calls = []
+
+        async def fail_marking_expired(query, update):
+            calls.append(update)
+            if update["$set"]["status"] == "expired" and len(calls) == 2:
+                raise ConnectionError("mongo went away")
+            return await update_many(query, update)
+
+        monkeypatch.setattr(mongo.orders, "update_many", fail_marking_expired)
+
+        # Postgres committed the release, Mongo never heard of it
+        with pytest.raises(ConnectionError):
+            await sweeper.sweep_once()
+        assert reservations.released == [{"sku": "SKU-1", "quantity": 4}]
+        assert (await mongo.orders.find_one({"order_id": "ORD-1"}))["status"] == "expiring"
+
+        assert await sweeper.sweep_once() == 1
+        assert reservations.released == [{"sku": "SKU-1", "quantity": 4}]
+        assert (await mongo.orders.find_one({"order_id": "ORD-1"}))["status"] == "expired"
+        assert sweeper.stats["released_units"] == 0
+
+    asyncio.run(scenario())
@@ -25,13 +25,73 @@
     "transaction_id": "txn_abc123xyz",
     "processed_at": ISODate("2024-08-04T10:30:00Z")
   },
-  "status": "confirmed", // pending, processing, confirmed, cancelled
+  "status": "confirmed", // pending, processing, confirmed, cancelled, expired, error
   "created_at": ISODate("2024-08-04T10:25:00Z"),
-  "updated_at": ISODate("2024-08-04T10:30:00Z")
+  "updated_at": ISODate("2024-08-04T10:30:00Z"),
+  "reservation_expires_at": ISODate("2024-08-04T10:40:00Z")
 }
 
 // Índices MongoDB
 db.orders.createIndex({"order_id": 1}, {unique: true})
 db.orders.createIndex({"customer.user_id": 1})
 db.orders.createIndex({"status": 1})
-db.orders.createIndex({"created_at": -1})
\ No newline at end of file
+db.orders.createIndex({"created_at": -1})
+db.orders.createIndex({"customer.user_id": 1, "created_at": -1, "order_id": -1, "status": 1, "pricing.total": 1}, {name: "user_order_history"})
+db.orders.createIndex({"status": 1, "reservation_expires_at": 1})
+db.orders.createIndex({"reservation_sweep_id": 1}, {sparse: true})
+
+// MongoDB Collection: processed_events
+{
+  "_id": ObjectId("..."),
+  "event_id": "0b7c6f0e-2b1a-4c1e-9d3f-1c2a3b4c5d6e",
+  "order_id": "ORD-2024-001234",
+  "processed_at": ISODate("2024-08-04T10:30:00Z")
+}
+
+// Índices MongoDB
+db.processed_events.createIndex({"event_id": 1}, {unique: true})
+db.processed_events.createIndex({"processed_at": 1}, {expireAfterSeconds: 604800})
+
+// MongoDB Collection: order_outbox
+{
+  "_id": ObjectId("..."),
+  "order_id": "ORD-2024-001234",
+  "type": "order_created",
+  "payload": {
+    "customer": {"user_id": "user_12345", "email": "customer@example.com"},
+    "items": [{"sku": "LAPTOP001", "name": "Gaming Laptop Pro", "price": 1299.99, "quantity": 1}],
+    "total": 1403.99
+  },
+  "status": "pending", // pending, claimed, sent, failed
+  "attempts": 0,
+  "claim_id": null,
+  "claimed_at": null,
+  "available_at": ISODate("2024-08-04T10:25:00Z"),
+  "created_at": ISODate("2024-08-04T10:25:00Z"),
+  "sent_at": null
+}
+
+// Índices MongoDB
+db.order_outbox.createIndex({"status": 1, "available_at": 1})
+db.order_outbox.createIndex({"status": 1, "claimed_at": 1})
+db.order_outbox.createIndex({"claim_id": 1})
+db.order_outbox.createIndex({"sent_at": 1}, {expireAfterSeconds: 86400})
+
+// MongoDB Collection: idempotency_keys
+{
+  "_id": "key:user_12345:7f3c2a9e-client-key", // or "hash:<generate_order_hash>"
+  "request_hash": "9b2e4c...",
+  "status": "completed", // in_progress, completed
+  "response": {
+    "order_id": "ORD-2024-001234",
+    "status": "pending",
+    "estimated_total": 1403.99,
+    "created_at": "2024-08-04T10:25:00",
+    "message": "Order created successfully and is pending processing"
+  },
+  "created_at": ISODate("2024-08-04T10:25:00Z"),
+  "expires_at": ISODate("2024-08-05T10:25:00Z")
+}
+
+// Índices MongoDB
+db.idempotency_keys.createIndex({"expires_at": 1}, {expireAfterSeconds: 0})
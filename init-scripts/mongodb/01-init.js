@@ -14,7 +14,13 @@ db.orders.createIndex({ 'status': 1 });
 db.orders.createIndex({ 'created_at': -1 });
 db.orders.createIndex({ 'items.sku': 1 });
 db.orders.createIndex({ 'payment.status': 1 });
-db.orders.createIndex({ 'customer.user_id': 1, 'created_at': -1 });
+db.orders.createIndex(
+  { 'customer.user_id': 1, 'created_at': -1, 'order_id': -1, 'status': 1, 'pricing.total': 1 },
+  { name: 'user_order_history' }
+);
+db.orders.createIndex({ 'status': 1, 'reservation_expires_at': 1 }, { name: 'status_reservation_expires_at' });
+db.orders.createIndex({ 'reservation_sweep_id': 1 }, { sparse: true, name: 'reservation_sweep_id' });
+db.orders.createIndex({ 'idempotency.key': 1 }, { sparse: true, name: 'idempotency_key' });
 
 // Índices para queries complejas
 db.orders.createIndex({ 
@@ -106,7 +112,23 @@ db.order_events.createIndex({ 'order_id': 1, 'timestamp': -1 });
 db.order_events.createIndex({ 'event_type': 1 });
 db.order_events.createIndex({ 'timestamp': -1 });
 
+// Eventos ya procesados por el consumer (deduplicación, expiran a los 7 días)
+db.createCollection('processed_events');
+db.processed_events.createIndex({ 'event_id': 1 }, { unique: true, name: 'event_id_unique' });
+db.processed_events.createIndex({ 'processed_at': 1 }, { expireAfterSeconds: 604800, name: 'processed_at_ttl' });
+
+// Outbox transaccional: eventos pendientes de publicar por el relay
+db.createCollection('order_outbox');
+db.order_outbox.createIndex({ 'status': 1, 'available_at': 1 }, { name: 'status_available_at' });
+db.order_outbox.createIndex({ 'status': 1, 'claimed_at': 1 }, { name: 'status_claimed_at' });
+db.order_outbox.createIndex({ 'claim_id': 1 }, { name: 'claim_id' });
+db.order_outbox.createIndex({ 'sent_at': 1 }, { expireAfterSeconds: 86400, name: 'sent_at_ttl' });
+
+// Claves de idempotencia para creación de órdenes (_id = clave, expiran en expires_at)
+db.createCollection('idempotency_keys');
+db.idempotency_keys.createIndex({ 'expires_at': 1 }, { expireAfterSeconds: 0, name: 'expires_at_ttl' });
+
 print('MongoDB initialization completed successfully!');
-print('Collections created: orders, order_events');
+print('Collections created: orders, order_events, processed_events, order_outbox, idempotency_keys');
 print('Sample data inserted: 2 orders');
 print('Indexes created for optimal query performance');
\ No newline at end of file
@@ -19,10 +19,29 @@ CREATE TABLE IF NOT EXISTS inventory (
     product_id UUID REFERENCES product(id) ON DELETE CASCADE,
     available_quantity INTEGER NOT NULL CHECK (available_quantity >= 0),
     reserved_quantity INTEGER DEFAULT 0 CHECK (reserved_quantity >= 0),
+    -- 0 = stock en esta fila; N = stock repartido en N filas de inventory_shard
+    shard_count INTEGER NOT NULL DEFAULT 0 CHECK (shard_count >= 0),
     last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     UNIQUE(product_id)
 );
 
+-- Sub-contadores de inventario para SKUs muy demandados (ver INVENTORY_SHARDED_SKUS)
+CREATE TABLE IF NOT EXISTS inventory_shard (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    product_id UUID NOT NULL REFERENCES product(id) ON DELETE CASCADE,
+    shard_no INTEGER NOT NULL CHECK (shard_no >= 0),
+    available_quantity INTEGER NOT NULL DEFAULT 0 CHECK (available_quantity >= 0),
+    reserved_quantity INTEGER NOT NULL DEFAULT 0 CHECK (reserved_quantity >= 0),
+    last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(product_id, shard_no)
+);
+
+-- Pedidos cuyo stock reservado ya se liberó (evita liberarlo dos veces al reintentar)
+CREATE TABLE IF NOT EXISTS reservation_release (
+    order_id VARCHAR(64) PRIMARY KEY,
+    released_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- Función para actualizar timestamp automáticamente
 CREATE OR REPLACE FUNCTION update_updated_at_column()
 RETURNS TRIGGER AS $$
@@ -51,6 +70,14 @@ CREATE TRIGGER update_inventory_timestamp
     BEFORE UPDATE ON inventory 
     FOR EACH ROW EXECUTE FUNCTION update_inventory_timestamp();
 
+-- Trigger para actualizar last_updated en inventory_shard
+CREATE TRIGGER update_inventory_shard_timestamp 
+    BEFORE UPDATE ON inventory_shard 
+    FOR EACH ROW EXECUTE FUNCTION update_inventory_timestamp();
+
+-- El trigger que notifica cambios de catálogo (invalida la caché de productos de la API)
+-- lo instala la migración de Alembic, con el canal de CATALOG_NOTIFY_CHANNEL
+
 -- Índices para performance
 CREATE INDEX IF NOT EXISTS idx_product_sku ON product(sku);
 CREATE INDEX IF NOT EXISTS idx_product_name ON product USING gin(to_tsvector('english', name));